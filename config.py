@@ -1,5 +1,45 @@
+import json
 import os
 
+# ----------------------------------------------
+# kafka (shared by all services)
+## "kafka" - a real broker, "memory" - an in-process broker (no infrastructure),
+## for running all services in one process (run_local.py) and for benchmarks
+KAFKA_BACKEND = os.getenv("KAFKA_BACKEND", "kafka")
+KAFKA_MEMORY_PARTITIONS = int(os.getenv("KAFKA_MEMORY_PARTITIONS", 3))
+## Wire codec per topic: "topic:codec,topic2:codec" (json / orjson / msgpack)
+## consumers detect the codec from the message header, so topics can be switched
+## without draining them first
+KAFKA_TOPIC_CODECS = os.getenv("KAFKA_TOPIC_CODECS", "")
+KAFKA_DEFAULT_CODEC = os.getenv("KAFKA_DEFAULT_CODEC", "json")
+## Envelope version: "1.0" wraps every payload with the message metadata,
+## "2.0" keeps it in record headers. Consumers from this version on read both -
+## switch producers to "2.0" only after every consumer has been upgraded
+KAFKA_ENVELOPE_VERSION = os.getenv("KAFKA_ENVELOPE_VERSION", "1.0")
+## Producer compression per topic: "topic:gzip,topic2:zstd" (gzip / snappy / lz4 / zstd)
+## snappy / lz4 / zstd need aiokafka[lz4,snappy,zstd] (in the services' requirements)
+## the transcription output (to_index) carries full text and word-level segments
+KAFKA_TOPIC_COMPRESSION = os.getenv("KAFKA_TOPIC_COMPRESSION", "to_index:gzip")
+## Handler retries with exponential backoff, then the record goes to the stage's
+## dead-letter topic (*_KAFKA_TOPIC_DLQ)
+KAFKA_RETRY_MAX_ATTEMPTS = int(os.getenv("KAFKA_RETRY_MAX_ATTEMPTS", 3))
+KAFKA_RETRY_INITIAL_BACKOFF_MS = int(os.getenv("KAFKA_RETRY_INITIAL_BACKOFF_MS", 500))
+KAFKA_RETRY_MAX_BACKOFF_MS = int(os.getenv("KAFKA_RETRY_MAX_BACKOFF_MS", 30000))
+
+# ----------------------------------------------
+# worker runtime (shared by all services, see utilities/worker.py)
+## Throughput/latency stats are logged every WORKER_STATS_INTERVAL_SECONDS
+WORKER_STATS_INTERVAL_SECONDS = int(os.getenv("WORKER_STATS_INTERVAL_SECONDS", 60))
+## On SIGTERM in-flight work gets this long to finish before shutdown
+WORKER_DRAIN_TIMEOUT_SECONDS = int(os.getenv("WORKER_DRAIN_TIMEOUT_SECONDS", 30))
+## A failed consumer loop restarts at once, repeated failures back off up to the max
+WORKER_RESTART_INITIAL_BACKOFF_MS = int(
+    os.getenv("WORKER_RESTART_INITIAL_BACKOFF_MS", 1000)
+)
+WORKER_RESTART_MAX_BACKOFF_MS = int(os.getenv("WORKER_RESTART_MAX_BACKOFF_MS", 60000))
+## Each service serves Prometheus metrics on GET /metrics at its *_METRICS_PORT
+## (0 disables the endpoint)
+
 # ----------------------------------------------
 # transparency_recording
 ## Kafka Configuration
@@ -8,9 +48,76 @@ TR_KAFKA_PORT = int(os.getenv("TR_KAFKA_PORT", 9092))
 TR_KAFKA_TOPIC_IN = os.getenv("TR_KAFKA_TOPIC_IN", "Transcription_file")
 TR_KAFKA_TOPIC_OUT = os.getenv("TR_KAFKA_TOPIC_OUT", "to_index")
 TR_KAFKA_GROUP_ID = os.getenv("TR_KAFKA_GROUP_ID", "Transcription_group")
+TR_KAFKA_TOPIC_DLQ = os.getenv("TR_KAFKA_TOPIC_DLQ", "Transcription_file.dlq")
+TR_METRICS_PORT = int(os.getenv("TR_METRICS_PORT", 9102))
 
 TR_MODEL_NAME = os.getenv("TR_MODEL_NAME", "tiny")
 TR_DOWNLOAD_ROOT = os.getenv("TR_DOWNLOAD_ROOT", "C:\models\whisper")
+## Whisper runs in a pool of worker processes, each loading the model once.
+## Set it up to the number of cores; the number of files handled at once
+## (TR_CONCURRENCY) follows it by default
+TR_WHISPER_WORKERS = int(os.getenv("TR_WHISPER_WORKERS", 1))
+## torch threads per worker: 0 splits the available cores between the workers.
+## TR_CPU_AFFINITY pins every worker to its own share of the cores: "auto" (all the
+## available cores), a core list like "0-7,16-23", or "" for no pinning
+TR_THREADS_PER_WORKER = int(os.getenv("TR_THREADS_PER_WORKER", 0))
+TR_CPU_AFFINITY = os.getenv("TR_CPU_AFFINITY", "")
+## Files up to 30 seconds are transcribed in batches of up to TR_BATCH_SIZE in a single
+## decode (waiting up to TR_BATCH_WAIT_MS to fill a batch), with or without chunking
+## (TR_CHUNK_SECONDS). 1 disables batching; requires the decoded audio cache
+## (TR_AUDIO_CACHE_DIR)
+TR_BATCH_SIZE = int(os.getenv("TR_BATCH_SIZE", 1))
+TR_BATCH_WAIT_MS = int(os.getenv("TR_BATCH_WAIT_MS", 200))
+TR_CONCURRENCY = int(os.getenv("TR_CONCURRENCY", TR_WHISPER_WORKERS * TR_BATCH_SIZE))
+## "int8" applies dynamic int8 quantization to the model's linear layers (CPU only,
+## faster at some accuracy cost - compare with utilities.sst.quantization_benchmark).
+## Empty runs the float32 model
+TR_WHISPER_QUANTIZATION = os.getenv("TR_WHISPER_QUANTIZATION", "")
+## Chunked mode: long files are split at silence near every TR_CHUNK_SECONDS
+## (searching +-TR_CHUNK_SEARCH_SECONDS) and the chunks are transcribed in parallel
+## across the workers, publishing partial results as they complete. 0 disables it
+TR_CHUNK_SECONDS = float(os.getenv("TR_CHUNK_SECONDS", 300))
+TR_CHUNK_SEARCH_SECONDS = float(os.getenv("TR_CHUNK_SEARCH_SECONDS", 15))
+## Language: TR_LANGUAGE forces a language code for every file (e.g. "he" for a known
+## feed). Otherwise TR_LANGUAGE_DETECT detects it once on the first 30 seconds and
+## pins it for the whole transcription; when off, Whisper detects it by itself
+TR_LANGUAGE = os.getenv("TR_LANGUAGE", "")
+TR_LANGUAGE_DETECT = os.getenv("TR_LANGUAGE_DETECT", "true").lower() == "true"
+## Quality profiles: Whisper options per profile; "model" runs the profile on its own
+## worker pool. Override with a JSON object in TR_PROFILES. A message picks one with
+## the "profile" record header, otherwise TR_DEFAULT_PROFILE is used - or
+## TR_BACKLOG_PROFILE while the input lag is above TR_BACKLOG_HIGH_LAG, until it drops
+## to TR_BACKLOG_LOW_LAG (TR_BACKLOG_HIGH_LAG=0 disables the automatic switch)
+TR_PROFILES = json.loads(os.getenv("TR_PROFILES", "{}")) or {
+    "fast": {
+        "word_timestamps": False,
+        "temperature": 0.0,
+        "condition_on_previous_text": False,
+    },
+    "balanced": {"word_timestamps": True},
+    "accurate": {"word_timestamps": True, "beam_size": 5, "best_of": 5},
+}
+TR_DEFAULT_PROFILE = os.getenv("TR_DEFAULT_PROFILE", "balanced")
+TR_BACKLOG_PROFILE = os.getenv("TR_BACKLOG_PROFILE", "fast")
+TR_BACKLOG_HIGH_LAG = int(os.getenv("TR_BACKLOG_HIGH_LAG", 100))
+TR_BACKLOG_LOW_LAG = int(os.getenv("TR_BACKLOG_LOW_LAG", 10))
+TR_BACKLOG_CHECK_SECONDS = float(os.getenv("TR_BACKLOG_CHECK_SECONDS", 30))
+## Transcription cache, keyed by file hash + model + options: "disk", "mongo" or ""
+## (disabled). Least recently used entries are evicted above the limits.
+TR_CACHE_BACKEND = os.getenv("TR_CACHE_BACKEND", "disk")
+TR_CACHE_DIR = os.getenv("TR_CACHE_DIR", "cache/transcriptions")
+TR_CACHE_MAX_ENTRIES = int(os.getenv("TR_CACHE_MAX_ENTRIES", 10000))
+TR_CACHE_MAX_MB = int(os.getenv("TR_CACHE_MAX_MB", 2048))
+TR_CACHE_MONGO_URI = os.getenv("TR_CACHE_MONGO_URI", "mongodb://localhost:27017/")
+TR_CACHE_MONGO_DB_NAME = os.getenv("TR_CACHE_MONGO_DB_NAME", "podcasts")
+TR_CACHE_MONGO_COLLECTION = os.getenv(
+    "TR_CACHE_MONGO_COLLECTION", "transcription_cache"
+)
+## Decoded audio cache: every file is decoded once with ffmpeg to 16kHz mono float32
+## and memory-mapped by the Whisper workers, so retries and re-runs skip decoding.
+## An empty TR_AUDIO_CACHE_DIR lets Whisper decode the file on every transcription
+TR_AUDIO_CACHE_DIR = os.getenv("TR_AUDIO_CACHE_DIR", "cache/audio")
+TR_AUDIO_CACHE_MAX_MB = int(os.getenv("TR_AUDIO_CACHE_MAX_MB", 4096))
 
 
 # -----------------------------------------------
@@ -32,6 +139,9 @@ PREPROCESSOR_KAFKA_TOPIC_IN = os.getenv("PREPROCESSOR_KAFKA_TOPIC_IN", "podcasts
 PREPROCESSOR_KAFKA_GROUP_ID = os.getenv(
     "PREPROCESSOR_KAFKA_GROUP_ID", "PREPROCESSOR_group"
 )
+PREPROCESSOR_KAFKA_TOPIC_DLQ = os.getenv(
+    "PREPROCESSOR_KAFKA_TOPIC_DLQ", "podcasts_log.dlq"
+)
 
 PREPROCESSOR_KAFKA_TOPIC_OUT_TO_TRANSCRIPTION = os.getenv(
     "PREPROCESSOR_KAFKA_TOPIC_OUT_TO_TRANSCRIPTION", "Transcription_file"
@@ -42,6 +152,30 @@ PREPROCESSOR_KAFKA_TOPIC_OUT_TO_STORAGE = os.getenv(
 PREPROCESSOR_KAFKA_TOPIC_OUT_TO_INDEX = os.getenv(
     "PREPROCESSOR_KAFKA_TOPIC_OUT_TO_INDEX", "to_index"
 )
+PREPROCESSOR_CONCURRENCY = int(os.getenv("PREPROCESSOR_CONCURRENCY", 8))
+PREPROCESSOR_METRICS_PORT = int(os.getenv("PREPROCESSOR_METRICS_PORT", 9101))
+## Backpressure - pause fetching above high-water, resume below low-water
+PREPROCESSOR_QUEUE_HIGH_WATER = int(os.getenv("PREPROCESSOR_QUEUE_HIGH_WATER", 64))
+PREPROCESSOR_QUEUE_LOW_WATER = int(os.getenv("PREPROCESSOR_QUEUE_LOW_WATER", 16))
+## Producer pipelining
+PREPROCESSOR_KAFKA_MAX_IN_FLIGHT = int(
+    os.getenv("PREPROCESSOR_KAFKA_MAX_IN_FLIGHT", 1000)
+)
+PREPROCESSOR_KAFKA_LINGER_MS = int(os.getenv("PREPROCESSOR_KAFKA_LINGER_MS", 5))
+PREPROCESSOR_KAFKA_MAX_BATCH_SIZE = int(
+    os.getenv("PREPROCESSOR_KAFKA_MAX_BATCH_SIZE", 65536)
+)
+## File hashing - files hashed in parallel (thread pool) and the read buffer size
+PREPROCESSOR_HASH_CONCURRENCY = int(os.getenv("PREPROCESSOR_HASH_CONCURRENCY", 4))
+PREPROCESSOR_HASH_BUFFER_KB = int(os.getenv("PREPROCESSOR_HASH_BUFFER_KB", 4096))
+## Persistent hash cache (SQLite) - an unchanged file costs a stat instead of a read
+## An empty PREPROCESSOR_HASH_CACHE_PATH hashes every file in full
+PREPROCESSOR_HASH_CACHE_PATH = os.getenv(
+    "PREPROCESSOR_HASH_CACHE_PATH", "cache/file_hashes.sqlite3"
+)
+PREPROCESSOR_HASH_CACHE_MAX_ENTRIES = int(
+    os.getenv("PREPROCESSOR_HASH_CACHE_MAX_ENTRIES", 100000)
+)
 
 # -------------------------------------------------------
 # storage
@@ -50,6 +184,14 @@ STORAGE_KAFKA_HOST = os.getenv("STORAGE_KAFKA_HOST", "localhost")
 STORAGE_KAFKA_PORT = int(os.getenv("STORAGE_KAFKA_PORT", 9092))
 STORAGE_KAFKA_TOPIC_IN = os.getenv("STORAGE_KAFKA_TOPIC_IN", "to_storage")
 STORAGE_KAFKA_GROUP_ID = os.getenv("STORAGE_KAFKA_GROUP_ID", "storage_group")
+STORAGE_KAFKA_TOPIC_DLQ = os.getenv("STORAGE_KAFKA_TOPIC_DLQ", "to_storage.dlq")
+## Number of batches processed at once
+STORAGE_CONCURRENCY = int(os.getenv("STORAGE_CONCURRENCY", 1))
+STORAGE_METRICS_PORT = int(os.getenv("STORAGE_METRICS_PORT", 9103))
+STORAGE_KAFKA_BATCH_MAX_RECORDS = int(os.getenv("STORAGE_KAFKA_BATCH_MAX_RECORDS", 100))
+STORAGE_KAFKA_BATCH_MAX_WAIT_MS = int(
+    os.getenv("STORAGE_KAFKA_BATCH_MAX_WAIT_MS", 1000)
+)
 ## MongoDB Configuration
 STORAGE_MONGO_ATLAS_URI = os.getenv("STORAGE_MONGO_ATLAS_URI", "")
 STORAGE_MONGO_HOST = os.getenv("STORAGE_MONGO_HOST", "localhost")
@@ -77,6 +219,14 @@ INDEXER_KAFKA_HOST = os.getenv("INDEXER_KAFKA_HOST", "localhost")
 INDEXER_KAFKA_PORT = int(os.getenv("INDEXER_KAFKA_PORT", 9092))
 INDEXER_KAFKA_TOPIC_IN = os.getenv("INDEXER_KAFKA_TOPIC_IN", "to_index")
 INDEXER_KAFKA_GROUP_ID = os.getenv("INDEXER_KAFKA_GROUP_ID", "indexer_group")
+INDEXER_KAFKA_TOPIC_DLQ = os.getenv("INDEXER_KAFKA_TOPIC_DLQ", "to_index.dlq")
+## Number of batches processed at once
+INDEXER_CONCURRENCY = int(os.getenv("INDEXER_CONCURRENCY", 1))
+INDEXER_METRICS_PORT = int(os.getenv("INDEXER_METRICS_PORT", 9104))
+INDEXER_KAFKA_BATCH_MAX_RECORDS = int(os.getenv("INDEXER_KAFKA_BATCH_MAX_RECORDS", 500))
+INDEXER_KAFKA_BATCH_MAX_WAIT_MS = int(
+    os.getenv("INDEXER_KAFKA_BATCH_MAX_WAIT_MS", 1000)
+)
 
 ## Elasticsearch Configuration
 INDEXER_ELASTICSEARCH_PROTOCOL = os.getenv("INDEXER_ELASTICSEARCH_PROTOCOL", "http")
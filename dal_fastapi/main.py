@@ -7,6 +7,8 @@ from fastapi import FastAPI, HTTPException, status
 
 import config
 from utilities.kafka.async_client import KafkaProducerAsync
+from utilities.kafka.codecs import parse_topic_codecs
+from utilities.kafka.compression import parse_topic_compression
 from utilities.logger import Logger
 
 logger = Logger.get_logger()
@@ -19,7 +21,14 @@ async def lifespan(app: FastAPI):
     global producer
     logger.info("Starting retriever service...")
     boostrap_servers = rf"{config.DAL_KAFKA_HOST}:{config.DAL_KAFKA_PORT}"
-    producer = KafkaProducerAsync(bootstrap_servers=boostrap_servers)
+    producer = KafkaProducerAsync(
+        bootstrap_servers=boostrap_servers,
+        backend=config.KAFKA_BACKEND,
+        topic_codecs=parse_topic_codecs(config.KAFKA_TOPIC_CODECS),
+        default_codec=config.KAFKA_DEFAULT_CODEC,
+        envelope_version=config.KAFKA_ENVELOPE_VERSION,
+        topic_compression=parse_topic_compression(config.KAFKA_TOPIC_COMPRESSION),
+    )
     try:
         await producer.start()
         logger.info("Kafka producer started successfully")
@@ -37,7 +46,8 @@ async def lifespan(app: FastAPI):
 
     logger.info("Application shutdown...")
     try:
-        producer.stop() if producer else None
+        if producer:
+            await producer.stop()
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
 
@@ -81,16 +91,17 @@ async def load_file(file_path: Path):
 async def load_directory(directory_path: Path):
     logger.info(f"Loading directory: {directory_path}")
     try:
-        num_files = 0
         results = []
         for meta_data in load_meta_data_for_directory(directory_path):
             logger.debug(meta_data)
-            num_files += 1
-            results.append(meta_data)
-            await producer.send_message(config.DAL_KAFKA_TOPIC_OUT, meta_data)
+            if meta_data:
+                results.append(meta_data)
+        send_result = await producer.send_batch(config.DAL_KAFKA_TOPIC_OUT, results)
         return {
             "status": "success",
-            "num_files": num_files,
+            "num_files": len(results),
+            "num_sent": send_result["successful"],
+            "num_failed": send_result["failed"],
             "results": results,
         }
     except Exception as e:
@@ -1,10 +1,22 @@
 import config
 from utilities.elasticsearch.elasticsearch_service import ElasticsearchService
 from utilities.logger import Logger
+from utilities.sst.segments import COMPACT_FORMAT, CompactSegments
 
 logger = Logger.get_logger()
 
 
+def expand_segments(document: dict) -> dict:
+    """
+    segments מגיעים ב-Kafka בפורמט העמודות - באינדקס הם נשמרים כרשימה רגילה
+    (segment לכל פריט, עם text ו-words) כדי שהחיפוש לפי זמן ימשיך לעבוד
+    """
+    segments = document.get("segments")
+    if isinstance(segments, dict) and segments.get("format") == COMPACT_FORMAT:
+        return {**document, "segments": CompactSegments(segments).to_segments()}
+    return document
+
+
 class Index:
     def __init__(self, es: ElasticsearchService):
         self.es = es
@@ -14,6 +26,16 @@ class Index:
 
         result = await self.es.update_document(
             doc_id=key,
-            update_data=document,
+            update_data=expand_segments(document),
         )
         return result
+
+    async def index_documents(self, records: list):
+        logger.debug(f"Indexing batch of {len(records)} documents")
+
+        documents = [
+            (record["key"], expand_segments(record["value"]["data"]))
+            for record in records
+        ]
+        result = await self.es.bulk_upsert_documents(documents)
+        return result
@@ -1,5 +1,5 @@
 import asyncio
-import time
+from pathlib import Path
 
 from elasticsearch import AsyncElasticsearch
 from indux import Index
@@ -7,23 +7,51 @@ from indux import Index
 import config
 from utilities.elasticsearch.elasticsearch_service import ElasticsearchService
 from utilities.files.data_loader_client import UniversalDataLoader
-from utilities.kafka.async_client import KafkaConsumerAsync
+from utilities.kafka.async_client import KafkaConsumerAsync, KafkaProducerAsync
+from utilities.kafka.codecs import parse_topic_codecs
+from utilities.kafka.compression import parse_topic_compression
+from utilities.kafka.retry import RetryPolicy
 from utilities.logger import Logger
+from utilities.worker import WorkerRuntime
 
 logger = Logger.get_logger()
 
+MAPPING_PATH = Path(__file__).resolve().parent / "mapping.json"
+
 
 async def main():
     logger.info("Starting indexer service...")
 
+    bootstrap_servers = f"{config.INDEXER_KAFKA_HOST}:{config.INDEXER_KAFKA_PORT}"
+
+    # Producer for the dead-letter topic
+    producer = KafkaProducerAsync(
+        bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
+        topic_codecs=parse_topic_codecs(config.KAFKA_TOPIC_CODECS),
+        default_codec=config.KAFKA_DEFAULT_CODEC,
+        envelope_version=config.KAFKA_ENVELOPE_VERSION,
+        topic_compression=parse_topic_compression(config.KAFKA_TOPIC_COMPRESSION),
+    )
+
     # Initialize Kafka consumer
     consumer = KafkaConsumerAsync(
         [config.INDEXER_KAFKA_TOPIC_IN],
-        bootstrap_servers=f"{config.INDEXER_KAFKA_HOST}:{config.INDEXER_KAFKA_PORT}",
+        bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
         group_id=config.INDEXER_KAFKA_GROUP_ID,
+        retry_policy=RetryPolicy(
+            max_attempts=config.KAFKA_RETRY_MAX_ATTEMPTS,
+            initial_backoff_ms=config.KAFKA_RETRY_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.KAFKA_RETRY_MAX_BACKOFF_MS,
+        ),
+        dead_letter_producer=producer,
+        dead_letter_topic=config.INDEXER_KAFKA_TOPIC_DLQ,
+        enable_auto_commit=False,
     )
 
     try:
+        await producer.start()
         await consumer.start()
         logger.info("Kafka producer and consumer started successfully")
     except Exception as e:
@@ -31,7 +59,8 @@ async def main():
         return
     dal = UniversalDataLoader()
     try:
-        mapping = dal.load_json_as_dict(r"mapping.json")
+        # ליד main.py ולא לפי התיקייה הנוכחית (run_local.py רץ משורש הריפו)
+        mapping = dal.load_json_as_dict(str(MAPPING_PATH))
     except Exception as e:
         logger.error(f"Failed to load mapping: {e}")
         return
@@ -51,60 +80,31 @@ async def main():
 
     ind = Index(es)
 
-    # Performance tracking variables
-    message_count = 0
-    processed_in_batch = 0
-    last_stats_time = time.time()
-    logger.info("Starting main processing loop")
-    while True:
-        try:
-            async for result in consumer.consume():
-                logger.debug(f"Received data: {result}")
-                topic = result["topic"]
-                file = result["value"]["data"]
-                key = result["key"]
-                message_count += 1
-                processed_in_batch += 1
-                file_id = file.get("file_hash", "unknown_id")
-
-                logger.debug(
-                    f"Processing message #{message_count} from topic '{topic}'"
-                    f" - File ID: {file_id}, Key: {key}"
-                )
-
-                # Track processing time for each message
-                process_start_time = time.time()
-                try:
-                    result = await ind.index_document(file, key)
-                    logger.debug(f"Result: {result}")
-                except Exception as e:
-                    logger.error(f"Error indexing document: {e}")
-                    logger.info(f"Failed to index document {file_id}")
-                processing_time = time.time() - process_start_time
-                logger.debug(f"Result: {result}")
-                logger.info(f"Processed file {file_id} in {processing_time:.3f}s")
-
-                # Print statistics every 60 seconds
-                current_time = time.time()
-                if current_time - last_stats_time > 60:
-                    rate = processed_in_batch / 60
-                    logger.info(
-                        f"Processing rate: {rate:.2f} messages/second | Total processed: {message_count}"
-                    )
-
-                    last_stats_time = current_time
-                    processed_in_batch = 0
-
-                # Log every 100 messages for general tracking
-                if message_count % 100 == 0:
-                    logger.info(f"Milestone: Processed {message_count} total messages")
-
-        except Exception as e:
-            logger.error(f"Error consuming messages from Kafka: {e}")
-
-        # Sleep between batches to prevent overwhelming the system
-        await asyncio.sleep(5)
-    #
+    async def handle_batch(records: list, offsets: list):
+        logger.debug(f"Processing {len(records)} messages - offsets: {offsets}")
+        result = await ind.index_documents(records)
+        logger.debug(f"Result: {result}")
+
+    runtime = WorkerRuntime(
+        "indexer",
+        consumer,
+        batch_handler=handle_batch,
+        concurrency=config.INDEXER_CONCURRENCY,
+        max_records=config.INDEXER_KAFKA_BATCH_MAX_RECORDS,
+        max_wait_ms=config.INDEXER_KAFKA_BATCH_MAX_WAIT_MS,
+        stats_interval_seconds=config.WORKER_STATS_INTERVAL_SECONDS,
+        drain_timeout_seconds=config.WORKER_DRAIN_TIMEOUT_SECONDS,
+        restart_policy=RetryPolicy(
+            initial_backoff_ms=config.WORKER_RESTART_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.WORKER_RESTART_MAX_BACKOFF_MS,
+        ),
+        metrics_port=config.INDEXER_METRICS_PORT,
+    )
+    try:
+        await runtime.run()
+    finally:
+        await consumer.stop()
+        await producer.stop()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,15 @@
 import asyncio
-import time
 
 import config
 from preprosesor.proses import Proses
+from utilities.files.hash_cache import HashCache
+from utilities.files.hashing import FileHasher
 from utilities.kafka.async_client import KafkaConsumerAsync, KafkaProducerAsync
+from utilities.kafka.codecs import parse_topic_codecs
+from utilities.kafka.compression import parse_topic_compression
+from utilities.kafka.retry import RetryPolicy
 from utilities.logger import Logger
+from utilities.worker import WorkerRuntime
 
 logger = Logger.get_logger()
 
@@ -18,6 +23,14 @@ async def main():
     # Initialize Kafka producer and consumer
     producer = KafkaProducerAsync(
         bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
+        max_in_flight=config.PREPROCESSOR_KAFKA_MAX_IN_FLIGHT,
+        linger_ms=config.PREPROCESSOR_KAFKA_LINGER_MS,
+        max_batch_size=config.PREPROCESSOR_KAFKA_MAX_BATCH_SIZE,
+        topic_codecs=parse_topic_codecs(config.KAFKA_TOPIC_CODECS),
+        default_codec=config.KAFKA_DEFAULT_CODEC,
+        envelope_version=config.KAFKA_ENVELOPE_VERSION,
+        topic_compression=parse_topic_compression(config.KAFKA_TOPIC_COMPRESSION),
     )
 
     try:
@@ -30,7 +43,16 @@ async def main():
     consumer = KafkaConsumerAsync(
         [config.PREPROCESSOR_KAFKA_TOPIC_IN],
         bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
         group_id=config.PREPROCESSOR_KAFKA_GROUP_ID,
+        retry_policy=RetryPolicy(
+            max_attempts=config.KAFKA_RETRY_MAX_ATTEMPTS,
+            initial_backoff_ms=config.KAFKA_RETRY_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.KAFKA_RETRY_MAX_BACKOFF_MS,
+        ),
+        dead_letter_producer=producer,
+        dead_letter_topic=config.PREPROCESSOR_KAFKA_TOPIC_DLQ,
+        enable_auto_commit=False,
     )
     try:
         await consumer.start()
@@ -39,53 +61,50 @@ async def main():
         logger.error(f"Failed to start Kafka consumer: {e}")
         return
 
-    proses = Proses(producer)
-
-    # Performance tracking variables
-    message_count = 0
-    processed_in_batch = 0
-    last_stats_time = time.time()
-    logger.info("Starting main processing loop")
-
-    while True:
-        try:
-            async for meta_data in consumer.consume():
-                logger.debug(f"Received data: {meta_data}")
-                topic = meta_data["topic"]
-                message_count += 1
-                processed_in_batch += 1
-
-                logger.debug(
-                    f"Processing message #{message_count} from topic '{topic}'"
-                )
-
-                # Track processing time for each message
-                process_start_time = time.time()
-                result = await proses.proses(meta_data)
-                processing_time = time.time() - process_start_time
-                logger.debug(f"Result: {result}")
-                logger.info(f"Processed file in {processing_time:.3f}s")
-
-                # Print statistics every 60 seconds
-                current_time = time.time()
-                if current_time - last_stats_time > 60:
-                    rate = processed_in_batch / 60
-                    logger.info(
-                        f"Processing rate: {rate:.2f} messages/second | Total processed: {message_count}"
-                    )
-
-                    last_stats_time = current_time
-                    processed_in_batch = 0
-
-                # Log every 100 messages for general tracking
-                if message_count % 100 == 0:
-                    logger.info(f"Milestone: Processed {message_count} total messages")
-
-        except Exception as e:
-            logger.error(f"Error consuming messages from Kafka: {e}")
-
-        # Sleep between batches to prevent overwhelming the system
-        await asyncio.sleep(5)
+    hash_cache = (
+        HashCache(
+            config.PREPROCESSOR_HASH_CACHE_PATH,
+            max_entries=config.PREPROCESSOR_HASH_CACHE_MAX_ENTRIES,
+        )
+        if config.PREPROCESSOR_HASH_CACHE_PATH
+        else None
+    )
+    hasher = FileHasher(
+        concurrency=config.PREPROCESSOR_HASH_CONCURRENCY,
+        buffer_size=config.PREPROCESSOR_HASH_BUFFER_KB * 1024,
+        cache=hash_cache,
+    )
+    proses = Proses(producer, hasher)
+
+    async def handle(meta_data: dict) -> bool:
+        logger.debug(f"Received data: {meta_data}")
+        result = await proses.proses(meta_data)
+        logger.debug(f"Result: {result}")
+        return True
+
+    runtime = WorkerRuntime(
+        "preprocessor",
+        consumer,
+        handler=handle,
+        concurrency=config.PREPROCESSOR_CONCURRENCY,
+        high_water=config.PREPROCESSOR_QUEUE_HIGH_WATER,
+        low_water=config.PREPROCESSOR_QUEUE_LOW_WATER,
+        stats_interval_seconds=config.WORKER_STATS_INTERVAL_SECONDS,
+        drain_timeout_seconds=config.WORKER_DRAIN_TIMEOUT_SECONDS,
+        restart_policy=RetryPolicy(
+            initial_backoff_ms=config.WORKER_RESTART_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.WORKER_RESTART_MAX_BACKOFF_MS,
+        ),
+        metrics_port=config.PREPROCESSOR_METRICS_PORT,
+    )
+    try:
+        await runtime.run()
+    finally:
+        await consumer.stop()
+        await producer.stop()
+        hasher.close()
+        if hash_cache is not None:
+            hash_cache.close()
 
 
 if __name__ == "__main__":
@@ -1,56 +1,62 @@
-import hashlib
+import asyncio
 
 import config
+from utilities.files.hashing import FileHasher
 from utilities.kafka.async_client import KafkaProducerAsync
 from utilities.logger import Logger
+from utilities.sst.options import PROFILE_HEADER
 
 logger = Logger.get_logger()
 
 
 class Proses:
-    def __init__(self, producer: KafkaProducerAsync):
+    def __init__(self, producer: KafkaProducerAsync, hasher: FileHasher):
         self.producer = producer
+        self.hasher = hasher
 
     async def proses(self, data: dict):
         path = data["value"]["data"]["file_path"]
         meta_data = data["value"]["data"]["meta_data"]
-        file_hash = self._get_file_hash(path)
+        # The transcription profile chosen upstream travels with the file
+        profile = (data.get("headers") or {}).get(PROFILE_HEADER)
+        file_hash = await self._get_file_hash(path)
         meta_data["file_hash"] = file_hash
         meta_data["contentType"] = f"audio/{meta_data['file_suffix']}"
-        result_es = await self.producer.send_message(
-            topic=config.PREPROCESSOR_KAFKA_TOPIC_OUT_TO_INDEX,
-            key=file_hash,
-            message=meta_data,
+        # Pipelined sends - the three records are queued together and their
+        # broker acks awaited at the end, so the input offset is committed
+        # only after all of them were delivered.
+        deliveries = [
+            await self.producer.send_message_nowait(
+                topic=config.PREPROCESSOR_KAFKA_TOPIC_OUT_TO_INDEX,
+                key=file_hash,
+                message=meta_data,
+            ),
+            await self.producer.send_message_nowait(
+                topic=config.PREPROCESSOR_KAFKA_TOPIC_OUT_TO_STORAGE,
+                key=file_hash,
+                message=path,
+            ),
+            await self.producer.send_message_nowait(
+                topic=config.PREPROCESSOR_KAFKA_TOPIC_OUT_TO_TRANSCRIPTION,
+                key=file_hash,
+                message=path,
+                headers=[(PROFILE_HEADER, profile)] if profile else None,
+            ),
+        ]
+        result_es, result_mongo, result_transcription = await asyncio.gather(
+            *deliveries
         )
-        logger.debug(f"result_es: {result_es}")
-        result_mongo = await self.producer.send_message(
-            topic=config.PREPROCESSOR_KAFKA_TOPIC_OUT_TO_STORAGE,
-            key=file_hash,
-            message=path,
-        )
-        logger.debug(f"result_mongo: {result_mongo}")
-        result_transcription = await self.producer.send_message(
-            topic=config.PREPROCESSOR_KAFKA_TOPIC_OUT_TO_TRANSCRIPTION,
-            key=file_hash,
-            message=path,
-        )
-        logger.debug(f"result_transcription: {result_transcription}")
+        if not (result_es and result_mongo and result_transcription):
+            # The handler fails, so the consumer retries and then dead-letters it
+            raise RuntimeError(f"Failed to publish file {file_hash} to Kafka")
+        logger.debug(f"Published 3 messages for file {file_hash}")
         return result_es, result_mongo, result_transcription
 
-    @staticmethod
-    def _get_file_hash(file_path, algorithm="sha256", buffer_size=65536):
-        try:
-            logger.info(f"Calculating hash for file {file_path}")
-            hasher = hashlib.new(algorithm)
-            with open(file_path, "rb") as f:
-                while True:
-                    data = f.read(buffer_size)
-                    if not data:
-                        break
-                    hasher.update(data)
-            logger.info(f"Hash for file {file_path}: {hasher.hexdigest()}")
-            return hasher.hexdigest()
-        except FileNotFoundError:
-            return f"Error: File not found at {file_path}"
-        except Exception as e:
-            return f"An error occurred: {e}"
+    async def _get_file_hash(self, file_path: str) -> str:
+        # Hashed in the hasher's thread pool - the event loop keeps serving
+        # other messages while large files are read. Read errors propagate
+        # so the consumer retries and then dead-letters the message.
+        logger.info(f"Calculating hash for file {file_path}")
+        file_hash = await self.hasher.hash(file_path)
+        logger.info(f"Hash for file {file_path}: {file_hash}")
+        return file_hash
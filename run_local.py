@@ -0,0 +1,130 @@
+"""
+הרצת כל שירותי ה-pipeline בתהליך אחד
+
+עם KAFKA_BACKEND=memory השירותים מדברים דרך הברוקר בזיכרון (ללא Kafka),
+וכל 60 שניות (--stats-interval) נרשם ה-lag והקצב של כל consumer group -
+כך אפשר למדוד את הקצב של כל שלב בלי רעש של רשת.
+
+    KAFKA_BACKEND=memory python run_local.py --directory C:\\podcasts
+    KAFKA_BACKEND=memory python run_local.py --services preprosesor index
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+import config
+from utilities.kafka.async_client import MEMORY_BACKEND, KafkaProducerAsync
+from utilities.kafka.codecs import parse_topic_codecs
+from utilities.kafka.compression import parse_topic_compression
+from utilities.kafka.memory_broker import get_memory_broker
+from utilities.logger import Logger
+from utilities.worker import shutdown_requested
+
+logger = Logger.get_logger()
+
+ROOT = Path(__file__).resolve().parent
+
+# שירות -> consumer group (למדידת הקצב של כל שלב)
+SERVICES = {
+    "preprosesor": config.PREPROCESSOR_KAFKA_GROUP_ID,
+    "transparency_recording": config.TR_KAFKA_GROUP_ID,
+    "storage": config.STORAGE_KAFKA_GROUP_ID,
+    "index": config.INDEXER_KAFKA_GROUP_ID,
+}
+
+
+def load_service(name: str):
+    """טעינת main.py של שירות (כל שירות רץ מהתיקייה שלו - היא נוספת ל-path)"""
+    service_dir = ROOT / name
+    sys.path.insert(0, str(service_dir))
+    spec = importlib.util.spec_from_file_location(
+        f"{name}_main", service_dir / "main.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def run_service(name: str):
+    """
+    הרצת שירות - main() שחוזר לפני SIGTERM/SIGINT (למשל כשל בחיבור או בטעינת
+    הגדרות) הוא כשל שעוצר את כל ה-pipeline, ולא שלב שנעלם בשקט
+    """
+    await load_service(name).main()
+    if not shutdown_requested():
+        raise RuntimeError(f"Service '{name}' stopped unexpectedly, see the log above")
+
+
+async def feed_directory(directory: str):
+    """שליחת ה-metadata של קבצי התיקייה ל-topic של ה-DAL (כמו load_directory)"""
+    from dal_fastapi.data_load import load_meta_data_for_directory
+
+    producer = KafkaProducerAsync(
+        bootstrap_servers=f"{config.DAL_KAFKA_HOST}:{config.DAL_KAFKA_PORT}",
+        backend=config.KAFKA_BACKEND,
+        topic_codecs=parse_topic_codecs(config.KAFKA_TOPIC_CODECS),
+        default_codec=config.KAFKA_DEFAULT_CODEC,
+        envelope_version=config.KAFKA_ENVELOPE_VERSION,
+        topic_compression=parse_topic_compression(config.KAFKA_TOPIC_COMPRESSION),
+    )
+    await producer.start()
+    try:
+        # ממתינים שה-consumers יצטרפו לפני השליחה (auto_offset_reset=latest)
+        await asyncio.sleep(1)
+        messages = [m for m in load_meta_data_for_directory(directory) if m]
+        result = await producer.send_batch(config.DAL_KAFKA_TOPIC_OUT, messages)
+        logger.info(f"Fed {result['successful']}/{result['total']} files")
+    finally:
+        await producer.stop()
+
+
+async def report_stats(groups: dict, interval: int):
+    """רישום ה-lag והקצב (הודעות ששמרו offset בשנייה) של כל consumer group"""
+    broker = get_memory_broker()
+    last_committed = {}
+    last_time = time.time()
+    while True:
+        await asyncio.sleep(interval)
+        elapsed = time.time() - last_time
+        last_time = time.time()
+        for service, group_id in groups.items():
+            lag = broker.lag(group_id)
+            committed = sum(broker.committed(group_id, tp) or 0 for tp in lag)
+            rate = (committed - last_committed.get(group_id, 0)) / elapsed
+            last_committed[group_id] = committed
+            logger.info(
+                f"[{service}] rate: {rate:.2f} messages/second"
+                f" | committed: {committed} | lag: {sum(lag.values())}"
+            )
+
+
+async def main(services: list, directory: str, stats_interval: int):
+    logger.info(f"Running {services} in one process (backend: {config.KAFKA_BACKEND})")
+    get_memory_broker().num_partitions = config.KAFKA_MEMORY_PARTITIONS
+    tasks = [run_service(name) for name in services]
+    if directory:
+        tasks.append(feed_directory(directory))
+    if config.KAFKA_BACKEND == MEMORY_BACKEND:
+        tasks.append(report_stats({s: SERVICES[s] for s in services}, stats_interval))
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline in one process")
+    parser.add_argument(
+        "--services", nargs="+", choices=list(SERVICES), default=list(SERVICES)
+    )
+    parser.add_argument("--directory", help="feed the .wav files in this directory")
+    parser.add_argument("--stats-interval", type=int, default=60)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.services, args.directory, args.stats_interval))
+    except KeyboardInterrupt:
+        logger.info("Local pipeline stopped by user")
+    except RuntimeError as e:
+        logger.critical(str(e))
+        sys.exit(1)
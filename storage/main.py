@@ -1,12 +1,15 @@
 import asyncio
-import time
 
 from mongo_service import MongoService
 
 import config
-from utilities.kafka.async_client import KafkaConsumerAsync
+from utilities.kafka.async_client import KafkaConsumerAsync, KafkaProducerAsync
+from utilities.kafka.codecs import parse_topic_codecs
+from utilities.kafka.compression import parse_topic_compression
+from utilities.kafka.retry import RetryPolicy
 from utilities.logger import Logger
 from utilities.mongoDB.mongodb_async_client import MongoDBAsyncClient
+from utilities.worker import WorkerRuntime
 
 logger = Logger.get_logger()
 
@@ -22,13 +25,35 @@ async def main():
         logger.error(f"Failed to connect to MongoDB: {e}")
         return
 
+    bootstrap_servers = f"{config.STORAGE_KAFKA_HOST}:{config.STORAGE_KAFKA_PORT}"
+
+    # Producer for the dead-letter topic
+    producer = KafkaProducerAsync(
+        bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
+        topic_codecs=parse_topic_codecs(config.KAFKA_TOPIC_CODECS),
+        default_codec=config.KAFKA_DEFAULT_CODEC,
+        envelope_version=config.KAFKA_ENVELOPE_VERSION,
+        topic_compression=parse_topic_compression(config.KAFKA_TOPIC_COMPRESSION),
+    )
+
     # Initialize Kafka consumer
     consumer = KafkaConsumerAsync(
         [config.STORAGE_KAFKA_TOPIC_IN],
-        bootstrap_servers=f"{config.STORAGE_KAFKA_HOST}:{config.STORAGE_KAFKA_PORT}",
+        bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
         group_id=config.STORAGE_KAFKA_GROUP_ID,
+        retry_policy=RetryPolicy(
+            max_attempts=config.KAFKA_RETRY_MAX_ATTEMPTS,
+            initial_backoff_ms=config.KAFKA_RETRY_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.KAFKA_RETRY_MAX_BACKOFF_MS,
+        ),
+        dead_letter_producer=producer,
+        dead_letter_topic=config.STORAGE_KAFKA_TOPIC_DLQ,
+        enable_auto_commit=False,
     )
     try:
+        await producer.start()
         await consumer.start()
         logger.info("Kafka consumer started successfully")
     except Exception as e:
@@ -37,51 +62,32 @@ async def main():
 
     service = MongoService(client)
 
-    # Performance tracking variables
-    message_count = 0
-    processed_in_batch = 0
-    last_stats_time = time.time()
-    logger.info("Starting main processing loop")
-
-    while True:
-        try:
-            async for result in consumer.consume():
-                logger.debug(f"Received data: {result}")
-                topic = result["topic"]
-                file = result["value"]["data"]
-                key = result["key"]
-                message_count += 1
-                processed_in_batch += 1
-                file_id = result["value"]["key"]
-
-                logger.debug(
-                    f"Processing message #{message_count} from topic '{topic}' - File ID: {file_id}"
-                )
-                process_start_time = time.time()
-                result = await service.upload_file(file, key)
-                processing_time = time.time() - process_start_time
-                logger.debug(f"Result: {result}")
-                logger.info(f"Processed file {file_id} in {processing_time:.3f}s")
-
-                # Print statistics every 60 seconds
-                current_time = time.time()
-                if current_time - last_stats_time > 60:
-                    rate = processed_in_batch / 60
-                    logger.info(
-                        f"Processing rate: {rate:.2f} messages/second | Total processed: {message_count}"
-                    )
-
-                    last_stats_time = current_time
-                    processed_in_batch = 0
-
-                # Log every 100 messages for general tracking
-                if message_count % 100 == 0:
-                    logger.info(f"Milestone: Processed {message_count} total messages")
-
-        except Exception as e:
-            logger.error(f"Error in consumer loop: {e}")
-            logger.info("Attempting to reconnect in 5 seconds")
-        await asyncio.sleep(5)
+    async def handle_batch(records: list, offsets: list):
+        logger.debug(f"Processing {len(records)} messages - offsets: {offsets}")
+        files = [(record["value"]["data"], record["key"]) for record in records]
+        result = await service.upload_files(files)
+        logger.debug(f"Result: {result}")
+
+    runtime = WorkerRuntime(
+        "storage",
+        consumer,
+        batch_handler=handle_batch,
+        concurrency=config.STORAGE_CONCURRENCY,
+        max_records=config.STORAGE_KAFKA_BATCH_MAX_RECORDS,
+        max_wait_ms=config.STORAGE_KAFKA_BATCH_MAX_WAIT_MS,
+        stats_interval_seconds=config.WORKER_STATS_INTERVAL_SECONDS,
+        drain_timeout_seconds=config.WORKER_DRAIN_TIMEOUT_SECONDS,
+        restart_policy=RetryPolicy(
+            initial_backoff_ms=config.WORKER_RESTART_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.WORKER_RESTART_MAX_BACKOFF_MS,
+        ),
+        metrics_port=config.STORAGE_METRICS_PORT,
+    )
+    try:
+        await runtime.run()
+    finally:
+        await consumer.stop()
+        await producer.stop()
 
 
 if __name__ == "__main__":
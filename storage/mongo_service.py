@@ -25,3 +25,27 @@ class MongoService:
             f"Uploaded file: {file_path}, with hash: {file_hash}, result: {result}"
         )
         return result
+
+    async def upload_files(self, files: list):
+        """Upload a batch of (file_path, file_hash) pairs to MongoDB"""
+        hashes = list({file_hash for _, file_hash in files})
+        files_collection = self.db[f"{config.STORAGE_MONGO_COLLECTION_NAME}.files"]
+        existing = {
+            doc["_id"]
+            async for doc in files_collection.find(
+                {"_id": {"$in": hashes}}, projection={"_id": 1}
+            )
+        }
+        logger.debug(f"{len(existing)}/{len(hashes)} files already exist in batch")
+
+        results = []
+        for file_path, file_hash in files:
+            if file_hash in existing:
+                results.append(file_hash)
+                continue
+            logger.debug(f"Uploading file: {file_path}, with hash: {file_hash}")
+            with open(file_path, "rb") as data:
+                result = await self.fs.put(data=data, _id=file_hash)
+            existing.add(file_hash)
+            results.append(result)
+        return results
@@ -1,16 +1,55 @@
 import asyncio
-import time
 
 from transparency import Transparency
 
 import config
 from utilities.kafka.async_client import KafkaConsumerAsync, KafkaProducerAsync
+from utilities.kafka.codecs import parse_topic_codecs
+from utilities.kafka.compression import parse_topic_compression
+from utilities.kafka.retry import RetryPolicy
 from utilities.logger import Logger
-from utilities.sst.whisper_service import WhisperService
+from utilities.mongoDB.mongodb_async_client import MongoDBAsyncClient
+from utilities.sst.audio_cache import DecodedAudioCache
+from utilities.sst.options import PROFILE_HEADER
+from utilities.sst.profiles import ProfileSelector
+from utilities.sst.transcription_cache import (
+    DiskTranscriptionCache,
+    MongoTranscriptionCache,
+    TranscriptionCache,
+)
+from utilities.sst.whisper_pool import WhisperPool
+from utilities.worker import WorkerRuntime
 
 logger = Logger.get_logger()
 
 
+async def create_cache():
+    """ה-cache של התמלולים לפי TR_CACHE_BACKEND (None = ללא cache)"""
+    if config.TR_CACHE_BACKEND == "disk":
+        return TranscriptionCache(
+            DiskTranscriptionCache(
+                config.TR_CACHE_DIR,
+                max_entries=config.TR_CACHE_MAX_ENTRIES,
+                max_bytes=config.TR_CACHE_MAX_MB * 1024 * 1024,
+            )
+        )
+    if config.TR_CACHE_BACKEND == "mongo":
+        client = MongoDBAsyncClient(
+            config.TR_CACHE_MONGO_URI, config.TR_CACHE_MONGO_DB_NAME
+        )
+        if not await client.connect():
+            logger.error("Failed to connect to the cache MongoDB, cache disabled")
+            return None
+        return TranscriptionCache(
+            MongoTranscriptionCache(
+                client,
+                config.TR_CACHE_MONGO_COLLECTION,
+                max_entries=config.TR_CACHE_MAX_ENTRIES,
+            )
+        )
+    return None
+
+
 async def main():
     logger.info("Starting transparency_recording service...")
     bootstrap_servers = rf"{config.TR_KAFKA_HOST}:{config.TR_KAFKA_PORT}"
@@ -18,6 +57,11 @@ async def main():
     # Initialize Kafka producer and consumer
     producer = KafkaProducerAsync(
         bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
+        topic_codecs=parse_topic_codecs(config.KAFKA_TOPIC_CODECS),
+        default_codec=config.KAFKA_DEFAULT_CODEC,
+        envelope_version=config.KAFKA_ENVELOPE_VERSION,
+        topic_compression=parse_topic_compression(config.KAFKA_TOPIC_COMPRESSION),
     )
 
     try:
@@ -30,76 +74,114 @@ async def main():
     consumer = KafkaConsumerAsync(
         [config.TR_KAFKA_TOPIC_IN],
         bootstrap_servers=bootstrap_servers,
+        backend=config.KAFKA_BACKEND,
         group_id=config.TR_KAFKA_GROUP_ID,
+        retry_policy=RetryPolicy(
+            max_attempts=config.KAFKA_RETRY_MAX_ATTEMPTS,
+            initial_backoff_ms=config.KAFKA_RETRY_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.KAFKA_RETRY_MAX_BACKOFF_MS,
+        ),
+        dead_letter_producer=producer,
+        dead_letter_topic=config.TR_KAFKA_TOPIC_DLQ,
+        enable_auto_commit=False,
     )
 
     try:
-        await producer.start()
         await consumer.start()
         logger.info("Kafka producer and consumer started successfully")
     except Exception as e:
         logger.error(f"Failed to start Kafka: {e}")
         return
 
-    sst = WhisperService(
-        model_name=config.TR_MODEL_NAME,
-        download_root=rf"{config.TR_DOWNLOAD_ROOT}",
+    audio_cache = (
+        DecodedAudioCache(
+            config.TR_AUDIO_CACHE_DIR,
+            max_bytes=config.TR_AUDIO_CACHE_MAX_MB * 1024 * 1024,
+        )
+        if config.TR_AUDIO_CACHE_DIR
+        else None
+    )
+
+    def create_pool(model_name: str) -> WhisperPool:
+        return WhisperPool(
+            model_name=model_name,
+            download_root=rf"{config.TR_DOWNLOAD_ROOT}",
+            workers=config.TR_WHISPER_WORKERS,
+            quantization=config.TR_WHISPER_QUANTIZATION,
+            batch_size=config.TR_BATCH_SIZE,
+            batch_wait_ms=config.TR_BATCH_WAIT_MS,
+            threads_per_worker=config.TR_THREADS_PER_WORKER,
+            cpu_affinity=config.TR_CPU_AFFINITY,
+            audio_cache=audio_cache,
+        )
+
+    sst = create_pool(config.TR_MODEL_NAME)
+    sst.start()
+    # פרופילים עם מודל אחר מקבלים pool משלהם (מופעל רק בשימוש הראשון)
+    pools = {
+        options["model"]: create_pool(options["model"])
+        for options in config.TR_PROFILES.values()
+        if options.get("model") and options["model"] != config.TR_MODEL_NAME
+    }
+
+    async def queue_lag() -> int:
+        return sum((await consumer.get_lag()).values())
+
+    profiles = ProfileSelector(
+        config.TR_PROFILES,
+        default_profile=config.TR_DEFAULT_PROFILE,
+        backlog_profile=config.TR_BACKLOG_PROFILE or None,
+        high_lag=config.TR_BACKLOG_HIGH_LAG,
+        low_lag=config.TR_BACKLOG_LOW_LAG,
+        lag_source=queue_lag,
+        interval_seconds=config.TR_BACKLOG_CHECK_SECONDS,
     )
+    profiles_task = asyncio.ensure_future(profiles.run())
     tr = Transparency(
         sst=sst,
         producer=producer,
+        cache=await create_cache(),
+        chunk_seconds=config.TR_CHUNK_SECONDS,
+        chunk_search_seconds=config.TR_CHUNK_SEARCH_SECONDS,
+        language=config.TR_LANGUAGE or None,
+        detect_language=config.TR_LANGUAGE_DETECT,
+        profiles=profiles,
+        pools=pools,
     )
 
-    # Performance tracking variables
-    message_count = 0
-    processed_in_batch = 0
-    last_stats_time = time.time()
-    logger.info("Starting main processing loop")
-
-    while True:
-        try:
-            async for data in consumer.consume():
-                logger.debug(f"Received data: {data}")
-                topic = data["topic"]
-                key = data["key"]
-                path = data["value"]["data"]
-                message_count += 1
-                processed_in_batch += 1
-
-                logger.debug(
-                    f"Processing message #{message_count} from topic '{topic}'"
-                )
-
-                # Track processing time for each message
-                process_start_time = time.time()
-                result = await tr.transcribe(
-                    file_path=path,
-                    file_hash=key,
-                )
-                processing_time = time.time() - process_start_time
-                logger.debug(f"Result: {result}")
-                logger.info(f"Processed file {key} in {processing_time:.3f}s")
-
-                # Print statistics every 60 seconds
-                current_time = time.time()
-                if current_time - last_stats_time > 60:
-                    rate = processed_in_batch / 60
-                    logger.info(
-                        f"Processing rate: {rate:.2f} messages/second | Total processed: {message_count}"
-                    )
-
-                    last_stats_time = current_time
-                    processed_in_batch = 0
-
-                # Log every 100 messages for general tracking
-                if message_count % 100 == 0:
-                    logger.info(f"Milestone: Processed {message_count} total messages")
-
-        except Exception as e:
-            logger.error(f"Error consuming messages from Kafka: {e}")
-
-        # Sleep between batches to prevent overwhelming the system
-        await asyncio.sleep(5)
+    async def handle(data: dict) -> bool:
+        logger.debug(f"Received data: {data}")
+        profile = data["headers"].get(PROFILE_HEADER)
+        result = await tr.transcribe(
+            file_path=data["value"]["data"],
+            file_hash=data["key"],
+            profile=profile.decode("utf-8") if profile else None,
+        )
+        logger.debug(f"Result: {result}")
+        return True
+
+    runtime = WorkerRuntime(
+        "transcription",
+        consumer,
+        handler=handle,
+        concurrency=config.TR_CONCURRENCY,
+        stats_interval_seconds=config.WORKER_STATS_INTERVAL_SECONDS,
+        drain_timeout_seconds=config.WORKER_DRAIN_TIMEOUT_SECONDS,
+        restart_policy=RetryPolicy(
+            initial_backoff_ms=config.WORKER_RESTART_INITIAL_BACKOFF_MS,
+            max_backoff_ms=config.WORKER_RESTART_MAX_BACKOFF_MS,
+        ),
+        metrics_port=config.TR_METRICS_PORT,
+    )
+    try:
+        await runtime.run()
+    finally:
+        profiles_task.cancel()
+        await consumer.stop()
+        await sst.close()
+        for pool in pools.values():
+            await pool.close()
+        await producer.stop()
 
 
 if __name__ == "__main__":
@@ -1,43 +1,194 @@
+from functools import partial
+from typing import Dict
+
 import config
 from utilities.kafka.async_client import KafkaProducerAsync
 from utilities.logger import Logger
-from utilities.sst.whisper_service import WhisperService
+from utilities.sst.options import LANGUAGE_HEADER, TRANSCRIBE_OPTIONS
+from utilities.sst.profiles import ProfileSelector
+from utilities.sst.segments import compact_segments
+from utilities.sst.transcription_cache import TranscriptionCache, make_cache_key
+from utilities.sst.whisper_pool import WhisperPool
 
 logger = Logger.get_logger()
 
 
 class Transparency:
-    def __init__(self, sst: WhisperService, producer: KafkaProducerAsync):
+    def __init__(
+        self,
+        sst: WhisperPool,
+        producer: KafkaProducerAsync,
+        cache: TranscriptionCache = None,
+        chunk_seconds: float = 0,
+        chunk_search_seconds: float = 0,
+        language: str = None,
+        detect_language: bool = False,
+        profiles: ProfileSelector = None,
+        pools: Dict[str, WhisperPool] = None,
+    ):
+        """
+        Args:
+            sst: ה-pool של Whisper
+            producer: producer לפרסום התמלול
+            cache: cache של תמלולים (None = ללא cache)
+            chunk_seconds: אורך קטע בתמלול מקטעי (0 = תמלול הקובץ בשלמותו)
+            chunk_search_seconds: טווח החיפוש של נקודת שקט סביב כל חיתוך
+            language: שפה קבועה לכל הקבצים (None = זיהוי)
+            detect_language: זיהוי השפה מראש על קטע קצר וקיבוע שלה לכל התמלול
+                (כולל כל הקטעים בתמלול מקטעי)
+            profiles: בחירת פרופיל האיכות לכל תמלול (None = אפשרויות ברירת המחדל)
+            pools: pool לכל מודל נוסף שמופיע בפרופילים (שם מודל -> pool)
+        """
         self.sst = sst
         self.producer = producer
+        self.cache = cache
+        self.chunk_seconds = chunk_seconds
+        self.chunk_search_seconds = chunk_search_seconds
+        self.language = language
+        self.detect_language = detect_language
+        self.profiles = profiles
+        self.pools = pools or {}
 
-    async def transcribe(self, file_path, file_hash: str, **kwargs):
-        logger.info(f"Transcribing file: {file_path}")
-        try:
-            transcription = self.sst.whisper_transcribe(file_path, file_hash, **kwargs)
-            logger.debug(f"Transcription result: {transcription}")
-        except Exception as e:
-            logger.error(f"Transcription failed: {e}")
-            raise
+    async def _publish(self, file_hash: str, transcription: dict):
         try:
             result = await self.producer.send_message(
                 topic=rf"{config.TR_KAFKA_TOPIC_OUT}",
                 key=file_hash,
                 message=transcription,
+                headers=[(LANGUAGE_HEADER, str(transcription["language"]).encode())],
             )
             logger.debug(f"Result: {result}")
         except Exception as e:
             logger.error(f"Failed to send message to Kafka: {e}")
             raise
+        if not result:
+            # ה-handler נכשל כדי שההודעה תעבור ל-retry / dead-letter. התמלול כבר
+            # ב-cache (אם מוגדר), כך שניסיון חוזר לא מריץ את Whisper שוב
+            raise RuntimeError(f"Failed to publish the transcription of {file_hash}")
         return result
 
+    async def _publish_partial(
+        self, transcription: dict, done: int, total: int, profile: str = None
+    ):
+        # כל עדכון חלקי מכיל את כל ה-segments מתחילת הקובץ (ה-upsert באינדקס מחליף אותם)
+        logger.info(f"Publishing partial transcription: {done}/{total} chunks")
+        try:
+            await self._publish(
+                transcription["file_hash"],
+                {
+                    **transcription,
+                    "segments": compact_segments(transcription["segments"]),
+                    "transcription_status": "partial",
+                    "transcription_profile": profile,
+                    "chunks_done": done,
+                    "chunks_total": total,
+                },
+            )
+        except Exception as e:
+            # עדכון חלקי שנכשל לא עוצר את התמלול - התוצאה המלאה תפורסם בסוף
+            logger.warning(f"Failed to publish a partial transcription: {e}")
+
+    def _select_profile(self, profile: str = None):
+        """
+        Returns:
+            (שם הפרופיל, ה-pool של המודל שלו, אפשרויות ה-Whisper שלו)
+        """
+        if not self.profiles:
+            return None, self.sst, {}
+        name, options = self.profiles.resolve(profile)
+        options = dict(options)
+        model = options.pop("model", None)
+        sst = self.pools.get(model, self.sst) if model else self.sst
+        return name, sst, options
+
+    async def transcribe(
+        self, file_path, file_hash: str, profile: str = None, **kwargs
+    ):
+        profile, sst, options = self._select_profile(profile)
+        kwargs = {**options, **kwargs}
+        if self.language:
+            kwargs.setdefault("language", self.language)
+        transcription = None
+        if self.cache:
+            # החיתוך לקטעים משנה את גבולות ה-segments ואת הטקסט - חלק מהמפתח
+            cache_key = make_cache_key(
+                file_hash,
+                sst.model_id,
+                {
+                    **TRANSCRIBE_OPTIONS,
+                    **kwargs,
+                    "chunk_seconds": self.chunk_seconds,
+                    "chunk_search_seconds": (
+                        self.chunk_search_seconds if self.chunk_seconds else 0
+                    ),
+                },
+            )
+            transcription = await self.cache.get(cache_key)
+            if transcription is not None:
+                logger.info(f"Using cached transcription for: {file_hash}")
+
+        if transcription is None:
+            logger.info(f"Transcribing file: {file_path} (profile: {profile})")
+            try:
+                if self.detect_language and "language" not in kwargs:
+                    # השפה שמזוהה תלויה רק בקובץ ובמודל - לא נכנסת למפתח ה-cache
+                    language, probability = await sst.detect_language(
+                        file_path, file_hash
+                    )
+                    logger.info(
+                        f"Pre-detected language: {language} ({probability:.2f})"
+                    )
+                    kwargs = {**kwargs, "language": language}
+                if self.chunk_seconds:
+                    transcription = await sst.transcribe_chunked(
+                        file_path,
+                        file_hash,
+                        self.chunk_seconds,
+                        self.chunk_search_seconds,
+                        on_progress=partial(self._publish_partial, profile=profile),
+                        **kwargs,
+                    )
+                else:
+                    transcription = await sst.whisper_transcribe(
+                        file_path, file_hash, **kwargs
+                    )
+                logger.debug(f"Transcription result: {transcription}")
+            except Exception as e:
+                logger.error(f"Transcription failed: {e}")
+                raise
+            # segments נשמרים ונשלחים בפורמט העמודות (cache, Kafka, אינדקס)
+            transcription = {
+                **transcription,
+                "segments": compact_segments(transcription["segments"]),
+            }
+            if self.cache:
+                await self.cache.put(cache_key, transcription)
+        return await self._publish(
+            file_hash,
+            {
+                **transcription,
+                "transcription_status": "complete",
+                "transcription_profile": profile,
+            },
+        )
+
 
 if __name__ == "__main__":
-    transparency = Transparency(
-        sst=WhisperService(model_name="tiny", download_root=r"C:\models\whisper"),
-        producer=KafkaProducerAsync(
+    import asyncio
+
+    async def run():
+        producer = KafkaProducerAsync(
             bootstrap_servers=f"{config.TR_KAFKA_HOST}:{config.TR_KAFKA_PORT}"
-        ),
-    )
-    a = transparency.transcribe(file_path=r"C:\podcasts\download.wav", file_hash="123")
-    print(a)
+        )
+        await producer.start()
+        sst = WhisperPool(model_name="tiny", download_root=r"C:\models\whisper")
+        transparency = Transparency(sst=sst, producer=producer)
+        try:
+            return await transparency.transcribe(
+                file_path=r"C:\podcasts\download.wav", file_hash="123"
+            )
+        finally:
+            await sst.close()
+            await producer.stop()
+
+    print(asyncio.run(run()))
@@ -1,6 +1,6 @@
 import logging
 from datetime import datetime, timezone
-from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Tuple
 
 from elasticsearch import AsyncElasticsearch
 from elasticsearch.exceptions import NotFoundError
@@ -92,6 +92,30 @@ class ElasticsearchService:
             logger.error(f"Failed to update document {doc_id}: {e}")
             raise
 
+    async def bulk_upsert_documents(
+        self, documents: List[Tuple[str, Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Upsert many (doc_id, update_data) pairs in a single bulk request.
+        Pairs are applied in order, so several partial updates of the same
+        document are merged like consecutive update_document calls.
+        """
+        now = datetime.now(timezone.utc)
+        actions = []
+        for doc_id, update_data in documents:
+            update_dict = {k: v for k, v in update_data.items() if v is not None}
+            update_dict["updated_at"] = now
+            actions.append(
+                {
+                    "_op_type": "update",
+                    "_index": self.index_name,
+                    "_id": doc_id,
+                    "doc": update_dict,
+                    "doc_as_upsert": True,
+                }
+            )
+        return await self.bulk_update(actions)
+
     @staticmethod
     def _build_query(
         query_text: Optional[str] = None,
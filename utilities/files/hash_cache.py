@@ -0,0 +1,164 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# קובץ ששונה בשניות האחרונות לא נשמר - כתיבה נוספת באותה יחידת זמן של
+# מערכת הקבצים לא הייתה משנה את ה-mtime, וה-hash השמור היה מתיישן
+RACY_SECONDS = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (path, algorithm)
+);
+CREATE INDEX IF NOT EXISTS file_hashes_used_at ON file_hashes (used_at);
+"""
+
+
+class HashCache:
+    """
+    cache מתמיד (SQLite) של hash לפי קובץ - מפתח: הנתיב המלא (resolved) והאלגוריתם,
+    והרשומה תקפה רק כל עוד הגודל, ה-mtime, ה-inode וה-device של הקובץ לא השתנו.
+    בקובץ שלא השתנה - stat אחד במקום קריאת כל התוכן.
+    מוגבל במספר רשומות, פינוי לפי LRU (used_at)
+
+    בטוח לשימוש מכמה threads (חיבור אחד מוגן ב-lock)
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 100000):
+        """
+        Args:
+            db_path: קובץ מסד הנתונים (התיקייה נוצרת אם צריך)
+            max_entries: מספר הרשומות המקסימלי
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._entries = self._connection.execute(
+            "SELECT COUNT(*) FROM file_hashes"
+        ).fetchone()[0]
+        logger.info(f"Hash cache {db_path}: {self._entries} entries")
+
+    @staticmethod
+    def resolve(file_path: str) -> str:
+        return str(Path(file_path).resolve())
+
+    def get(self, path: str, algorithm: str, stat: os.stat_result) -> Optional[str]:
+        """
+        ה-hash השמור, אם הקובץ לא השתנה מאז שנשמר
+        רשומה שלא תואמת ל-stat הנוכחי נמחקת
+
+        Args:
+            path: נתיב resolved (ראו resolve)
+            algorithm: אלגוריתם ה-hash
+            stat: תוצאת os.stat של הקובץ עכשיו
+
+        Returns:
+            ה-hash או None
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, inode, device, digest FROM file_hashes"
+                " WHERE path = ? AND algorithm = ?",
+                (path, algorithm),
+            ).fetchone()
+            if row is None:
+                return None
+            if tuple(row[:4]) != (
+                stat.st_size,
+                stat.st_mtime_ns,
+                stat.st_ino,
+                stat.st_dev,
+            ):
+                self._connection.execute(
+                    "DELETE FROM file_hashes WHERE path = ? AND algorithm = ?",
+                    (path, algorithm),
+                )
+                self._entries -= 1
+                return None
+            self._connection.execute(
+                "UPDATE file_hashes SET used_at = ? WHERE path = ? AND algorithm = ?",
+                (time.time(), path, algorithm),
+            )
+            return row[4]
+
+    def put(self, path: str, algorithm: str, stat: os.stat_result, digest: str):
+        """
+        שמירת ה-hash של הקובץ לפי ה-stat שנלקח לפני הקריאה
+        קובץ ששונה ממש עכשיו (RACY_SECONDS) לא נשמר
+        """
+        now = time.time()
+        if now - stat.st_mtime_ns / 1e9 < RACY_SECONDS:
+            return
+        with self._lock:
+            exists = self._connection.execute(
+                "SELECT 1 FROM file_hashes WHERE path = ? AND algorithm = ?",
+                (path, algorithm),
+            ).fetchone()
+            self._connection.execute(
+                "INSERT INTO file_hashes"
+                " (path, algorithm, size, mtime_ns, inode, device, digest, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (path, algorithm) DO UPDATE SET size = excluded.size,"
+                " mtime_ns = excluded.mtime_ns, inode = excluded.inode,"
+                " device = excluded.device, digest = excluded.digest,"
+                " used_at = excluded.used_at",
+                (
+                    path,
+                    algorithm,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    stat.st_ino,
+                    stat.st_dev,
+                    digest,
+                    now,
+                ),
+            )
+            if not exists:
+                self._entries += 1
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """פינוי הרשומות הישנות ביותר עד 90% מהגבול (כדי לא לפנות בכל put)"""
+        target = int(self.max_entries * 0.9)
+        excess = self._entries - target
+        self._connection.execute(
+            "DELETE FROM file_hashes WHERE rowid IN"
+            " (SELECT rowid FROM file_hashes ORDER BY used_at LIMIT ?)",
+            (excess,),
+        )
+        logger.debug(f"Evicted {excess} entries from the hash cache")
+        self._entries = target
+
+    def invalidate(self, file_path: str):
+        """מחיקת הרשומות של קובץ (כל האלגוריתמים)"""
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM file_hashes WHERE path = ?", (self.resolve(file_path),)
+            )
+            self._entries -= cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from utilities.files.hash_cache import HashCache
+from utilities.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALGORITHM = "sha256"
+# באפרים גדולים - פחות קריאות מערכת ופחות מעברים בין Python ל-C לכל קובץ
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+HASHED_BYTES = Counter("file_hash_bytes_total", "Bytes read for file hashing")
+HASH_SECONDS = Histogram(
+    "file_hash_seconds",
+    "Time to hash one file (excluding the wait for a hashing thread)",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+HASH_CACHE_REQUESTS = Counter(
+    "file_hash_cache_requests_total",
+    "File hash cache lookups by result (hit / miss)",
+    ["result"],
+)
+
+
+def hash_file(
+    file_path: str,
+    algorithm: str = DEFAULT_ALGORITHM,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+) -> str:
+    """
+    hash של תוכן הקובץ, בקריאה לבאפר אחד שמשמש שוב ושוב (readinto, בלי העתקות)
+    hashlib משחרר את ה-GIL בעדכונים גדולים, כך שכמה threads מחשבים במקביל
+
+    Raises:
+        OSError: אם אי אפשר לקרוא את הקובץ
+    """
+    hasher = hashlib.new(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            hasher.update(view[:size])
+    return hasher.hexdigest()
+
+
+def _same_file(before: os.stat_result, after: os.stat_result) -> bool:
+    return (before.st_size, before.st_mtime_ns, before.st_ino, before.st_dev) == (
+        after.st_size,
+        after.st_mtime_ns,
+        after.st_ino,
+        after.st_dev,
+    )
+
+
+def _hash_with_cache(
+    file_path: str, algorithm: str, buffer_size: int, cache: Optional[HashCache]
+) -> Tuple[str, Optional[float], int]:
+    """
+    hash של הקובץ - מה-cache אם הקובץ לא השתנה (stat אחד), אחרת קריאה מלאה
+    ושמירה ב-cache, רק אם הקובץ לא השתנה בזמן הקריאה
+
+    Returns:
+        (hash, זמן החישוב או None אם נלקח מה-cache, בתים שנקראו)
+    """
+    if cache is None:
+        start = time.perf_counter()
+        digest = hash_file(file_path, algorithm, buffer_size)
+        return digest, time.perf_counter() - start, os.path.getsize(file_path)
+
+    path = HashCache.resolve(file_path)
+    before = os.stat(path)
+    digest = cache.get(path, algorithm, before)
+    if digest is not None:
+        return digest, None, 0
+    start = time.perf_counter()
+    digest = hash_file(path, algorithm, buffer_size)
+    seconds = time.perf_counter() - start
+    if _same_file(before, os.stat(path)):
+        cache.put(path, algorithm, before, digest)
+    else:
+        logger.debug(f"File {path} changed while hashing, not caching its hash")
+    return digest, seconds, before.st_size
+
+
+class FileHasher:
+    """
+    חישוב hash של קבצים ב-thread pool, מחוץ ל-event loop
+    מספר הקבצים שנקראים במקביל מוגבל ל-concurrency (לפי רוחב הפס של הדיסק).
+    עם HashCache, קובץ שלא השתנה מאז החישוב הקודם לא נקרא שוב
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        algorithm: str = DEFAULT_ALGORITHM,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        cache: Optional[HashCache] = None,
+    ):
+        """
+        Args:
+            concurrency: מספר הקבצים שנקראים במקביל
+            algorithm: אלגוריתם ה-hash (שם של hashlib)
+            buffer_size: גודל באפר הקריאה בבתים
+            cache: cache מתמיד של hash לפי קובץ (None = קריאה מלאה בכל פעם)
+        """
+        self.algorithm = algorithm
+        self.buffer_size = buffer_size
+        self.cache = cache
+        self._executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(
+            max_workers=max(1, concurrency), thread_name_prefix="file-hash"
+        )
+
+    async def hash(self, file_path: str) -> str:
+        """
+        hash של הקובץ (hex)
+
+        Raises:
+            OSError: אם אי אפשר לקרוא את הקובץ
+        """
+        digest, seconds, size = await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            _hash_with_cache,
+            file_path,
+            self.algorithm,
+            self.buffer_size,
+            self.cache,
+        )
+        # המדדים מתעדכנים ב-event loop ולא ב-threads
+        if self.cache is not None:
+            HASH_CACHE_REQUESTS.labels("hit" if seconds is None else "miss").inc()
+        if seconds is not None:
+            HASH_SECONDS.observe(seconds)
+            HASHED_BYTES.inc(size)
+        return digest
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
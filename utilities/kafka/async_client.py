@@ -1,15 +1,45 @@
 import asyncio
+import base64
 import logging
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer, TopicPartition
 from aiokafka.errors import KafkaError
+from aiokafka.partitioner import DefaultPartitioner
 
-from .json_helpers import create_kafka_message, deserialize_json, serialize_json
+from .codecs import CODEC_HEADER, DEFAULT_CODEC, decode_payload, get_codec
+from .json_helpers import (
+    ENVELOPE_V1,
+    ENVELOPE_V2,
+    create_kafka_headers,
+    create_kafka_message,
+    read_kafka_message,
+)
+from .memory_broker import MemoryKafkaConsumer, MemoryKafkaProducer
+from .offset_tracker import OffsetTracker
+from .retry import RetryPolicy, create_dead_letter_message
 
 logger = logging.getLogger(__name__)
 
+# "kafka" - ברוקר אמיתי, "memory" - ברוקר בזיכרון של התהליך (memory_broker)
+KAFKA_BACKEND = "kafka"
+MEMORY_BACKEND = "memory"
+_PRODUCER_CLASSES = {
+    KAFKA_BACKEND: AIOKafkaProducer,
+    MEMORY_BACKEND: MemoryKafkaProducer,
+}
+_CONSUMER_CLASSES = {
+    KAFKA_BACKEND: AIOKafkaConsumer,
+    MEMORY_BACKEND: MemoryKafkaConsumer,
+}
+
+
+def _backend_class(classes: Dict[str, type], backend: str) -> type:
+    if backend not in classes:
+        raise ValueError(f"Unknown Kafka backend: {backend}")
+    return classes[backend]
+
 
 class KafkaProducerAsync:
     """
@@ -17,27 +47,75 @@ class KafkaProducerAsync:
     לשליחת הודעות ב-async/await
     """
 
-    def __init__(self, bootstrap_servers: str = "localhost:9092", **config):
+    def __init__(
+        self,
+        bootstrap_servers: str = "localhost:9092",
+        max_in_flight: int = 1000,
+        linger_ms: int = 0,
+        max_batch_size: int = 16384,
+        topic_codecs: Optional[Dict[str, str]] = None,
+        default_codec: str = DEFAULT_CODEC,
+        envelope_version: str = ENVELOPE_V1,
+        topic_compression: Optional[Dict[str, str]] = None,
+        backend: str = KAFKA_BACKEND,
+        **config,
+    ):
         """
         יצירת Producer אסינכרוני
 
         Args:
             bootstrap_servers: כתובת שרתי Kafka
+            max_in_flight: מספר מקסימלי של שליחות pipelined שטרם אושרו
+            linger_ms: זמן המתנה לצבירת הודעות ל-batch לפני שליחה לברוקר
+            max_batch_size: גודל batch מקסימלי (bytes) לכל partition
+            topic_codecs: codec לכל topic (json / orjson / msgpack)
+            default_codec: codec ל-topics שלא הוגדרו ב-topic_codecs
+            envelope_version: גרסת המעטפת - "1.0" (metadata בגוף ההודעה)
+                או "2.0" (metadata ב-headers, בגוף רק ה-payload)
+            topic_compression: סוג דחיסה לכל topic (gzip / snappy / lz4 / zstd)
+                topics אחרים משתמשים ב-compression_type מתוך config
+            backend: "kafka" או "memory" (ברוקר בזיכרון, ללא תשתית)
             **config: הגדרות נוספות
         """
         self.bootstrap_servers = bootstrap_servers
+        self.max_in_flight = max_in_flight
+        self.backend = backend
+        producer_class = _backend_class(_PRODUCER_CLASSES, backend)
+        # בדיקה מוקדמת שכל ה-codecs קיימים ומותקנים
+        self._topic_codecs = {
+            topic: get_codec(name) for topic, name in (topic_codecs or {}).items()
+        }
+        self._default_codec = get_codec(default_codec)
+        if envelope_version not in (ENVELOPE_V1, ENVELOPE_V2):
+            raise ValueError(f"Unknown envelope version: {envelope_version}")
+        self.envelope_version = envelope_version
 
         self._default_config = {
             "bootstrap_servers": rf"{bootstrap_servers}",
-            "value_serializer": lambda x: serialize_json(x).encode("utf-8"),
             "key_serializer": lambda x: x.encode("utf-8") if x else None,
             "acks": "all",
+            "linger_ms": linger_ms,
+            "max_batch_size": max_batch_size,
         }
         self._default_config.update(config)
         logger.debug(f"Producer config: {self._default_config}")
-        self.producer = AIOKafkaProducer(**self._default_config)
+        self.producer = producer_class(**self._default_config)
         logger.debug("Producer created")
 
+        # הדחיסה נקבעת ברמת ה-producer, לכן לכל סוג דחיסה יש producer משלו
+        default_compression = self._default_config.get("compression_type")
+        self._topic_compression = dict(topic_compression or {})
+        self._producers = {default_compression: self.producer}
+        for compression_type in set(self._topic_compression.values()):
+            if compression_type not in self._producers:
+                self._producers[compression_type] = producer_class(
+                    **{**self._default_config, "compression_type": compression_type}
+                )
+                logger.debug(f"Producer created for compression '{compression_type}'")
+
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._pending: set = set()
+
         self.is_started = False
         logger.info("Async Kafka Producer created")
 
@@ -46,7 +124,8 @@ class KafkaProducerAsync:
         logger.debug("Starting producer...")
         if not self.is_started:
             try:
-                await self.producer.start()
+                for producer in self._producers.values():
+                    await producer.start()
                 logger.debug("Producer started")
                 self.is_started = True
                 logger.info("Async Kafka Producer started")
@@ -61,17 +140,134 @@ class KafkaProducerAsync:
         """עצירת ה-Producer"""
         if self.is_started:
             try:
-                await self.producer.stop()
+                await self.flush()
+                for producer in self._producers.values():
+                    await producer.stop()
                 self.is_started = False
                 logger.info("Async Kafka Producer stopped")
             except Exception as e:
                 logger.error(f"Error stopping Async Producer: {e}")
 
+    async def flush(self):
+        """
+        שליחת כל ההודעות שבתור והמתנה לאישור כל השליחות ה-pipelined
+        """
+        if not self.is_started:
+            return
+        for producer in self._producers.values():
+            await producer.flush()
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        logger.debug("Producer flushed")
+
     def get_config(self):
         return self._default_config
 
+    def _producer_for(self, topic: str) -> AIOKafkaProducer:
+        """ה-producer המתאים לסוג הדחיסה של ה-topic"""
+        return self._producers[
+            self._topic_compression.get(
+                topic, self._default_config.get("compression_type")
+            )
+        ]
+
+    def _build_record(
+        self,
+        topic: str,
+        message: Any,
+        key: Optional[str],
+        extra_headers: Optional[List[Tuple[str, bytes]]] = None,
+    ) -> tuple:
+        """
+        בניית רשומה לשליחה: מעטפה לפי envelope_version וקידוד לפי ה-codec של ה-topic
+        extra_headers מתווספים לרשומה (למשל לניתוב בלי לפענח את ההודעה)
+
+        Returns:
+            (bytes של ההודעה, headers, message_id)
+        """
+        if self.envelope_version == ENVELOPE_V1:
+            body = create_kafka_message(topic, message, key)
+            headers = []
+            message_id = body["message_id"]
+        else:
+            body = message
+            headers = create_kafka_headers(topic)
+            message_id = headers[0][1].decode("utf-8")
+
+        codec = self._topic_codecs.get(topic, self._default_codec)
+        headers.append((CODEC_HEADER, codec.name.encode("utf-8")))
+        headers.extend(extra_headers or ())
+        return codec.encode(body), headers, message_id
+
+    async def send_message_nowait(
+        self,
+        topic: str,
+        message: Any,
+        key: Optional[str] = None,
+        headers: Optional[List[Tuple[str, bytes]]] = None,
+    ) -> "asyncio.Future[bool]":
+        """
+        שליחת הודעה יחידה ב-pipeline - ללא המתנה לאישור הברוקר
+        ממתין רק כאשר מספר השליחות הפתוחות הגיע ל-max_in_flight
+
+        Args:
+            topic: שם ה-topic
+            message: ההודעה לשליחה
+            key: מפתח אופציונלי
+            headers: headers נוספים לרשומה (שם, bytes)
+
+        Returns:
+            Future שמתממש ל-True/False כאשר הברוקר אישר (או דחה) את ההודעה
+        """
+        loop = asyncio.get_running_loop()
+        if not self.is_started:
+            logger.error("Producer is not started. Call start() first.")
+            failed = loop.create_future()
+            failed.set_result(False)
+            return failed
+
+        await self._in_flight.acquire()
+        try:
+            value, headers, message_id = self._build_record(
+                topic, message, key, headers
+            )
+            record_future = await self._producer_for(topic).send(
+                topic, value=value, key=key, headers=headers
+            )
+        except Exception as e:
+            self._in_flight.release()
+            logger.error(f"Failed to send message to '{topic}': {e}")
+            failed = loop.create_future()
+            failed.set_result(False)
+            return failed
+
+        delivery = asyncio.ensure_future(
+            self._await_delivery(topic, message_id, record_future)
+        )
+        self._pending.add(delivery)
+        delivery.add_done_callback(self._pending.discard)
+        return delivery
+
+    async def _await_delivery(
+        self, topic: str, message_id: str, record_future: asyncio.Future
+    ) -> bool:
+        """המתנה לאישור שליחה ושחרור מקום ב-pipeline"""
+        try:
+            await record_future
+            logger.info(f"Message sent to '{topic}': {message_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send message to '{topic}': {e}")
+            return False
+        finally:
+            self._in_flight.release()
+
     async def send_message(
-        self, topic: str, message: Any, key: Optional[str] = None
+        self,
+        topic: str,
+        message: Any,
+        key: Optional[str] = None,
+        headers: Optional[List[Tuple[str, bytes]]] = None,
     ) -> bool:
         """
         שליחת הודעה יחידה (אסינכרונית)
@@ -80,6 +276,7 @@ class KafkaProducerAsync:
             topic: שם ה-topic
             message: ההודעה לשליחה
             key: מפתח אופציונלי
+            headers: headers נוספים לרשומה (שם, bytes)
 
         Returns:
             True אם ההודעה נשלחה בהצלחה
@@ -90,12 +287,16 @@ class KafkaProducerAsync:
 
         try:
             # יצירת הודעה מובנית
-            kafka_message = create_kafka_message(topic, message, key)
+            value, headers, message_id = self._build_record(
+                topic, message, key, headers
+            )
 
             # שליחה אסינכרונית
-            await self.producer.send_and_wait(topic, value=kafka_message, key=key)
+            await self._producer_for(topic).send_and_wait(
+                topic, value=value, key=key, headers=headers
+            )
 
-            logger.info(f"Message sent to '{topic}': {kafka_message['message_id']}")
+            logger.info(f"Message sent to '{topic}': {message_id}")
             return True
 
         except Exception as e:
@@ -103,44 +304,125 @@ class KafkaProducerAsync:
             return False
 
     async def send_batch(
-        self, topic: str, messages: List[Any], keys: Optional[List[str]] = None
-    ) -> int:
+        self,
+        topic: str,
+        messages: List[Any],
+        keys: Optional[List[str]] = None,
+        max_pending_batches: int = 16,
+    ) -> Dict[str, Any]:
         """
-        שליחת מספר הודעות (אסינכרונית)
+        שליחת מספר הודעות כ-batches אמיתיים של הברוקר (אסינכרונית)
+        ההודעות מקובצות לפי partition, וכל batch נשלח בבקשה אחת
 
         Args:
             topic: שם ה-topic
             messages: רשימת הודעות
             keys: רשימת מפתחות (אופציונלי)
+            max_pending_batches: מספר מקסימלי של batches שנשלחו וטרם אושרו
+                (מגביל את צריכת הזיכרון)
 
         Returns:
-            מספר ההודעות שנשלחו בהצלחה
+            Dictionary עם total, successful, failed ו-results
+            (True/False לכל הודעה, לפי סדר ההודעות)
         """
+        results = [False] * len(messages)
         if not self.is_started:
             logger.error("Producer is not started. Call start() first.")
-            return 0
+            return self._batch_summary(topic, results)
+
+        key_serializer = self._default_config["key_serializer"]
+        partitioner = self._default_config.get("partitioner", DefaultPartitioner())
+        producer = self._producer_for(topic)
+
+        try:
+            all_partitions = sorted(await producer.partitions_for(topic))
+        except Exception as e:
+            logger.error(f"Failed to get partitions for '{topic}': {e}")
+            return self._batch_summary(topic, results)
 
-        successful_sends = 0
+        # partition -> (batch פתוח, אינדקסים של ההודעות בתוכו)
+        open_batches: Dict[int, tuple] = {}
+        pending: List[tuple] = []
+
+        async def send_open_batch(partition: int):
+            batch, indexes = open_batches.pop(partition)
+            if len(pending) >= max_pending_batches:
+                await wait_batch(*pending.pop(0))
+            try:
+                future = await producer.send_batch(batch, topic, partition=partition)
+                pending.append((future, indexes))
+            except Exception as e:
+                logger.error(f"Failed to send batch to '{topic}'[{partition}]: {e}")
+
+        async def wait_batch(future: asyncio.Future, indexes: List[int]):
+            try:
+                await future
+                for index in indexes:
+                    results[index] = True
+            except Exception as e:
+                logger.error(f"Batch delivery to '{topic}' failed: {e}")
 
-        # שליחה מקבילה
-        tasks = []
         for i, message in enumerate(messages):
             key = keys[i] if keys and i < len(keys) else None
-            task = self.send_message(topic, message, key)
-            tasks.append(task)
+            try:
+                serialized_key = key_serializer(key)
+                serialized_value, headers, _ = self._build_record(topic, message, key)
+            except Exception as e:
+                logger.error(f"Failed to serialize message #{i} for '{topic}': {e}")
+                continue
+
+            partition = partitioner(serialized_key, all_partitions, all_partitions)
+            if partition not in open_batches:
+                open_batches[partition] = (producer.create_batch(), [])
+
+            batch, indexes = open_batches[partition]
+            if batch.append(
+                key=serialized_key,
+                value=serialized_value,
+                timestamp=None,
+                headers=headers,
+            ):
+                indexes.append(i)
+                continue
+
+            # ה-batch מלא - שליחה ופתיחת batch חדש
+            await send_open_batch(partition)
+            batch = producer.create_batch()
+            open_batches[partition] = (batch, [])
+            if batch.append(
+                key=serialized_key,
+                value=serialized_value,
+                timestamp=None,
+                headers=headers,
+            ):
+                open_batches[partition][1].append(i)
+            else:
+                logger.error(f"Message #{i} is larger than max_batch_size, skipped")
+
+        for partition in list(open_batches):
+            if open_batches[partition][1]:
+                await send_open_batch(partition)
+            else:
+                open_batches.pop(partition)
 
-        # המתנה לכל השליחות
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for future, indexes in pending:
+            await wait_batch(future, indexes)
 
-        # ספירת הצלחות
-        for result in results:
-            if result is True:
-                successful_sends += 1
+        return self._batch_summary(topic, results)
 
+    @staticmethod
+    def _batch_summary(topic: str, results: List[bool]) -> Dict[str, Any]:
+        """סיכום תוצאות שליחת batch"""
+        successful_sends = sum(results)
         logger.info(
-            f"Async batch send: {successful_sends}/{len(messages)} messages sent to '{topic}'"
+            f"Async batch send: {successful_sends}/{len(results)} messages sent to '{topic}'"
         )
-        return successful_sends
+        return {
+            "total": len(results),
+            "successful": successful_sends,
+            "failed": len(results) - successful_sends,
+            "results": results,
+        }
 
 
 class KafkaConsumerAsync:
@@ -154,6 +436,10 @@ class KafkaConsumerAsync:
         topics: List[str],
         bootstrap_servers: str = "localhost:9092",
         group_id: str = "default_group",
+        retry_policy: Optional[RetryPolicy] = None,
+        dead_letter_producer: Optional[KafkaProducerAsync] = None,
+        dead_letter_topic: Optional[str] = None,
+        backend: str = KAFKA_BACKEND,
         **config,
     ):
         """
@@ -163,9 +449,16 @@ class KafkaConsumerAsync:
             topics: רשימת topics לעקוב אחריהם
             bootstrap_servers: כתובת שרתי Kafka
             group_id: מזהה קבוצת הconsumers
+            retry_policy: מדיניות ניסיונות חוזרים ל-handlers (ברירת מחדל: ללא)
+            dead_letter_producer: Producer לשליחת הודעות שנכשלו סופית
+            dead_letter_topic: ה-topic להודעות שנכשלו סופית
+            backend: "kafka" או "memory" (ברוקר בזיכרון, ללא תשתית)
             **config: הגדרות נוספות
         """
         self.topics = topics
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=1)
+        self.dead_letter_producer = dead_letter_producer
+        self.dead_letter_topic = dead_letter_topic
         self.bootstrap_servers = bootstrap_servers
         self.group_id = group_id
         self.last_check_time = None
@@ -173,14 +466,18 @@ class KafkaConsumerAsync:
         default_config = {
             "bootstrap_servers": bootstrap_servers,
             "group_id": group_id,
-            "value_deserializer": lambda x: deserialize_json(x.decode("utf-8")),
             "key_deserializer": lambda x: x.decode("utf-8") if x else None,
             "auto_offset_reset": "latest",
         }
         default_config.update(config)
+        self.auto_commit = default_config.get("enable_auto_commit", True)
 
-        self.consumer = AIOKafkaConsumer(*topics, **default_config)
+        self.backend = backend
+        consumer_class = _backend_class(_CONSUMER_CLASSES, backend)
+        self.consumer = consumer_class(*topics, **default_config)
         self.is_started = False
+        self.queue_depth = 0
+        self.paused_partitions: set = set()
         logger.info(f"Async Kafka Consumer created for topics: {topics}")
 
     async def start(self):
@@ -231,21 +528,15 @@ class KafkaConsumerAsync:
             async for message in self.consumer:
                 try:
                     # עיבוד ההודעה
-                    message_data = {
-                        "topic": message.topic,
-                        "partition": message.partition,
-                        "offset": message.offset,
-                        "key": message.key,
-                        "value": message.value,
-                        "timestamp": message.timestamp,
-                        "received_at": datetime.now().isoformat(),
-                    }
-
-                    # קריאה אסינכרונית ל-handler
-                    if asyncio.iscoroutinefunction(message_handler):
-                        success = await message_handler(message_data)
-                    else:
-                        success = message_handler(message_data)
+                    message_data = await self._decode_or_dead_letter(message)
+                    if message_data is None:
+                        continue
+
+                    # קריאה אסינכרונית ל-handler (עם ניסיונות חוזרים)
+                    success = await self._handle_with_retry(
+                        lambda: self._call_handler(message_handler, message_data),
+                        [message_data],
+                    )
 
                     if success:
                         processed_count += 1
@@ -298,16 +589,9 @@ class KafkaConsumerAsync:
                         self.consumer.__anext__(), timeout=1.0
                     )
 
-                    message_data = {
-                        "topic": message.topic,
-                        "partition": message.partition,
-                        "offset": message.offset,
-                        "key": message.key,
-                        "value": message.value,
-                        "timestamp": message.timestamp,
-                        "received_at": datetime.now().isoformat(),
-                    }
-                    new_messages.append(message_data)
+                    message_data = await self._decode_or_dead_letter(message)
+                    if message_data is not None:
+                        new_messages.append(message_data)
 
                 except asyncio.TimeoutError:
                     # אין הודעות חדשות, נמשיך לבדוק
@@ -325,6 +609,569 @@ class KafkaConsumerAsync:
         logger.info(f"Retrieved {len(new_messages)} new messages")
         return new_messages  # ⭐ FIXED: הוספתי את השורה החסרה!
 
+    @staticmethod
+    def _to_message_dict(message) -> Dict[str, Any]:
+        """
+        המרת ConsumerRecord ל-dictionary אחיד
+        (כולל פענוח לפי ה-codec ותאימות לשתי גרסאות המעטפת)
+        """
+        headers = dict(message.headers or ())
+        value = decode_payload(message.value, headers)
+        return {
+            "topic": message.topic,
+            "partition": message.partition,
+            "offset": message.offset,
+            "key": message.key,
+            "value": read_kafka_message(
+                value, headers, message.topic, message.key, message.timestamp
+            ),
+            "headers": headers,
+            "timestamp": message.timestamp,
+            "received_at": datetime.now().isoformat(),
+        }
+
+    async def _decode_or_dead_letter(self, message) -> Optional[Dict[str, Any]]:
+        """
+        פענוח רשומה - רשומה שלא ניתן לפענח נשלחת ל-dead-letter topic
+        (עם ה-bytes המקוריים ב-base64) ומדולגת
+
+        Returns:
+            ההודעה המפוענחת, או None אם הפענוח נכשל
+        """
+        try:
+            return self._to_message_dict(message)
+        except Exception as e:
+            logger.error(
+                f"Failed to decode message {message.topic}[{message.partition}]"
+                f"@{message.offset}: {e}"
+            )
+            raw_message = {
+                "topic": message.topic,
+                "partition": message.partition,
+                "offset": message.offset,
+                "key": message.key,
+                "value": None,
+                "raw_value": (
+                    base64.b64encode(message.value).decode("ascii")
+                    if message.value is not None
+                    else None
+                ),
+                "headers": dict(message.headers or ()),
+                "timestamp": message.timestamp,
+            }
+            await self._dead_letter([raw_message], e, attempts=0)
+            return None
+
+    async def get_batch(
+        self, max_records: int = 500, max_wait_ms: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        משיכת מנה אחת של הודעות עם getmany (אסינכרונית)
+
+        Args:
+            max_records: מספר מקסימלי של הודעות במנה
+            max_wait_ms: זמן המתנה מקסימלי להודעות (מילישניות)
+
+        Returns:
+            Dictionary עם records (רשימת הודעות) ו-offsets
+            (טווח ה-offsets שהמנה מכסה לכל partition)
+        """
+        if not self.is_started:
+            logger.error("Consumer is not started. Call start() first.")
+            return {"records": [], "offsets": []}
+
+        fetched = await self.consumer.getmany(
+            timeout_ms=max_wait_ms, max_records=max_records
+        )
+
+        records = []
+        offsets = []
+        for tp, messages in fetched.items():
+            if not messages:
+                continue
+            for message in messages:
+                message_data = await self._decode_or_dead_letter(message)
+                if message_data is not None:
+                    records.append(message_data)
+            offsets.append(
+                {
+                    "topic": tp.topic,
+                    "partition": tp.partition,
+                    "first_offset": messages[0].offset,
+                    "last_offset": messages[-1].offset,
+                }
+            )
+
+        if records:
+            logger.debug(
+                f"Fetched batch of {len(records)} messages from {len(offsets)} partitions"
+            )
+        return {"records": records, "offsets": offsets}
+
+    async def consume_batch(self, max_records: int = 500, max_wait_ms: int = 1000):
+        """
+        צריכת הודעות במנות (אסינכרונית) - generator שמחזיר מנה בכל פעם
+        לשימוש עם: async for batch in consumer.consume_batch():
+
+        Args:
+            max_records: מספר מקסימלי של הודעות במנה
+            max_wait_ms: זמן המתנה מקסימלי למנה (מילישניות)
+
+        Yields:
+            Dictionary עם records ו-offsets (ראה get_batch)
+        """
+        if not self.is_started:
+            logger.error("Consumer is not started. Call start() first.")
+            return
+
+        try:
+            while True:
+                batch = await self.get_batch(max_records, max_wait_ms)
+                if batch["records"]:
+                    yield batch
+        except Exception as e:
+            logger.error(f"Error in async consume_batch: {e}")
+            return
+
+    async def listen_batches(
+        self,
+        batch_handler: Callable[[List[Dict], List[Dict]], Any],
+        max_records: int = 500,
+        max_wait_ms: int = 1000,
+        concurrency: int = 1,
+        commit_interval_ms: int = 5000,
+        stop_event: Optional[asyncio.Event] = None,
+    ) -> int:
+        """
+        האזנה תמידית להודעות במנות עם callback function (אסינכרונית)
+        עם enable_auto_commit=False ה-commit מתבצע רק עד המנה הנמוכה ביותר
+        שהסתיימה ברצף בכל partition
+
+        Args:
+            batch_handler: פונקציה שמקבלת (records, offsets) לכל מנה
+            max_records: מספר מקסימלי של הודעות במנה
+            max_wait_ms: זמן המתנה מקסימלי למנה (מילישניות)
+            concurrency: מספר המנות שמעובדות במקביל (הסדר בין מנות לא נשמר)
+            commit_interval_ms: תדירות ה-commit (מילישניות)
+            stop_event: כאשר מסומן - מפסיקים למשוך, מסיימים את המנות שבעיבוד
+                ועושים commit אחרון
+
+        Returns:
+            מספר ההודעות שעובדו
+        """
+        if not self.is_started:
+            logger.error("Consumer is not started. Call start() first.")
+            return 0
+
+        tracker = OffsetTracker()
+        workers = asyncio.Semaphore(concurrency)
+        tasks: set = set()
+        counters = {"processed": 0}
+        loop = asyncio.get_running_loop()
+        last_commit_time = loop.time()
+
+        async def run(batch: Dict[str, Any]):
+            try:
+                counters["processed"] += await self._process_batch(batch_handler, batch)
+            except Exception as e:
+                logger.error(f"Error processing batch: {e}")
+            finally:
+                for record in batch["records"]:
+                    tracker.done(record["topic"], record["partition"], record["offset"])
+                self.queue_depth = tracker.in_flight_count()
+                workers.release()
+
+        try:
+            while not (stop_event and stop_event.is_set()):
+                await workers.acquire()
+                try:
+                    batch = await self.get_batch(max_records, max_wait_ms)
+                except BaseException:
+                    workers.release()
+                    raise
+                for record in batch["records"]:
+                    tracker.start(
+                        record["topic"], record["partition"], record["offset"]
+                    )
+                # הודעות שלא פוענחו (ונשלחו ל-dead-letter) לא חוסמות את ה-commit
+                for offsets in batch["offsets"]:
+                    tracker.skip(
+                        offsets["topic"], offsets["partition"], offsets["last_offset"]
+                    )
+                self.queue_depth = tracker.in_flight_count()
+                if batch["records"]:
+                    task = asyncio.ensure_future(run(batch))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    workers.release()
+
+                if (
+                    not self.auto_commit
+                    and loop.time() - last_commit_time >= commit_interval_ms / 1000
+                ):
+                    await self._commit_tracked(tracker)
+                    last_commit_time = loop.time()
+        except Exception as e:
+            logger.error(f"Error in async listen_batches: {e}")
+        finally:
+            if tasks:
+                await asyncio.wait(list(tasks))
+            if not self.auto_commit:
+                await self._commit_tracked(tracker)
+
+        logger.info(f"Processed {counters['processed']} messages")
+        return counters["processed"]
+
+    async def _process_batch(
+        self,
+        batch_handler: Callable[[List[Dict], List[Dict]], Any],
+        batch: Dict[str, Any],
+    ) -> int:
+        """
+        הרצת batch_handler על מנה לפי ה-retry_policy. אם המנה נכשלה -
+        כל הודעה מעובדת לבד כדי שרק ההודעות הבעייתיות יגיעו ל-dead-letter topic
+
+        Returns:
+            מספר ההודעות שעובדו בהצלחה
+        """
+        records = batch["records"]
+        success = await self._handle_with_retry(
+            lambda: self._call_handler(batch_handler, records, batch["offsets"]),
+            records,
+            dead_letter=len(records) == 1,
+        )
+        if success is not False:
+            return len(records)
+        if len(records) == 1:
+            return 0
+
+        logger.warning(
+            f"Batch of {len(records)} failed, processing its messages one by one"
+        )
+        processed_count = 0
+        for record in records:
+            single_offsets = [
+                {
+                    "topic": record["topic"],
+                    "partition": record["partition"],
+                    "first_offset": record["offset"],
+                    "last_offset": record["offset"],
+                }
+            ]
+            success = await self._handle_with_retry(
+                lambda: self._call_handler(batch_handler, [record], single_offsets),
+                [record],
+            )
+            if success is not False:
+                processed_count += 1
+        return processed_count
+
+    async def commit_offsets(self, offsets: List[Dict]):
+        """
+        commit ידני של טווחי offsets שהתקבלו מ-get_batch
+        (רלוונטי כאשר enable_auto_commit=False)
+
+        Args:
+            offsets: רשימת טווחים כפי שהוחזרו ב-get_batch
+        """
+        if not offsets:
+            return
+        await self.consumer.commit(
+            {
+                TopicPartition(o["topic"], o["partition"]): o["last_offset"] + 1
+                for o in offsets
+            }
+        )
+        logger.debug(f"Committed offsets: {offsets}")
+
+    async def get_lag(self) -> Dict[TopicPartition, int]:
+        """
+        ה-lag לכל partition מוקצה: סוף ה-log פחות ה-offset השמור של ה-group
+        (או המיקום הנוכחי אם עוד לא נשמר offset)
+        """
+        assignment = list(self.consumer.assignment())
+        if not assignment:
+            return {}
+        end_offsets = await self.consumer.end_offsets(assignment)
+        lag = {}
+        for tp in assignment:
+            committed = await self.consumer.committed(tp)
+            if committed is None:
+                committed = await self.consumer.position(tp)
+            lag[tp] = max(end_offsets[tp] - committed, 0)
+        return lag
+
+    async def process_concurrently(
+        self,
+        message_handler: Callable[[Dict], bool],
+        concurrency: int = 8,
+        max_records: int = 500,
+        max_wait_ms: int = 1000,
+        commit_interval_ms: int = 5000,
+        max_messages: Optional[int] = None,
+        high_water: Optional[int] = None,
+        low_water: Optional[int] = None,
+        stop_event: Optional[asyncio.Event] = None,
+    ) -> int:
+        """
+        עיבוד מקבילי של הודעות עם pool של workers (אסינכרוני)
+        הודעות עם אותו key (file hash) מעובדות לפי הסדר, הודעות עם keys שונים
+        מעובדות במקביל. commit מתבצע רק עד ה-offset הנמוך ביותר שהסתיים
+        ברצף בכל partition - יש ליצור את ה-Consumer עם enable_auto_commit=False
+
+        Backpressure: כאשר מספר ההודעות שממתינות/בעיבוד עולה על high_water
+        ה-partitions מושהים (pause) - ה-poll ממשיך כדי שלא יהיה rebalance,
+        וכאשר הוא יורד אל מתחת ל-low_water הם מחודשים (resume)
+
+        Args:
+            message_handler: פונקציה (אסינכרונית) לטיפול בהודעה בודדת
+            concurrency: מספר ה-handlers שרצים במקביל
+            max_records: מספר מקסימלי של הודעות בכל getmany
+            max_wait_ms: זמן המתנה מקסימלי ל-getmany (מילישניות)
+            commit_interval_ms: תדירות ה-commit (מילישניות)
+            max_messages: מספר מקסימלי של הודעות (None = אינסופי)
+            high_water: עומק תור שמעליו מושהים ה-partitions (ברירת מחדל: concurrency * 4)
+            low_water: עומק תור שמתחתיו מחודשים ה-partitions (ברירת מחדל: concurrency)
+            stop_event: כאשר מסומן - מפסיקים למשוך, מסיימים את ההודעות שבעיבוד
+                ועושים commit אחרון
+
+        Returns:
+            מספר ההודעות שעובדו בהצלחה
+        """
+        if not self.is_started:
+            logger.error("Consumer is not started. Call start() first.")
+            return 0
+        high_water = high_water or concurrency * 4
+        low_water = min(low_water or concurrency, high_water)
+        if self.auto_commit:
+            logger.warning(
+                "process_concurrently with enable_auto_commit=True may commit "
+                "offsets of messages that are still being processed"
+            )
+
+        tracker = OffsetTracker()
+        workers = asyncio.Semaphore(concurrency)
+        # key -> המשימה האחרונה שנוצרה עבור ה-key (לשמירה על סדר)
+        key_tails: Dict[Any, asyncio.Task] = {}
+        tasks: set = set()
+        counters = {"processed": 0, "scheduled": 0}
+        loop = asyncio.get_running_loop()
+        last_commit_time = loop.time()
+        below_low_water = asyncio.Event()
+
+        async def run(message_data: Dict, previous: Optional[asyncio.Task]):
+            if previous is not None:
+                await asyncio.wait([previous])
+            try:
+                success = await self._handle_with_retry(
+                    lambda: self._call_handler(message_handler, message_data),
+                    [message_data],
+                    workers,
+                )
+                if success:
+                    counters["processed"] += 1
+                else:
+                    logger.warning(
+                        f"Failed to process message from '{message_data['topic']}'"
+                    )
+            except Exception as e:
+                logger.error(f"Error processing message: {e}")
+            finally:
+                tracker.done(
+                    message_data["topic"],
+                    message_data["partition"],
+                    message_data["offset"],
+                )
+                self.queue_depth = tracker.in_flight_count()
+                if self.queue_depth <= low_water:
+                    below_low_water.set()
+
+        def schedule(message_data: Dict):
+            key = message_data["key"]
+            previous = key_tails.get(key) if key is not None else None
+            tracker.start(
+                message_data["topic"], message_data["partition"], message_data["offset"]
+            )
+            self.queue_depth = tracker.in_flight_count()
+            task = asyncio.ensure_future(run(message_data, previous))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            if key is not None:
+                key_tails[key] = task
+                task.add_done_callback(lambda t, k=key: release_key(k, t))
+
+        def release_key(key: Any, task: asyncio.Task):
+            if key_tails.get(key) is task:
+                del key_tails[key]
+
+        try:
+            while not max_messages or counters["scheduled"] < max_messages:
+                if stop_event and stop_event.is_set():
+                    break
+                if self.paused_partitions:
+                    # מחכים לירידה מתחת ל-low_water, אבל ממשיכים לקרוא ל-getmany
+                    # כדי שה-consumer לא ייחשב תקוע וייצא מהקבוצה
+                    below_low_water.clear()
+                    try:
+                        await asyncio.wait_for(
+                            below_low_water.wait(), timeout=max_wait_ms / 1000
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    if self.queue_depth <= low_water:
+                        self._resume_fetching()
+
+                fetch_limit = max(1, min(max_records, high_water - self.queue_depth))
+                if max_messages:
+                    # המנה האחרונה לא חורגת מהמגבלה (כמו ב-consume_messages)
+                    fetch_limit = min(fetch_limit, max_messages - counters["scheduled"])
+                batch = await self.get_batch(
+                    fetch_limit, 0 if self.paused_partitions else max_wait_ms
+                )
+                for message_data in batch["records"]:
+                    schedule(message_data)
+                    counters["scheduled"] += 1
+                # הודעות שלא פוענחו (ונשלחו ל-dead-letter) לא חוסמות את ה-commit
+                for offsets in batch["offsets"]:
+                    tracker.skip(
+                        offsets["topic"], offsets["partition"], offsets["last_offset"]
+                    )
+
+                if self.queue_depth >= high_water and not self.paused_partitions:
+                    self._pause_fetching()
+
+                if loop.time() - last_commit_time >= commit_interval_ms / 1000:
+                    await self._commit_tracked(tracker)
+                    last_commit_time = loop.time()
+        except Exception as e:
+            logger.error(f"Error in async process_concurrently: {e}")
+        finally:
+            if tasks:
+                await asyncio.wait(list(tasks))
+            await self._commit_tracked(tracker)
+            self._resume_fetching()
+
+        logger.info(f"Processed {counters['processed']} messages")
+        return counters["processed"]
+
+    def _pause_fetching(self):
+        """השהיית כל ה-partitions המוקצים (backpressure)"""
+        self.paused_partitions = set(self.consumer.assignment())
+        if self.paused_partitions:
+            self.consumer.pause(*self.paused_partitions)
+            logger.info(
+                f"Queue depth {self.queue_depth} above high-water mark, "
+                f"paused {len(self.paused_partitions)} partitions"
+            )
+
+    def _resume_fetching(self):
+        """חידוש ה-partitions שהושהו"""
+        if not self.paused_partitions:
+            return
+        # partitions שנלקחו ב-rebalance כבר לא מוקצים לנו
+        assigned = self.paused_partitions & set(self.consumer.assignment())
+        if assigned:
+            self.consumer.resume(*assigned)
+        logger.info(
+            f"Queue depth {self.queue_depth} below low-water mark, "
+            f"resumed {len(assigned)} partitions"
+        )
+        self.paused_partitions = set()
+
+    @staticmethod
+    async def _call_handler(handler: Callable, *args: Any):
+        """קריאה ל-handler סינכרוני או אסינכרוני"""
+        if asyncio.iscoroutinefunction(handler):
+            return await handler(*args)
+        return handler(*args)
+
+    async def _handle_with_retry(
+        self,
+        call: Callable[[], Any],
+        records: List[Dict],
+        workers: Optional[asyncio.Semaphore] = None,
+        dead_letter: bool = True,
+    ):
+        """
+        הרצת handler לפי ה-retry_policy - exception גורם לניסיון חוזר אחרי backoff,
+        ואחרי הניסיון האחרון ההודעות נשלחות ל-dead-letter topic.
+        בזמן ההמתנה ה-worker משוחרר, כך שהודעות תקינות ממשיכות לזרום
+
+        Args:
+            call: פונקציה שמריצה את ה-handler ומחזירה coroutine
+            records: ההודעות שה-handler מטפל בהן (לצורך dead-letter)
+            workers: Semaphore להגבלת מקביליות (אופציונלי)
+            dead_letter: האם לשלוח ל-dead-letter אחרי הניסיון האחרון
+
+        Returns:
+            התוצאה של ה-handler, או False אם כל הניסיונות נכשלו
+        """
+        max_attempts = self.retry_policy.max_attempts
+        for attempt in range(1, max_attempts + 1):
+            try:
+                if workers is None:
+                    return await call()
+                async with workers:
+                    return await call()
+            except Exception as e:
+                first = records[0] if records else {}
+                location = (
+                    f"{first.get('topic')}[{first.get('partition')}]"
+                    f"@{first.get('offset')}"
+                )
+                if attempt >= max_attempts:
+                    logger.error(
+                        f"Handler failed for {location} after {attempt} attempts: {e}"
+                    )
+                    if dead_letter:
+                        await self._dead_letter(records, e, attempt)
+                    return False
+                delay = self.retry_policy.backoff(attempt)
+                logger.warning(
+                    f"Handler failed for {location} (attempt {attempt}/{max_attempts}):"
+                    f" {e} - retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def _dead_letter(
+        self, records: List[Dict], error: Optional[Exception], attempts: int
+    ):
+        """שליחת הודעות שנכשלו סופית ל-dead-letter topic"""
+        if not self.dead_letter_producer or not self.dead_letter_topic:
+            logger.error(
+                f"No dead-letter topic configured, dropping {len(records)} messages"
+            )
+            return
+        for message_data in records:
+            sent = await self.dead_letter_producer.send_message(
+                self.dead_letter_topic,
+                create_dead_letter_message(message_data, error, attempts),
+                key=message_data["key"],
+            )
+            if not sent:
+                logger.error(
+                    f"Failed to dead-letter message {message_data['topic']}"
+                    f"[{message_data['partition']}]@{message_data['offset']}"
+                )
+
+    async def _commit_tracked(self, tracker: OffsetTracker):
+        """commit של ה-offsets שהסתיימו ברצף לפי ה-tracker"""
+        offsets = tracker.committable()
+        if not offsets:
+            return
+        try:
+            await self.consumer.commit(
+                {
+                    TopicPartition(topic, partition): offset
+                    for (topic, partition), offset in offsets.items()
+                }
+            )
+            tracker.mark_committed(offsets)
+            logger.debug(f"Committed offsets: {offsets}")
+        except Exception as e:
+            logger.error(f"Failed to commit offsets {offsets}: {e}")
+
     async def consume(self):
         """
         צריכת הודעות (אסינכרונית) - generator שמחזיר הודעה אחת בכל פעם
@@ -340,15 +1187,9 @@ class KafkaConsumerAsync:
         try:
             async for message in self.consumer:
                 logger.debug(f"Received message from '{message}")
-                yield {
-                    "topic": message.topic,
-                    "partition": message.partition,
-                    "offset": message.offset,
-                    "key": message.key,
-                    "value": message.value,
-                    "timestamp": message.timestamp,
-                    "received_at": datetime.now().isoformat(),
-                }
+                message_data = await self._decode_or_dead_letter(message)
+                if message_data is not None:
+                    yield message_data
 
         except Exception as e:
             logger.error(f"Error in async consume: {e}")
@@ -0,0 +1,166 @@
+# ============================================================================
+# utilities/kafka/codec_benchmark.py - COMPARE WIRE CODECS ON REAL MESSAGES
+# ============================================================================
+"""
+השוואת זמני encode/decode וגודל ב-bytes של ה-codecs על הודעות אמיתיות
+
+דוגמאות:
+    python -m utilities.kafka.codec_benchmark transcription.json
+    python -m utilities.kafka.codec_benchmark --topic to_index --max-messages 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .codecs import CODECS, get_codec, is_codec_available
+from .json_helpers import ENVELOPE_V1, ENVELOPE_V2, create_kafka_message
+
+
+def load_messages_from_files(paths: List[str]) -> List[Any]:
+    """
+    טעינת הודעות מקבצי JSON / JSONL
+    כל קובץ יכול להכיל תוצאת תמלול, מעטפת Kafka, או רשימה של אחד מהם
+    """
+    messages = []
+    for path in paths:
+        text = Path(path).read_text(encoding="utf-8")
+        if path.endswith(".jsonl"):
+            messages.extend(json.loads(line) for line in text.splitlines() if line)
+            continue
+        data = json.loads(text)
+        messages.extend(data if isinstance(data, list) else [data])
+    # מעטפות קיימות - משאירים רק את ה-payload, המעטפת תיבנה מחדש
+    return [m["data"] if isinstance(m, dict) and "data" in m else m for m in messages]
+
+
+async def load_messages_from_topic(
+    topic: str, bootstrap_servers: str, max_messages: int, timeout_seconds: int
+) -> List[Any]:
+    """דגימת הודעות מ-topic (מההתחלה) ללא commit"""
+    from .async_client import KafkaConsumerAsync
+
+    consumer = KafkaConsumerAsync(
+        [topic],
+        bootstrap_servers=bootstrap_servers,
+        group_id=f"codec_benchmark_{time.time()}",
+        auto_offset_reset="earliest",
+        enable_auto_commit=False,
+    )
+    await consumer.start()
+    try:
+        messages = []
+        deadline = time.monotonic() + timeout_seconds
+        while len(messages) < max_messages and time.monotonic() < deadline:
+            batch = await consumer.get_batch(max_messages - len(messages), 1000)
+            messages.extend(record["value"]["data"] for record in batch["records"])
+        return messages
+    finally:
+        await consumer.stop()
+
+
+def _time_per_call(func, args: List[Any], repeat: int) -> float:
+    """זמן ממוצע לקריאה (מילישניות) - החציון מבין repeat סבבים"""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for arg in args:
+            func(arg)
+        rounds.append((time.perf_counter() - start) / len(args))
+    return statistics.median(rounds) * 1000
+
+
+def run_benchmark(
+    messages: List[Any], repeat: int = 5, envelope_version: str = ENVELOPE_V2
+) -> List[Dict[str, Any]]:
+    """
+    הרצת ההשוואה על כל ה-codecs המותקנים
+
+    Args:
+        messages: ה-payloads להשוואה
+        repeat: מספר הסבבים לכל מדידה
+        envelope_version: "1.0" עוטף כל payload במעטפת, "2.0" מקודד רק את ה-payload
+
+    Returns:
+        רשימת תוצאות - אחת לכל codec
+    """
+    if envelope_version == ENVELOPE_V1:
+        envelopes = [create_kafka_message("benchmark", m, "key") for m in messages]
+    else:
+        envelopes = messages
+    results = []
+    for name in CODECS:
+        if not is_codec_available(name):
+            results.append({"codec": name, "available": False})
+            continue
+        codec = get_codec(name)
+        encoded = [codec.encode(envelope) for envelope in envelopes]
+        results.append(
+            {
+                "codec": name,
+                "available": True,
+                "messages": len(envelopes),
+                "avg_bytes": statistics.mean(len(payload) for payload in encoded),
+                "total_bytes": sum(len(payload) for payload in encoded),
+                "encode_ms": _time_per_call(codec.encode, envelopes, repeat),
+                "decode_ms": _time_per_call(codec.decode, encoded, repeat),
+            }
+        )
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]):
+    baseline = next((r for r in results if r["codec"] == "json"), None)
+    print(
+        f"{'codec':<10}{'avg bytes':>12}{'size %':>9}"
+        f"{'encode ms':>12}{'decode ms':>12}"
+    )
+    for result in results:
+        if not result["available"]:
+            print(f"{result['codec']:<10}  (not installed)")
+            continue
+        size_pct = result["avg_bytes"] / baseline["avg_bytes"] * 100
+        print(
+            f"{result['codec']:<10}{result['avg_bytes']:>12.0f}{size_pct:>8.1f}%"
+            f"{result['encode_ms']:>12.3f}{result['decode_ms']:>12.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kafka wire codec benchmark")
+    parser.add_argument("files", nargs="*", help="JSON/JSONL files with messages")
+    parser.add_argument("--topic", help="sample messages from this Kafka topic")
+    parser.add_argument("--bootstrap-servers", default="localhost:9092")
+    parser.add_argument("--max-messages", type=int, default=100)
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--envelope", choices=[ENVELOPE_V1, ENVELOPE_V2], default=ENVELOPE_V2
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.topic:
+        messages = asyncio.run(
+            load_messages_from_topic(
+                args.topic, args.bootstrap_servers, args.max_messages, args.timeout
+            )
+        )
+    elif args.files:
+        messages = load_messages_from_files(args.files)
+    else:
+        parser.error("pass message files or --topic")
+    if not messages:
+        parser.error("no messages to benchmark")
+
+    results = run_benchmark(messages, args.repeat, args.envelope)
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# ============================================================================
+# utilities/kafka/codecs.py - PLUGGABLE WIRE CODECS FOR KAFKA PAYLOADS
+# ============================================================================
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .json_helpers import deserialize_json, serialize_json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# שם ה-header שבו נרשם ה-codec של ההודעה
+CODEC_HEADER = "codec"
+DEFAULT_CODEC = "json"
+
+
+def _fallback_serializer(obj):
+    """סיריאלייזר לאובייקטים שה-codec לא מכיר (כמו ב-serialize_json)"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    elif hasattr(obj, "__dict__"):
+        return obj.__dict__
+    else:
+        return str(obj)
+
+
+class JsonCodec:
+    """JSON רגיל (stdlib) - הפורמט המקורי של ה-pipeline"""
+
+    name = "json"
+
+    @staticmethod
+    def encode(data: Any) -> bytes:
+        return serialize_json(data).encode("utf-8")
+
+    @staticmethod
+    def decode(payload: bytes) -> Any:
+        return deserialize_json(payload.decode("utf-8"))
+
+
+class OrjsonCodec:
+    """JSON מהיר עם orjson - תואם JSON על החוט"""
+
+    name = "orjson"
+
+    @staticmethod
+    def encode(data: Any) -> bytes:
+        try:
+            return orjson.dumps(
+                data, default=_fallback_serializer, option=orjson.OPT_NON_STR_KEYS
+            )
+        except Exception as e:
+            logger.error(f"Failed to serialize with orjson: {e}")
+            raise ValueError(f"orjson serialization failed: {e}")
+
+    @staticmethod
+    def decode(payload: bytes) -> Any:
+        try:
+            return orjson.loads(payload)
+        except Exception as e:
+            logger.error(f"Failed to deserialize with orjson: {e}")
+            raise ValueError(f"orjson deserialization failed: {e}")
+
+
+class MsgpackCodec:
+    """MessagePack - פורמט בינארי קומפקטי"""
+
+    name = "msgpack"
+
+    @staticmethod
+    def encode(data: Any) -> bytes:
+        try:
+            return msgpack.packb(data, default=_fallback_serializer, use_bin_type=True)
+        except Exception as e:
+            logger.error(f"Failed to serialize with msgpack: {e}")
+            raise ValueError(f"msgpack serialization failed: {e}")
+
+    @staticmethod
+    def decode(payload: bytes) -> Any:
+        try:
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        except Exception as e:
+            logger.error(f"Failed to deserialize with msgpack: {e}")
+            raise ValueError(f"msgpack deserialization failed: {e}")
+
+
+CODECS = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+_CODEC_DEPENDENCIES = {
+    OrjsonCodec.name: lambda: orjson is not None,
+    MsgpackCodec.name: lambda: msgpack is not None,
+}
+
+
+def is_codec_available(name: str) -> bool:
+    """האם ה-codec רשום והספרייה שלו מותקנת"""
+    return name in CODECS and _CODEC_DEPENDENCIES.get(name, lambda: True)()
+
+
+def get_codec(name: Optional[str] = None):
+    """
+    החזרת codec לפי שם
+
+    Args:
+        name: שם ה-codec (None = DEFAULT_CODEC)
+
+    Raises:
+        ValueError: אם ה-codec לא קיים או שהספרייה שלו לא מותקנת
+    """
+    name = name or DEFAULT_CODEC
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}")
+    if not is_codec_available(name):
+        raise ValueError(f"Codec '{name}' is not installed")
+    return CODECS[name]
+
+
+def parse_topic_codecs(spec: str) -> Dict[str, str]:
+    """
+    המרת מחרוזת הגדרות בפורמט "topic:codec,topic2:codec" ל-dictionary
+
+    Raises:
+        ValueError: אם אחד ה-codecs לא קיים
+    """
+    topic_codecs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        topic, _, codec_name = item.rpartition(":")
+        if not topic or codec_name not in CODECS:
+            raise ValueError(f"Invalid topic codec setting: '{item}'")
+        topic_codecs[topic] = codec_name
+    return topic_codecs
+
+
+def detect_codec(payload: bytes, headers: Optional[Dict[str, bytes]]):
+    """
+    זיהוי ה-codec של הודעה: לפי ה-header, ואם אין (הודעות ישנות) - לפי התוכן
+
+    Args:
+        payload: גוף ההודעה
+        headers: ה-headers של רשומת ה-Kafka (שם -> bytes)
+    """
+    codec_name = (headers or {}).get(CODEC_HEADER)
+    if codec_name:
+        return get_codec(codec_name.decode("utf-8"))
+    if payload[:1] in (b"{", b"[", b'"') or not is_codec_available("msgpack"):
+        return get_codec(DEFAULT_CODEC)
+    return get_codec(MsgpackCodec.name)
+
+
+def decode_payload(
+    payload: Optional[bytes], headers: Optional[Dict[str, bytes]] = None
+) -> Any:
+    """
+    פענוח גוף הודעה עם ה-codec שבו היא קודדה (לפי ה-header או התוכן)
+    הודעת json לא מפוענחת עם orjson - json.dumps כותב NaN / Infinity ש-orjson דוחה
+    """
+    if payload is None:
+        return None
+    return detect_codec(payload, headers).decode(payload)
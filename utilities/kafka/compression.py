@@ -0,0 +1,46 @@
+# ============================================================================
+# utilities/kafka/compression.py - PER-TOPIC PRODUCER COMPRESSION
+# ============================================================================
+import logging
+from typing import Dict
+
+try:
+    from aiokafka import codec as kafka_codec
+except ImportError:  # pragma: no cover - optional dependency (memory backend)
+    kafka_codec = None
+
+logger = logging.getLogger(__name__)
+
+# סוגי הדחיסה שנתמכים ע"י Kafka (None = ללא דחיסה)
+COMPRESSION_TYPES = ("gzip", "snappy", "lz4", "zstd")
+
+
+def is_compression_available(compression_type: str) -> bool:
+    """
+    האם הספרייה של סוג הדחיסה מותקנת (aiokafka[lz4,snappy,zstd])
+    בלעדיה ה-producer נכשל ב-start()
+    """
+    if kafka_codec is None:
+        return True
+    return getattr(kafka_codec, f"has_{compression_type}", lambda: False)()
+
+
+def parse_topic_compression(spec: str) -> Dict[str, str]:
+    """
+    המרת מחרוזת הגדרות בפורמט "topic:gzip,topic2:zstd" ל-dictionary
+
+    Raises:
+        ValueError: אם אחד מסוגי הדחיסה לא נתמך, או שהספרייה שלו לא מותקנת
+    """
+    topic_compression = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        topic, _, compression_type = item.rpartition(":")
+        if not topic or compression_type not in COMPRESSION_TYPES:
+            raise ValueError(f"Invalid topic compression setting: '{item}'")
+        if not is_compression_available(compression_type):
+            raise ValueError(
+                f"Compression '{compression_type}' for topic '{topic}' needs its"
+                " library - install aiokafka[lz4,snappy,zstd]"
+            )
+        topic_compression[topic] = compression_type
+    return topic_compression
@@ -0,0 +1,155 @@
+# ============================================================================
+# utilities/kafka/compression_benchmark.py - COMPRESSION RATIO AND CPU COST
+# ============================================================================
+"""
+מדידת יחס דחיסה ועלות CPU של סוגי הדחיסה של Kafka על הודעות אמיתיות
+ההודעות מקודדות עם ה-codec שנבחר ומקובצות ל-batches כמו ב-producer
+
+דוגמאות:
+    python -m utilities.kafka.compression_benchmark transcription.json
+    python -m utilities.kafka.compression_benchmark --topic to_index --codec orjson
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from aiokafka import codec as kafka_codec
+
+from .codec_benchmark import load_messages_from_files, load_messages_from_topic
+from .codecs import DEFAULT_CODEC, get_codec
+
+# סוג דחיסה -> (בדיקת זמינות, encode, decode)
+COMPRESSORS = {
+    "gzip": (kafka_codec.has_gzip, kafka_codec.gzip_encode, kafka_codec.gzip_decode),
+    "snappy": (
+        kafka_codec.has_snappy,
+        kafka_codec.snappy_encode,
+        kafka_codec.snappy_decode,
+    ),
+    "lz4": (kafka_codec.has_lz4, kafka_codec.lz4_encode, kafka_codec.lz4_decode),
+    "zstd": (kafka_codec.has_zstd, kafka_codec.zstd_encode, kafka_codec.zstd_decode),
+}
+
+
+def build_batches(payloads: List[bytes], max_batch_size: int) -> List[bytes]:
+    """קיבוץ הודעות ל-batches עד max_batch_size bytes (הודעה גדולה = batch משלה)"""
+    batches, current, current_size = [], [], 0
+    for payload in payloads:
+        if current and current_size + len(payload) > max_batch_size:
+            batches.append(b"".join(current))
+            current, current_size = [], 0
+        current.append(payload)
+        current_size += len(payload)
+    if current:
+        batches.append(b"".join(current))
+    return batches
+
+
+def _cpu_ms_per_mb(func, batches: List[bytes], total_bytes: int, repeat: int):
+    """זמן CPU (מילישניות) לכל MB לא דחוס - החציון מבין repeat סבבים"""
+    rounds = []
+    for _ in range(repeat):
+        start = time.process_time()
+        for batch in batches:
+            func(batch)
+        rounds.append(time.process_time() - start)
+    return statistics.median(rounds) * 1000 / (total_bytes / 1_000_000)
+
+
+def run_benchmark(
+    messages: List[Any],
+    codec_name: str = DEFAULT_CODEC,
+    max_batch_size: int = 16384,
+    repeat: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    הרצת המדידה על כל סוגי הדחיסה המותקנים
+
+    Returns:
+        רשימת תוצאות - אחת לכל סוג דחיסה
+    """
+    codec = get_codec(codec_name)
+    batches = build_batches([codec.encode(m) for m in messages], max_batch_size)
+    total_bytes = sum(len(batch) for batch in batches)
+
+    results = []
+    for name, (is_available, encode, decode) in COMPRESSORS.items():
+        if not is_available():
+            results.append({"compression": name, "available": False})
+            continue
+        compressed = [encode(batch) for batch in batches]
+        compressed_bytes = sum(len(batch) for batch in compressed)
+        results.append(
+            {
+                "compression": name,
+                "available": True,
+                "batches": len(batches),
+                "raw_bytes": total_bytes,
+                "compressed_bytes": compressed_bytes,
+                "ratio": total_bytes / compressed_bytes,
+                "compress_cpu_ms_per_mb": _cpu_ms_per_mb(
+                    encode, batches, total_bytes, repeat
+                ),
+                "decompress_cpu_ms_per_mb": _cpu_ms_per_mb(
+                    decode, compressed, total_bytes, repeat
+                ),
+            }
+        )
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(
+        f"{'compression':<12}{'raw bytes':>12}{'compressed':>12}{'ratio':>8}"
+        f"{'comp ms/MB':>12}{'decomp ms/MB':>14}"
+    )
+    for result in results:
+        if not result["available"]:
+            print(f"{result['compression']:<12}  (not installed)")
+            continue
+        print(
+            f"{result['compression']:<12}{result['raw_bytes']:>12}"
+            f"{result['compressed_bytes']:>12}{result['ratio']:>8.2f}"
+            f"{result['compress_cpu_ms_per_mb']:>12.2f}"
+            f"{result['decompress_cpu_ms_per_mb']:>14.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kafka compression benchmark")
+    parser.add_argument("files", nargs="*", help="JSON/JSONL files with messages")
+    parser.add_argument("--topic", help="sample messages from this Kafka topic")
+    parser.add_argument("--bootstrap-servers", default="localhost:9092")
+    parser.add_argument("--max-messages", type=int, default=100)
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--codec", default=DEFAULT_CODEC)
+    parser.add_argument("--max-batch-size", type=int, default=16384)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.topic:
+        messages = asyncio.run(
+            load_messages_from_topic(
+                args.topic, args.bootstrap_servers, args.max_messages, args.timeout
+            )
+        )
+    elif args.files:
+        messages = load_messages_from_files(args.files)
+    else:
+        parser.error("pass message files or --topic")
+    if not messages:
+        parser.error("no messages to benchmark")
+
+    results = run_benchmark(messages, args.codec, args.max_batch_size, args.repeat)
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@
 import json
 import logging
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -94,3 +94,72 @@ def create_kafka_message(
         "created_at": timestamp.isoformat(),
         "version": "1.0",
     }
+
+
+# ============================================================================
+# ENVELOPE V2 - METADATA IN KAFKA RECORD HEADERS
+# ============================================================================
+ENVELOPE_V1 = "1.0"
+ENVELOPE_V2 = "2.0"
+
+
+def create_kafka_headers(topic: str) -> List[Tuple[str, bytes]]:
+    """
+    יצירת metadata של הודעה (מעטפת v2) כ-headers של רשומת Kafka
+    topic, key ו-timestamp כבר קיימים ברשומה עצמה ולכן לא משוכפלים
+
+    Args:
+        topic: שם ה-topic
+
+    Returns:
+        רשימת headers עם message_id, created_at ו-version
+    """
+    timestamp = datetime.now()
+
+    return [
+        ("message_id", f"{topic}_{timestamp.timestamp()}".encode("utf-8")),
+        ("created_at", timestamp.isoformat().encode("utf-8")),
+        ("version", ENVELOPE_V2.encode("utf-8")),
+    ]
+
+
+def read_kafka_message(
+    value: Any,
+    headers: Dict[str, bytes],
+    topic: str,
+    key: Optional[str],
+    timestamp: Optional[int],
+) -> Any:
+    """
+    קורא תואם לשתי גרסאות המעטפת
+    הודעת v1 מוחזרת כמו שהיא, הודעת v2 מורחבת לאותו מבנה של v1
+    (בלי לפענח שוב את ה-payload) כך שהקוד שקורא value["data"] לא משתנה
+
+    Args:
+        value: גוף ההודעה המפוענח
+        headers: ה-headers של הרשומה (שם -> bytes)
+        topic: ה-topic של הרשומה
+        key: המפתח של הרשומה
+        timestamp: ה-timestamp של הרשומה (מילישניות)
+
+    Returns:
+        Dictionary במבנה של create_kafka_message
+    """
+    version = headers.get("version")
+    if version is None:
+        return value
+
+    created_at = headers.get("created_at", b"").decode("utf-8")
+    return {
+        "topic": topic,
+        "key": key,
+        "data": value,
+        "timestamp": (
+            datetime.fromtimestamp(timestamp / 1000).isoformat()
+            if timestamp is not None
+            else created_at
+        ),
+        "message_id": headers.get("message_id", b"").decode("utf-8"),
+        "created_at": created_at,
+        "version": version.decode("utf-8"),
+    }
@@ -0,0 +1,435 @@
+# ============================================================================
+# utilities/kafka/memory_broker.py - IN-PROCESS KAFKA STAND-IN
+# ============================================================================
+"""
+ברוקר Kafka בזיכרון - להרצה ולמדידה של ה-pipeline בלי תשתית
+
+מממש את החלק של ה-API של aiokafka ש-KafkaProducerAsync ו-KafkaConsumerAsync
+משתמשים בו: topics עם partitions, חלוקה לפי key, consumer groups עם חלוקת
+partitions, offsets שמורים לכל group, getmany, pause/resume ו-batches.
+כל ה-producers וה-consumers באותו תהליך חולקים ברוקר אחד (get_memory_broker).
+"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from aiokafka import TopicPartition
+from aiokafka.partitioner import DefaultPartitioner
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUM_PARTITIONS = 3
+
+# אותם שדות (שבשימוש) כמו ConsumerRecord / RecordMetadata של aiokafka
+MemoryRecord = namedtuple(
+    "MemoryRecord", "topic partition offset timestamp key value headers"
+)
+RecordMetadata = namedtuple("RecordMetadata", "topic partition offset timestamp")
+
+
+class MemoryBroker:
+    """
+    ברוקר בזיכרון: log לכל partition, offsets שמורים לכל group
+    וחלוקת partitions בין ה-consumers של כל group
+    """
+
+    def __init__(self, num_partitions: int = DEFAULT_NUM_PARTITIONS):
+        self.num_partitions = num_partitions
+        self._logs: Dict[str, List[List[MemoryRecord]]] = {}
+        self._committed: Dict[str, Dict[TopicPartition, int]] = {}
+        self._groups: Dict[str, List["MemoryKafkaConsumer"]] = {}
+        self._waiters: Set[asyncio.Future] = set()
+
+    # ------------------------------------------------------------------
+    # topics
+    # ------------------------------------------------------------------
+    def create_topic(self, topic: str, num_partitions: Optional[int] = None):
+        """יצירת topic (אם לא קיים) - topics נוצרים אוטומטית בשימוש ראשון"""
+        if topic not in self._logs:
+            partitions = num_partitions or self.num_partitions
+            self._logs[topic] = [[] for _ in range(partitions)]
+            logger.debug(f"Memory topic '{topic}' created ({partitions} partitions)")
+            for group_id in self._groups:
+                self._rebalance(group_id)
+
+    def topics(self) -> Set[str]:
+        return set(self._logs)
+
+    def partitions_for(self, topic: str) -> Set[int]:
+        self.create_topic(topic)
+        return set(range(len(self._logs[topic])))
+
+    def end_offset(self, tp: TopicPartition) -> int:
+        self.create_topic(tp.topic)
+        return len(self._logs[tp.topic][tp.partition])
+
+    def append(
+        self,
+        topic: str,
+        partition: int,
+        key: Optional[bytes],
+        value: Optional[bytes],
+        headers: Optional[Iterable] = None,
+        timestamp_ms: Optional[int] = None,
+    ) -> RecordMetadata:
+        """הוספת רשומה לסוף ה-log של ה-partition"""
+        self.create_topic(topic)
+        log = self._logs[topic][partition]
+        timestamp = (
+            timestamp_ms if timestamp_ms is not None else int(time.time() * 1000)
+        )
+        record = MemoryRecord(
+            topic, partition, len(log), timestamp, key, value, tuple(headers or ())
+        )
+        log.append(record)
+        self._notify()
+        return RecordMetadata(topic, partition, record.offset, timestamp)
+
+    def read(
+        self, tp: TopicPartition, offset: int, max_records: Optional[int] = None
+    ) -> List[MemoryRecord]:
+        log = self._logs[tp.topic][tp.partition]
+        end = offset + max_records if max_records else None
+        return log[offset:end]
+
+    # ------------------------------------------------------------------
+    # consumer groups
+    # ------------------------------------------------------------------
+    def join(self, consumer: "MemoryKafkaConsumer"):
+        for topic in consumer.subscription:
+            self.create_topic(topic)
+        if consumer.group_id is None:
+            # consumer בלי group מקבל את כל ה-partitions
+            consumer._assign(self._all_partitions(consumer.subscription))
+            return
+        self._groups.setdefault(consumer.group_id, []).append(consumer)
+        self._rebalance(consumer.group_id)
+
+    def leave(self, consumer: "MemoryKafkaConsumer"):
+        members = self._groups.get(consumer.group_id, [])
+        if consumer in members:
+            members.remove(consumer)
+            self._rebalance(consumer.group_id)
+
+    def _all_partitions(self, topics: Iterable[str]) -> List[TopicPartition]:
+        return [
+            TopicPartition(topic, partition)
+            for topic in sorted(topics)
+            for partition in range(len(self._logs.get(topic, ())))
+        ]
+
+    def _rebalance(self, group_id: str):
+        """חלוקת partitions בסבב (round robin) בין חברי ה-group"""
+        members = self._groups.get(group_id, [])
+        assignments = {id(member): [] for member in members}
+        topics = set().union(*(member.subscription for member in members))
+        for topic in sorted(topics):
+            subscribed = [m for m in members if topic in m.subscription]
+            for tp in self._all_partitions([topic]):
+                member = subscribed[tp.partition % len(subscribed)]
+                assignments[id(member)].append(tp)
+        for member in members:
+            member._assign(assignments[id(member)])
+
+    def committed(self, group_id: str, tp: TopicPartition) -> Optional[int]:
+        return self._committed.get(group_id, {}).get(tp)
+
+    def commit(self, group_id: str, offsets: Dict[TopicPartition, int]):
+        self._committed.setdefault(group_id, {}).update(offsets)
+
+    def lag(self, group_id: str) -> Dict[TopicPartition, int]:
+        """
+        ה-lag של group לכל partition (סוף ה-log פחות ה-offset השמור)
+        שימושי למדידת קצב של כל שלב בנפרד
+        """
+        committed = self._committed.get(group_id, {})
+        topics = {tp.topic for tp in committed} | {
+            topic
+            for member in self._groups.get(group_id, [])
+            for topic in member.subscription
+        }
+        return {
+            tp: self.end_offset(tp) - committed.get(tp, 0)
+            for tp in self._all_partitions(topics)
+        }
+
+    # ------------------------------------------------------------------
+    # waiting for new records
+    # ------------------------------------------------------------------
+    def _notify(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    async def wait_for_records(self, timeout: float):
+        """המתנה עד שנוספת רשומה כלשהי או עד שעובר ה-timeout"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+
+
+_default_broker: Optional[MemoryBroker] = None
+
+
+def get_memory_broker() -> MemoryBroker:
+    """הברוקר המשותף לכל ה-clients בתהליך"""
+    global _default_broker
+    if _default_broker is None:
+        _default_broker = MemoryBroker()
+    return _default_broker
+
+
+class MemoryBatchBuilder:
+    """מקביל ל-BatchBuilder של aiokafka - צבירת רשומות עד max_batch_size bytes"""
+
+    def __init__(self, max_batch_size: int):
+        self.max_batch_size = max_batch_size
+        self.records: List[tuple] = []
+        self._size = 0
+
+    def append(self, key, value, timestamp, headers=()):
+        size = len(key or b"") + len(value or b"")
+        if self.records and self._size + size > self.max_batch_size:
+            return None
+        self.records.append((key, value, timestamp, headers))
+        self._size += size
+        return size
+
+    def record_count(self) -> int:
+        return len(self.records)
+
+
+class MemoryKafkaProducer:
+    """
+    תחליף ל-AIOKafkaProducer מעל MemoryBroker
+    הגדרות שאין להן משמעות בזיכרון (acks, linger_ms, compression_type וכו') מתקבלות ומתעלמים מהן
+    """
+
+    def __init__(
+        self,
+        broker: Optional[MemoryBroker] = None,
+        key_serializer=None,
+        value_serializer=None,
+        partitioner=None,
+        max_batch_size: int = 16384,
+        **config,
+    ):
+        self.broker = broker or get_memory_broker()
+        self._key_serializer = key_serializer or (lambda x: x)
+        self._value_serializer = value_serializer or (lambda x: x)
+        self._partitioner = partitioner or DefaultPartitioner()
+        self._max_batch_size = max_batch_size
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def partitions_for(self, topic: str) -> Set[int]:
+        return self.broker.partitions_for(topic)
+
+    async def send(
+        self,
+        topic: str,
+        value: Any = None,
+        key: Any = None,
+        partition: Optional[int] = None,
+        timestamp_ms: Optional[int] = None,
+        headers: Optional[Iterable] = None,
+    ) -> asyncio.Future:
+        """הוספת הודעה לברוקר - מחזיר future שכבר הושלם (כמו אחרי אישור הברוקר)"""
+        serialized_key = self._key_serializer(key)
+        if partition is None:
+            partitions = sorted(self.broker.partitions_for(topic))
+            partition = self._partitioner(serialized_key, partitions, partitions)
+        metadata = self.broker.append(
+            topic,
+            partition,
+            serialized_key,
+            self._value_serializer(value),
+            headers,
+            timestamp_ms,
+        )
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(metadata)
+        return future
+
+    async def send_and_wait(self, *args, **kwargs) -> RecordMetadata:
+        return await (await self.send(*args, **kwargs))
+
+    def create_batch(self) -> MemoryBatchBuilder:
+        return MemoryBatchBuilder(self._max_batch_size)
+
+    async def send_batch(
+        self, batch: MemoryBatchBuilder, topic: str, *, partition: int
+    ) -> asyncio.Future:
+        metadata = None
+        for key, value, timestamp, headers in batch.records:
+            metadata = self.broker.append(
+                topic, partition, key, value, headers, timestamp
+            )
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(metadata)
+        return future
+
+
+class MemoryKafkaConsumer:
+    """
+    תחליף ל-AIOKafkaConsumer מעל MemoryBroker
+    עם enable_auto_commit=True ה-offsets נשמרים מיד אחרי כל fetch
+    """
+
+    def __init__(
+        self,
+        *topics: str,
+        broker: Optional[MemoryBroker] = None,
+        group_id: Optional[str] = None,
+        key_deserializer=None,
+        value_deserializer=None,
+        auto_offset_reset: str = "latest",
+        enable_auto_commit: bool = True,
+        **config,
+    ):
+        self.broker = broker or get_memory_broker()
+        self.subscription = set(topics)
+        self.group_id = group_id
+        self._key_deserializer = key_deserializer or (lambda x: x)
+        self._value_deserializer = value_deserializer or (lambda x: x)
+        self._auto_offset_reset = auto_offset_reset
+        self._enable_auto_commit = enable_auto_commit
+        self._assignment: List[TopicPartition] = []
+        self._positions: Dict[TopicPartition, int] = {}
+        self._paused: Set[TopicPartition] = set()
+        self._started = False
+
+    async def start(self):
+        if not self._started:
+            self._started = True
+            self.broker.join(self)
+
+    async def stop(self):
+        if self._started:
+            self._started = False
+            self.broker.leave(self)
+
+    def _assign(self, partitions: List[TopicPartition]):
+        """נקרא ע"י הברוקר בכל rebalance"""
+        self._assignment = list(partitions)
+        positions = {}
+        for tp in self._assignment:
+            committed = None
+            if self.group_id is not None:
+                committed = self.broker.committed(self.group_id, tp)
+            if committed is None:
+                committed = (
+                    0
+                    if self._auto_offset_reset == "earliest"
+                    else self.broker.end_offset(tp)
+                )
+            positions[tp] = self._positions.get(tp, committed)
+        self._positions = positions
+        self._paused &= set(self._assignment)
+
+    def assignment(self) -> Set[TopicPartition]:
+        return set(self._assignment)
+
+    def pause(self, *partitions: TopicPartition):
+        self._paused.update(partitions)
+
+    def resume(self, *partitions: TopicPartition):
+        self._paused.difference_update(partitions)
+
+    def paused(self) -> Set[TopicPartition]:
+        return set(self._paused)
+
+    async def position(self, tp: TopicPartition) -> int:
+        return self._positions[tp]
+
+    def seek(self, tp: TopicPartition, offset: int):
+        self._positions[tp] = offset
+
+    async def committed(self, tp: TopicPartition) -> Optional[int]:
+        return self.broker.committed(self.group_id, tp)
+
+    async def end_offsets(self, partitions: Iterable[TopicPartition]) -> Dict:
+        return {tp: self.broker.end_offset(tp) for tp in partitions}
+
+    async def commit(self, offsets: Optional[Dict[TopicPartition, Any]] = None):
+        """שמירת offsets ל-group (ברירת מחדל: המיקום הנוכחי בכל partition)"""
+        if self.group_id is None:
+            return
+        if offsets is None:
+            offsets = dict(self._positions)
+        self.broker.commit(
+            self.group_id,
+            {tp: getattr(offset, "offset", offset) for tp, offset in offsets.items()},
+        )
+
+    def _fetch(self, partitions, max_records: Optional[int]) -> Dict:
+        result = {}
+        remaining = max_records or 0
+        for tp in partitions or self._assignment:
+            if tp in self._paused or tp not in self._positions:
+                continue
+            if max_records and remaining <= 0:
+                continue
+            limit = remaining if max_records else None
+            records = self.broker.read(tp, self._positions[tp], limit)
+            if not records:
+                continue
+            result[tp] = [
+                record._replace(
+                    key=self._key_deserializer(record.key),
+                    value=self._value_deserializer(record.value),
+                )
+                for record in records
+            ]
+            self._positions[tp] += len(records)
+            remaining -= len(records)
+        if result and self._enable_auto_commit and self.group_id is not None:
+            self.broker.commit(
+                self.group_id, {tp: self._positions[tp] for tp in result}
+            )
+        return result
+
+    async def getmany(
+        self,
+        *partitions: TopicPartition,
+        timeout_ms: int = 0,
+        max_records: Optional[int] = None,
+    ) -> Dict[TopicPartition, List[MemoryRecord]]:
+        """
+        שליפת רשומות מה-partitions המוקצים (ולא מושהים)
+        ממתין עד timeout_ms אם אין רשומות חדשות
+        """
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            result = self._fetch(partitions, max_records)
+            remaining = deadline - time.monotonic()
+            if result or remaining <= 0:
+                return result
+            await self.broker.wait_for_records(remaining)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> MemoryRecord:
+        while self._started:
+            for records in (
+                await self.getmany(timeout_ms=1000, max_records=1)
+            ).values():
+                return records[0]
+        raise StopAsyncIteration
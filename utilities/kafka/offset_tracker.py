@@ -0,0 +1,63 @@
+# ============================================================================
+# utilities/kafka/offset_tracker.py - COMMITTABLE OFFSETS FOR OUT-OF-ORDER WORK
+# ============================================================================
+import logging
+from typing import Dict, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TopicPartitionKey = Tuple[str, int]
+
+
+class OffsetTracker:
+    """
+    מעקב אחרי offsets שנמצאים בעיבוד כאשר הודעות מסתיימות שלא לפי הסדר
+    ה-offset שמותר ל-commit הוא ה-offset הנמוך ביותר שעדיין בעיבוד,
+    או (אם אין כאלה) ה-offset הגבוה ביותר שהסתיים + 1
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[TopicPartitionKey, Set[int]] = {}
+        self._highest_done: Dict[TopicPartitionKey, int] = {}
+        self._committed: Dict[TopicPartitionKey, int] = {}
+
+    def start(self, topic: str, partition: int, offset: int):
+        """סימון הודעה כנכנסת לעיבוד"""
+        self._in_flight.setdefault((topic, partition), set()).add(offset)
+
+    def done(self, topic: str, partition: int, offset: int):
+        """סימון הודעה כהסתיימה (בהצלחה או בכישלון סופי)"""
+        tp = (topic, partition)
+        self._in_flight.get(tp, set()).discard(offset)
+        self._highest_done[tp] = max(self._highest_done.get(tp, -1), offset)
+
+    def skip(self, topic: str, partition: int, offset: int):
+        """
+        סימון offset כמטופל בלי שנכנס לעיבוד (למשל הודעה שלא פוענחה)
+        offsets נמוכים יותר שעדיין בעיבוד ממשיכים לחסום את ה-commit
+        """
+        tp = (topic, partition)
+        self._highest_done[tp] = max(self._highest_done.get(tp, -1), offset)
+
+    def in_flight_count(self) -> int:
+        """מספר ההודעות שנמצאות כרגע בעיבוד"""
+        return sum(len(offsets) for offsets in self._in_flight.values())
+
+    def committable(self) -> Dict[TopicPartitionKey, int]:
+        """
+        offsets חדשים שמותר ל-commit (לפי הסמנטיקה של Kafka - ההודעה הבאה לקריאה)
+
+        Returns:
+            Dictionary של (topic, partition) -> offset, רק עבור partitions שהתקדמו
+        """
+        result = {}
+        for tp, highest in self._highest_done.items():
+            in_flight = self._in_flight.get(tp)
+            offset = min(in_flight) if in_flight else highest + 1
+            if offset > self._committed.get(tp, -1):
+                result[tp] = offset
+        return result
+
+    def mark_committed(self, offsets: Dict[TopicPartitionKey, int]):
+        """עדכון ה-offsets שבוצע להם commit"""
+        self._committed.update(offsets)
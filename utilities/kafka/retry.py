@@ -0,0 +1,92 @@
+# ============================================================================
+# utilities/kafka/retry.py - RETRY POLICY AND DEAD-LETTER MESSAGES
+# ============================================================================
+import logging
+import random
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    מדיניות ניסיונות חוזרים עם exponential backoff
+    max_attempts=1 אומר ללא ניסיונות חוזרים
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        initial_backoff_ms: int = 500,
+        max_backoff_ms: int = 30000,
+        multiplier: float = 2.0,
+        jitter: float = 0.1,
+    ):
+        """
+        Args:
+            max_attempts: מספר הניסיונות הכולל (כולל הראשון)
+            initial_backoff_ms: המתנה לפני הניסיון השני (מילישניות)
+            max_backoff_ms: המתנה מקסימלית בין ניסיונות (מילישניות)
+            multiplier: מכפיל ההמתנה בין ניסיון לניסיון
+            jitter: סטייה אקראית יחסית מההמתנה (0.1 = עד 10%)
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.initial_backoff_ms = initial_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def backoff(self, attempt: int) -> float:
+        """
+        זמן ההמתנה (שניות) אחרי ניסיון מספר attempt שנכשל
+
+        Args:
+            attempt: מספר הניסיון שנכשל (מתחיל מ-1)
+        """
+        delay_ms = min(
+            self.max_backoff_ms,
+            self.initial_backoff_ms * self.multiplier ** (attempt - 1),
+        )
+        delay_ms *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(delay_ms, 0) / 1000
+
+
+def create_dead_letter_message(
+    message_data: Dict[str, Any], error: Optional[Exception], attempts: int
+) -> Dict[str, Any]:
+    """
+    יצירת הודעת dead-letter שמכילה את הרשומה המקורית ואת השגיאה
+
+    Args:
+        message_data: ההודעה כפי שהתקבלה מה-consumer
+        error: השגיאה האחרונה
+        attempts: מספר הניסיונות שבוצעו (0 = ההודעה לא פוענחה)
+
+    Returns:
+        Dictionary עם original ו-error
+    """
+    headers = message_data.get("headers") or {}
+    return {
+        "original": {
+            "topic": message_data["topic"],
+            "partition": message_data["partition"],
+            "offset": message_data["offset"],
+            "key": message_data["key"],
+            "timestamp": message_data["timestamp"],
+            "headers": {
+                name: value.decode("utf-8", errors="replace")
+                for name, value in headers.items()
+            },
+            "value": message_data.get("value"),
+            "raw_value": message_data.get("raw_value"),
+        },
+        "error": {
+            "type": type(error).__name__,
+            "message": str(error),
+            "attempts": attempts,
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+        },
+    }
@@ -0,0 +1,304 @@
+# ============================================================================
+# utilities/metrics.py - PROMETHEUS-STYLE METRICS AND A LIGHTWEIGHT HTTP ENDPOINT
+# ============================================================================
+"""
+מדדים בפורמט הטקסט של Prometheus, בלי תלות חיצונית
+
+    REQUESTS = Counter("requests_total", "Handled requests", ["stage"])
+    REQUESTS.labels(stage="index").inc()
+    await start_metrics_server(9104)   # GET /metrics
+"""
+import asyncio
+import logging
+import math
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# buckets ל-latency (שניות) - מ-ms בודדים ועד תמלול של קבצים ארוכים
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    600,
+)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        escaped = escaped.replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    """בסיס משותף: שם, תיאור, labels ו-children לכל צירוף ערכים"""
+
+    type_name = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["MetricsRegistry"] = None,
+    ):
+        """
+        Args:
+            name: שם המדד
+            documentation: תיאור (שורת HELP)
+            labelnames: שמות ה-labels
+            registry: ה-registry לרישום (None = REGISTRY, False = בלי רישום)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+        if registry is not False:
+            (registry or REGISTRY).register(self)
+
+    def labels(self, *values: str, **kwargs: str):
+        """ה-child של צירוף ערכי labels (נוצר בפעם הראשונה)"""
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        with self._lock:
+            if values not in self._children:
+                self._children[values] = self._new_child()
+            return self._children[values]
+
+    def remove(self, *values: str):
+        with self._lock:
+            self._children.pop(tuple(str(value) for value in values), None)
+
+    def clear(self):
+        with self._lock:
+            self._children.clear()
+
+    def _new_child(self):
+        return type(self)(self.name, self.documentation, registry=False)
+
+    def _samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def collect(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """כל הדגימות: (שם, labels, ערך)"""
+        if not self.labelnames:
+            return self._samples()
+        samples = []
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            labels = dict(zip(self.labelnames, values))
+            for name, extra, value in child._samples():
+                samples.append((name, {**labels, **extra}, value))
+        return samples
+
+
+class Counter(_Metric):
+    """מונה שרק עולה"""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self._value += amount
+
+    def _samples(self):
+        return [(self.name, {}, self._value)]
+
+
+class Gauge(_Metric):
+    """ערך נוכחי שיכול לעלות ולרדת"""
+
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def inc(self, amount: float = 1):
+        self._value += amount
+
+    def dec(self, amount: float = 1):
+        self._value -= amount
+
+    def _samples(self):
+        return [(self.name, {}, self._value)]
+
+
+class Histogram(_Metric):
+    """התפלגות ערכים (latency) ב-buckets מצטברים, עם sum ו-count"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self, *args, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, **kwargs
+    ):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(*args, **kwargs)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+
+    def _new_child(self):
+        return Histogram(
+            self.name, self.documentation, buckets=self.buckets[:-1], registry=False
+        )
+
+    def observe(self, value: float):
+        self._sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self._counts[i] += 1
+                break
+
+    def _samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self._counts):
+            cumulative += count
+            samples.append(
+                (f"{self.name}_bucket", {"le": _format_value(bound)}, cumulative)
+            )
+        samples.append((f"{self.name}_sum", {}, self._sum))
+        samples.append((f"{self.name}_count", {}, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    אוסף המדדים של התהליך
+    collectors אסינכרוניים (למשל lag של consumer) רצים לפני כל scrape
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]):
+        """פונקציה אסינכרונית שמעדכנת מדדים לפני כל scrape"""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Awaitable[None]]):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    async def collect(self):
+        for collector in list(self._collectors):
+            try:
+                await collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+    def render(self) -> str:
+        """כל המדדים בפורמט הטקסט של Prometheus (0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.collect():
+                label_text = _format_labels(list(labels), list(labels.values()))
+                lines.append(f"{name}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+_servers: Dict[int, asyncio.AbstractServer] = {}
+
+
+async def start_metrics_server(
+    port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY
+) -> Optional[asyncio.AbstractServer]:
+    """
+    הפעלת שרת HTTP מינימלי שמחזיר את המדדים ב-GET /metrics
+    קריאה נוספת עם אותו port מחזירה את השרת הקיים (כמה שירותים בתהליך אחד)
+
+    Args:
+        port: הפורט להאזנה (0 או None = ללא שרת)
+        host: הכתובת להאזנה
+        registry: ה-registry להצגה
+    """
+    if not port:
+        return None
+    if port in _servers:
+        return _servers[port]
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # קריאת ה-headers עד השורה הריקה
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) > 1 else ""
+            if path in ("/metrics", "/"):
+                await registry.collect()
+                body = registry.render().encode("utf-8")
+                status = "200 OK"
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body = b"Not Found\n"
+                status = "404 Not Found"
+                content_type = "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    try:
+        server = await asyncio.start_server(handle, host, port)
+    except OSError as e:
+        logger.error(f"Failed to start metrics server on port {port}: {e}")
+        return None
+    _servers[port] = server
+    logger.info(f"Metrics server listening on http://{host}:{port}/metrics")
+    return server
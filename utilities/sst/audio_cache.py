@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from utilities.metrics import Counter
+from utilities.sst.chunking import decode_audio
+
+logger = logging.getLogger(__name__)
+
+DECODE_REQUESTS = Counter(
+    "decoded_audio_cache_requests_total",
+    "Decoded audio lookups by result (hit / miss)",
+    ["result"],
+)
+
+
+def load_decoded(audio_path: str) -> np.ndarray:
+    """
+    טעינת אודיו מפוענח כ-memory map, בלי העתקה
+    (copy-on-write - torch מקבל מערך שאפשר לכתוב אליו, הקובץ עצמו לא משתנה)
+    """
+    return np.load(audio_path, mmap_mode="c")
+
+
+class DecodedAudioCache:
+    """
+    cache של אודיו מפוענח (16kHz mono float32) - קובץ npy לכל hash של קובץ
+    הפענוח עם ffmpeg נעשה פעם אחת, ותהליכי ה-Whisper ממפים את הקובץ לזיכרון.
+    מוגבל בגודל כולל, פינוי לפי LRU (זמן השימוש נשמר ב-mtime)
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # hash -> גודל בבתים, לפי סדר השימוש (הישן ביותר ראשון)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        # פענוחים שבתהליך - כמה בקשות לאותו קובץ ממתינות לאותו פענוח
+        self._decoding: Dict[str, asyncio.Task] = {}
+        entries = sorted(
+            (path.stat().st_mtime, path.stem, path.stat().st_size)
+            for path in self.directory.glob("*.npy")
+        )
+        for _, file_hash, size in entries:
+            self._index[file_hash] = size
+            self._total_bytes += size
+        logger.info(
+            f"Decoded audio cache at {self.directory}: {len(self._index)} files,"
+            f" {self._total_bytes / 1e6:.1f} MB"
+        )
+
+    def path(self, file_hash: str) -> Path:
+        return self.directory / f"{file_hash}.npy"
+
+    def _decode(self, file_path: str, file_hash: str) -> int:
+        audio = decode_audio(file_path)
+        tmp_path = self.path(file_hash).with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp_path, self.path(file_hash))
+        return self.path(file_hash).stat().st_size
+
+    async def ensure(self, file_path: str, file_hash: str) -> str:
+        """
+        הנתיב לאודיו המפוענח של הקובץ (מפענח אם עוד לא קיים)
+
+        Raises:
+            RuntimeError: אם הפענוח עם ffmpeg נכשל
+        """
+        path = self.path(file_hash)
+        if file_hash in self._index:
+            try:
+                await asyncio.to_thread(os.utime, path)
+                self._index.move_to_end(file_hash)
+                DECODE_REQUESTS.labels("hit").inc()
+                return str(path)
+            except FileNotFoundError:
+                self._total_bytes -= self._index.pop(file_hash)
+
+        task = self._decoding.get(file_hash)
+        if task is None:
+            DECODE_REQUESTS.labels("miss").inc()
+            task = asyncio.ensure_future(self._decode_and_add(file_path, file_hash))
+            self._decoding[file_hash] = task
+            task.add_done_callback(lambda _: self._decoding.pop(file_hash, None))
+        # shield - ביטול של בקשה אחת לא מבטל את הפענוח לבקשות האחרות
+        await asyncio.shield(task)
+        return str(path)
+
+    async def _decode_and_add(self, file_path: str, file_hash: str):
+        size = await asyncio.to_thread(self._decode, file_path, file_hash)
+        self._total_bytes += size - self._index.pop(file_hash, 0)
+        self._index[file_hash] = size
+        logger.debug(f"Decoded {file_path} ({size / 1e6:.1f} MB)")
+        self._evict(keep=file_hash)
+
+    def _evict(self, keep: str):
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            oldest = next(iter(self._index))
+            if oldest == keep:
+                self._index.move_to_end(oldest)
+                continue
+            self._total_bytes -= self._index.pop(oldest)
+            try:
+                # קובץ שממופה ב-worker נשאר זמין לו עד לסיום (ב-Linux)
+                self.path(oldest).unlink()
+            except OSError as e:
+                logger.warning(f"Failed to remove decoded audio {oldest}: {e}")
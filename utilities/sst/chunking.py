@@ -0,0 +1,124 @@
+import logging
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Whisper עובד על אודיו mono ב-16kHz
+SAMPLE_RATE = 16000
+
+
+def decode_audio(
+    file_path: str,
+    sample_rate: int = SAMPLE_RATE,
+    max_seconds: Optional[float] = None,
+) -> np.ndarray:
+    """
+    פענוח קובץ אודיו ל-mono float32 ב-sample_rate עם ffmpeg
+    (כמו whisper.load_audio, בלי לטעון את whisper / torch בתהליך הראשי)
+    max_seconds מגביל את הפענוח לתחילת הקובץ
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0"]
+    if max_seconds:
+        cmd += ["-t", str(max_seconds)]
+    cmd += [
+        "-i",
+        str(file_path),
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(sample_rate),
+        "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode()}") from e
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def find_chunks(
+    audio: np.ndarray,
+    chunk_seconds: float,
+    search_seconds: float,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = 20,
+) -> List[Tuple[int, int]]:
+    """
+    חלוקת האודיו לקטעים של כ-chunk_seconds, כשכל חיתוך נעשה בנקודה השקטה
+    ביותר (RMS נמוך) בטווח של search_seconds סביב היעד - כדי לא לחתוך מילה
+
+    Returns:
+        רשימת (sample התחלה, sample סוף) לכל קטע
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    search = int(search_seconds * sample_rate)
+    if chunk <= 0 or total <= chunk + search:
+        return [(0, total)]
+
+    frame = max(1, sample_rate * frame_ms // 1000)
+    n_frames = total // frame
+    energy = np.sqrt(
+        np.mean(audio[: n_frames * frame].reshape(n_frames, frame) ** 2, axis=1)
+    )
+
+    chunks = []
+    start = 0
+    while total - start > chunk + search:
+        target = start + chunk
+        first = max(start + frame, target - search) // frame
+        last = min(n_frames, (target + search) // frame + 1)
+        quietest = first + int(np.argmin(energy[first:last]))
+        split = quietest * frame + frame // 2
+        chunks.append((start, split))
+        start = split
+    chunks.append((start, total))
+    return chunks
+
+
+def shift_segments(
+    segments: List[Dict[str, Any]], offset_seconds: float
+) -> List[Dict[str, Any]]:
+    """הזזת ה-timestamps של segments (ושל המילים שבהם) ב-offset_seconds"""
+    shifted = []
+    for segment in segments:
+        segment = {
+            **segment,
+            "start": segment["start"] + offset_seconds,
+            "end": segment["end"] + offset_seconds,
+        }
+        if segment.get("words"):
+            segment["words"] = [
+                {
+                    **word,
+                    "start": word["start"] + offset_seconds,
+                    "end": word["end"] + offset_seconds,
+                }
+                for word in segment["words"]
+            ]
+        shifted.append(segment)
+    return shifted
+
+
+def stitch_chunks(file_hash: str, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    איחוד תוצאות של קטעים רצופים לתוצאת תמלול אחת
+    (אותו פורמט כמו WhisperService.whisper_transcribe, ids של segments ברצף)
+    """
+    segments = []
+    for chunk in chunks:
+        for segment in chunk["segments"]:
+            segments.append({**segment, "id": len(segments)})
+    return {
+        "file_hash": file_hash,
+        "full_text": "".join(chunk["text"] for chunk in chunks),
+        "language": chunks[0]["language"] if chunks else None,
+        "segments": segments,
+    }
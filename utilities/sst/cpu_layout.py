@@ -0,0 +1,108 @@
+import logging
+import os
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# משתני הסביבה של ספריות ה-BLAS / OpenMP - נקבעים לפני טעינת torch
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+AFFINITY_AUTO = "auto"
+
+
+def available_cpus() -> List[int]:
+    """הליבות שהתהליך רשאי לרוץ עליהן (כולל מגבלות של cgroup / taskset)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(value: str) -> List[int]:
+    """
+    פענוח רשימת ליבות בפורמט של taskset: "0-3,8,10-11"
+
+    Raises:
+        ValueError: אם הפורמט לא תקין
+    """
+    cpus = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(bound) for bound in part.split("-", 1))
+            cpus.extend(range(first, last + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def format_cpu_list(cpus: Optional[List[int]]) -> str:
+    if not cpus:
+        return "any"
+    ranges = []
+    start = previous = cpus[0]
+    for cpu in cpus[1:] + [None]:
+        if cpu is not None and cpu == previous + 1:
+            previous = cpu
+            continue
+        ranges.append(f"{start}-{previous}" if start != previous else str(start))
+        if cpu is not None:
+            start = previous = cpu
+    return ",".join(ranges)
+
+
+def plan_cpu_layout(
+    workers: int, threads_per_worker: int = 0, affinity: str = ""
+) -> List[Tuple[int, Optional[List[int]]]]:
+    """
+    חלוקת הליבות בין תהליכי התמלול, כדי שסך ה-threads לא יעלה על מספר הליבות
+
+    Args:
+        workers: מספר התהליכים
+        threads_per_worker: threads של torch לכל תהליך (0 = הליבות חלקי התהליכים)
+        affinity: "" ללא הצמדה, "auto" הצמדת כל תהליך לחלק נפרד מהליבות הזמינות,
+            או רשימת ליבות ("0-7") שמחולקת בין התהליכים
+
+    Returns:
+        (threads, ליבות או None) לכל תהליך
+    """
+    if affinity and affinity != AFFINITY_AUTO:
+        cpus = parse_cpu_list(affinity)
+    else:
+        cpus = available_cpus()
+    threads = threads_per_worker or max(1, len(cpus) // workers)
+    if not affinity:
+        return [(threads, None)] * workers
+
+    layout = []
+    share = max(1, len(cpus) // workers)
+    for index in range(workers):
+        start = (index * share) % len(cpus)
+        layout.append((threads, cpus[start : start + share]))
+    return layout
+
+
+def log_cpu_layout(layout: List[Tuple[int, Optional[List[int]]]]):
+    """רישום החלוקה ללוג, עם אזהרה על oversubscription"""
+    for index, (threads, cpus) in enumerate(layout):
+        logger.info(
+            f"Whisper worker {index}: {threads} threads, CPUs {format_cpu_list(cpus)}"
+        )
+    total_threads = sum(threads for threads, _ in layout)
+    if total_threads > len(available_cpus()):
+        logger.warning(
+            f"{total_threads} transcription threads on {len(available_cpus())} CPUs"
+            " - the workers will compete for cores"
+        )
+
+
+def apply_cpu_layout(threads: int, cpus: Optional[List[int]] = None):
+    """
+    קביעת מספר ה-threads של OpenMP / BLAS וה-affinity של התהליך הנוכחי
+    נקרא בתחילת תהליך ה-worker, לפני טעינת torch
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
@@ -0,0 +1,16 @@
+# אפשרויות התמלול של Whisper - משותפות ל-WhisperService ולמפתח ה-cache של התמלולים
+# (מודול נפרד כדי שהתהליך הראשי לא יטען את whisper / torch)
+TRANSCRIBE_OPTIONS = {"fp16": False, "word_timestamps": True}
+
+# header ברשומת התמלול עם קוד השפה - לניתוב בלי לפענח את ההודעה
+LANGUAGE_HEADER = "language"
+
+# header לבחירת פרופיל איכות לקובץ מסוים - נקבע ברשומת podcasts_log ועובר
+# דרך ה-preprocessor לרשומת התמלול
+PROFILE_HEADER = "profile"
+
+# Whisper מזהה שפה על חלון של 30 שניות - קטע ארוך יותר לא משפר את הזיהוי
+LANGUAGE_DETECT_SECONDS = 30
+
+# קבצים עד אורך חלון אחד של Whisper (30 שניות) מתומללים ב-batch (פענוח אחד)
+BATCH_MAX_SECONDS = 30
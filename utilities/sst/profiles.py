@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utilities.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SELECTIONS = Counter(
+    "transcription_profile_selections_total",
+    "Transcriptions by quality profile and how it was chosen",
+    ["profile", "source"],
+)
+
+
+class ProfileSelector:
+    """
+    בחירת פרופיל איכות לכל תמלול: פרופיל מפורש מה-header של ההודעה, ואחרת
+    לפי עומס התור - מעל high_lag עוברים ל-backlog_profile (זול יותר) עד שה-lag
+    יורד אל low_lag, ואז חוזרים ל-default_profile
+    """
+
+    def __init__(
+        self,
+        profiles: Dict[str, Dict[str, Any]],
+        default_profile: str,
+        backlog_profile: Optional[str] = None,
+        high_lag: int = 0,
+        low_lag: int = 0,
+        lag_source: Optional[Callable[[], Awaitable[int]]] = None,
+        interval_seconds: float = 10,
+    ):
+        """
+        Args:
+            profiles: שם פרופיל -> אפשרויות Whisper (ו-"model" אופציונלי)
+            default_profile: הפרופיל כשהתור לא עמוס
+            backlog_profile: הפרופיל כשהתור עמוס (None = ללא בחירה אוטומטית)
+            high_lag: lag שממנו עוברים ל-backlog_profile (0 = ללא בחירה אוטומטית)
+            low_lag: lag שממנו חוזרים ל-default_profile
+            lag_source: פונקציה אסינכרונית שמחזירה את ה-lag הכולל של התור
+            interval_seconds: כל כמה זמן נבדק ה-lag
+
+        Raises:
+            ValueError: אם אחד הפרופילים לא מוגדר
+        """
+        for name in (default_profile, backlog_profile):
+            if name is not None and name not in profiles:
+                raise ValueError(f"Unknown transcription profile: {name}")
+        self.profiles = profiles
+        self.default_profile = default_profile
+        self.backlog_profile = backlog_profile
+        self.high_lag = high_lag
+        self.low_lag = low_lag
+        self.lag_source = lag_source
+        self.interval_seconds = interval_seconds
+        self.current = default_profile
+
+    @property
+    def auto(self) -> bool:
+        return bool(self.backlog_profile and self.high_lag and self.lag_source)
+
+    def resolve(self, requested: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        הפרופיל לתמלול: המבוקש אם הוא מוגדר, אחרת הנוכחי
+
+        Returns:
+            (שם הפרופיל, האפשרויות שלו)
+        """
+        if requested and requested in self.profiles:
+            PROFILE_SELECTIONS.labels(requested, "header").inc()
+            return requested, self.profiles[requested]
+        if requested:
+            logger.warning(f"Unknown transcription profile '{requested}', ignoring")
+        PROFILE_SELECTIONS.labels(
+            self.current, "auto" if self.auto else "default"
+        ).inc()
+        return self.current, self.profiles[self.current]
+
+    def update(self, lag: int):
+        """עדכון הפרופיל הנוכחי לפי ה-lag (עם hysteresis בין high_lag ל-low_lag)"""
+        if not self.auto:
+            return
+        if self.current != self.backlog_profile and lag >= self.high_lag:
+            logger.info(
+                f"Queue lag {lag} >= {self.high_lag}, switching to the"
+                f" '{self.backlog_profile}' transcription profile"
+            )
+            self.current = self.backlog_profile
+        elif self.current == self.backlog_profile and lag <= self.low_lag:
+            logger.info(
+                f"Queue lag {lag} <= {self.low_lag}, back to the"
+                f" '{self.default_profile}' transcription profile"
+            )
+            self.current = self.default_profile
+
+    async def run(self):
+        """בדיקת ה-lag בלולאה (רץ כ-task עד שמבוטל)"""
+        if not self.auto:
+            return
+        while True:
+            try:
+                self.update(await self.lag_source())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to read the queue lag: {e}")
+            await asyncio.sleep(self.interval_seconds)
@@ -0,0 +1,213 @@
+# ============================================================================
+# utilities/sst/quantization_benchmark.py - FLOAT32 VS INT8 WHISPER ON A SAMPLE SET
+# ============================================================================
+"""
+השוואת דיוק ומהירות בין המודל הרגיל (float32) למודל עם quantization ל-int8
+
+לכל קובץ אודיו בתיקייה אפשר לשים תמלול ידני באותו שם עם סיומת .txt -
+אז ה-WER נמדד מולו, אחרת מול התמלול של מודל ה-float32.
+הזמן כולל רק inference (האודיו מפוענח פעם אחת מראש), RTF = זמן עיבוד / אורך האודיו
+
+דוגמאות:
+    python -m utilities.sst.quantization_benchmark samples/ --model tiny
+    python -m utilities.sst.quantization_benchmark samples/ --model small --output q.json
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utilities.sst.chunking import SAMPLE_RATE, decode_audio
+from utilities.sst.whisper_service import INT8_QUANTIZATION, WhisperService
+
+AUDIO_SUFFIXES = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm"}
+
+
+def normalize_words(text: str) -> List[str]:
+    """פירוק למילים לחישוב WER - אותיות קטנות, בלי פיסוק"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> Tuple[int, int]:
+    """
+    מספר שגיאות המילים (החלפות + מחיקות + הוספות, מרחק Levenshtein על מילים)
+    ומספר המילים ב-reference - לחישוב WER על כל הקורפוס
+
+    Returns:
+        (שגיאות, מילים ב-reference)
+    """
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ref_word != hyp_word),
+                )
+            )
+        previous = current
+    return previous[-1], len(ref)
+
+
+def error_rate(errors: int, words: int) -> float:
+    """WER = (החלפות + מחיקות + הוספות) / מספר המילים ב-reference"""
+    if not words:
+        return 0.0 if not errors else 1.0
+    return errors / words
+
+
+def load_samples(directory: str) -> List[Dict[str, Any]]:
+    """קבצי האודיו בתיקייה (מפוענחים) עם התמלול הידני אם קיים"""
+    samples = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix.lower() not in AUDIO_SUFFIXES:
+            continue
+        reference_path = path.with_suffix(".txt")
+        audio = decode_audio(str(path))
+        samples.append(
+            {
+                "name": path.name,
+                "audio": audio,
+                "seconds": len(audio) / SAMPLE_RATE,
+                "reference": (
+                    reference_path.read_text(encoding="utf-8")
+                    if reference_path.exists()
+                    else None
+                ),
+            }
+        )
+    return samples
+
+
+def transcribe_samples(
+    samples: List[Dict[str, Any]],
+    model_name: str,
+    download_root: str,
+    quantization: Optional[str],
+    language: Optional[str] = None,
+) -> Dict[str, Any]:
+    """תמלול כל הדגימות במודל אחד - זמן טעינה, זמן לכל קובץ והטקסט"""
+    start = time.perf_counter()
+    service = WhisperService(model_name, download_root, quantization=quantization)
+    load_seconds = time.perf_counter() - start
+
+    kwargs = {"language": language} if language else {}
+    results = []
+    for sample in samples:
+        start = time.perf_counter()
+        transcription = service.whisper_transcribe(
+            sample["audio"], sample["name"], **kwargs
+        )
+        results.append(
+            {
+                "name": sample["name"],
+                "seconds": time.perf_counter() - start,
+                "text": transcription["full_text"],
+            }
+        )
+    return {"load_seconds": load_seconds, "files": results}
+
+
+def run_benchmark(
+    samples: List[Dict[str, Any]],
+    model_name: str,
+    download_root: str,
+    language: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    הרצת ההשוואה: float32 ואז int8 על אותן דגימות
+
+    Returns:
+        רשימת תוצאות - אחת לכל מצב
+    """
+    audio_seconds = sum(sample["seconds"] for sample in samples)
+    runs = {
+        mode: transcribe_samples(
+            samples, model_name, download_root, quantization, language
+        )
+        for mode, quantization in (("float32", None), ("int8", INT8_QUANTIZATION))
+    }
+    baseline = {file["name"]: file["text"] for file in runs["float32"]["files"]}
+
+    results = []
+    for mode, run in runs.items():
+        per_file = []
+        for sample, file in zip(samples, run["files"]):
+            reference = sample["reference"] or baseline[file["name"]]
+            errors, words = word_errors(reference, file["text"])
+            per_file.append(
+                {
+                    **file,
+                    "wer": error_rate(errors, words),
+                    "wer_vs": "reference" if sample["reference"] else "float32",
+                    "word_errors": errors,
+                    "reference_words": words,
+                }
+            )
+        processing_seconds = sum(file["seconds"] for file in run["files"])
+        sources = {file["wer_vs"] for file in per_file}
+        results.append(
+            {
+                "mode": mode,
+                "model": model_name,
+                "files": len(samples),
+                "audio_seconds": audio_seconds,
+                "load_seconds": run["load_seconds"],
+                "processing_seconds": processing_seconds,
+                "rtf": processing_seconds / audio_seconds if audio_seconds else 0.0,
+                # WER על כל הקורפוס - קובץ ארוך משפיע לפי מספר המילים שלו
+                "wer": error_rate(
+                    sum(file["word_errors"] for file in per_file),
+                    sum(file["reference_words"] for file in per_file),
+                ),
+                "wer_vs": sources.pop() if len(sources) == 1 else "mixed",
+                "per_file": per_file,
+            }
+        )
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]):
+    wer_vs = results[0]["wer_vs"]
+    if wer_vs == "mixed":
+        wer_vs = "reference where available, float32 otherwise"
+    print(
+        f"{'mode':<10}{'load s':>9}{'process s':>12}{'RTF':>8}{'speedup':>10}"
+        f"{'WER %':>8}  (corpus WER vs {wer_vs})"
+    )
+    baseline = results[0]
+    for result in results:
+        speedup = baseline["processing_seconds"] / result["processing_seconds"]
+        print(
+            f"{result['mode']:<10}{result['load_seconds']:>9.1f}"
+            f"{result['processing_seconds']:>12.1f}{result['rtf']:>8.3f}"
+            f"{speedup:>9.2f}x{result['wer'] * 100:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper int8 quantization benchmark")
+    parser.add_argument("directory", help="audio files (+ optional .txt references)")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--download-root", default=None)
+    parser.add_argument("--language", help="pin the language (default: detect)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    samples = load_samples(args.directory)
+    if not samples:
+        parser.error("no audio files to benchmark")
+
+    results = run_benchmark(samples, args.model, args.download_root, args.language)
+    print_results(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
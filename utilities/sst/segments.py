@@ -0,0 +1,155 @@
+import bisect
+from typing import Any, Dict, Iterator, List, Optional
+
+# מזהה הפורמט - נשמר בכל מסמך כדי שאפשר יהיה לשנות אותו בעתיד
+COMPACT_FORMAT = "columnar-v1"
+
+# דיוק העיגול: timestamps של Whisper ברזולוציה של 20ms, הסתברויות ל-3 ספרות
+TIME_DIGITS = 2
+PROBABILITY_DIGITS = 3
+
+
+def _rounded(values: List[Optional[float]], digits: int) -> List[Optional[float]]:
+    return [round(value, digits) if value is not None else None for value in values]
+
+
+def compact_segments(segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    המרת ה-segments של Whisper לפורמט עמודות קומפקטי: מערכים מקבילים במקום
+    dict לכל segment ולכל מילה, והטקסט כמחרוזת אחת עם offsets של סוף כל קטע
+
+        {
+            "format": "columnar-v1",
+            "text": "...", "text_end": [...],        # טקסט ה-segments
+            "start": [...], "end": [...],
+            "avg_logprob": [...], "no_speech_prob": [...],
+            "word_end": [...],                       # סוף המילים של כל segment
+            "words": {"text": "...", "text_end": [...], "start": [...],
+                      "end": [...], "probability": [...]},
+        }
+
+    tokens, seek ושאר נתוני הפענוח הפנימיים של Whisper לא נשמרים
+    """
+    texts, text_end, starts, ends, logprobs, no_speech, word_end = (
+        [] for _ in range(7)
+    )
+    word_texts, word_text_end, word_starts, word_ends, probabilities = (
+        [] for _ in range(5)
+    )
+    text_length = word_text_length = 0
+    for segment in segments:
+        texts.append(segment["text"])
+        text_length += len(segment["text"])
+        text_end.append(text_length)
+        starts.append(segment["start"])
+        ends.append(segment["end"])
+        logprobs.append(segment.get("avg_logprob"))
+        no_speech.append(segment.get("no_speech_prob"))
+        for word in segment.get("words") or ():
+            word_texts.append(word["word"])
+            word_text_length += len(word["word"])
+            word_text_end.append(word_text_length)
+            word_starts.append(word["start"])
+            word_ends.append(word["end"])
+            probabilities.append(word.get("probability"))
+        word_end.append(len(word_starts))
+
+    return {
+        "format": COMPACT_FORMAT,
+        "text": "".join(texts),
+        "text_end": text_end,
+        "start": _rounded(starts, TIME_DIGITS),
+        "end": _rounded(ends, TIME_DIGITS),
+        "avg_logprob": _rounded(logprobs, PROBABILITY_DIGITS),
+        "no_speech_prob": _rounded(no_speech, PROBABILITY_DIGITS),
+        "word_end": word_end,
+        "words": {
+            "text": "".join(word_texts),
+            "text_end": word_text_end,
+            "start": _rounded(word_starts, TIME_DIGITS),
+            "end": _rounded(word_ends, TIME_DIGITS),
+            "probability": _rounded(probabilities, PROBABILITY_DIGITS),
+        },
+    }
+
+
+class CompactSegments:
+    """
+    גישה ל-segments בפורמט הקומפקטי - כל segment נבנה כ-dict רק כשמבקשים אותו
+
+        segments = CompactSegments(document["segments"])
+        segments[3]["text"], segments.words(3), segments.index_at(125.4)
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Args:
+            data: ה-dict שנוצר ב-compact_segments
+
+        Raises:
+            ValueError: אם הפורמט לא מוכר
+        """
+        if data.get("format") != COMPACT_FORMAT:
+            raise ValueError(f"Unsupported segments format: {data.get('format')}")
+        self.data = data
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict[str, Any]]) -> "CompactSegments":
+        return cls(compact_segments(segments))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.data
+
+    def __len__(self) -> int:
+        return len(self.data["start"])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        data = self.data
+        text_start = data["text_end"][index - 1] if index else 0
+        return {
+            "id": index,
+            "start": data["start"][index],
+            "end": data["end"][index],
+            "text": data["text"][text_start : data["text_end"][index]],
+            "avg_logprob": data["avg_logprob"][index],
+            "no_speech_prob": data["no_speech_prob"][index],
+            "words": self.words(index),
+        }
+
+    def words(self, index: int) -> List[Dict[str, Any]]:
+        """המילים של segment אחד (ריק אם התמלול בלי word timestamps)"""
+        if index < 0:
+            index += len(self)
+        words = self.data["words"]
+        first = self.data["word_end"][index - 1] if index else 0
+        result = []
+        for i in range(first, self.data["word_end"][index]):
+            text_start = words["text_end"][i - 1] if i else 0
+            result.append(
+                {
+                    "word": words["text"][text_start : words["text_end"][i]],
+                    "start": words["start"][i],
+                    "end": words["end"][i],
+                    "probability": words["probability"][i],
+                }
+            )
+        return result
+
+    def index_at(self, seconds: float) -> Optional[int]:
+        """ה-segment שמכיל את הזמן הנתון (None אם אין כזה)"""
+        index = bisect.bisect_right(self.data["start"], seconds) - 1
+        if index >= 0 and seconds <= self.data["end"][index]:
+            return index
+        return None
+
+    def to_segments(self) -> List[Dict[str, Any]]:
+        """כל ה-segments כרשימת dicts (במבנה של Whisper, בלי נתוני הפענוח)"""
+        return list(self)
@@ -0,0 +1,375 @@
+# ============================================================================
+# utilities/sst/transcription_benchmark.py - WHISPER THROUGHPUT / RTF BENCHMARK
+# ============================================================================
+"""
+מדידת מהירות התמלול של WhisperService על מטריצה של הגדרות:
+מודל, מספר threads של torch, word_timestamps ו-quantization
+
+כל הגדרה רצה בתהליך נפרד (peak RSS נמדד לכל הגדרה בנפרד, ה-threads נקבעים
+לפני טעינת המודל). הקבצים הם WAV סינתטיים באורכים שנבחרו, או תיקיית דגימות.
+RTF = זמן עיבוד / אורך האודיו (מתחת ל-1 = מהר מזמן אמת)
+
+דוגמאות:
+    python -m utilities.sst.transcription_benchmark --durations 10,60,300
+    python -m utilities.sst.transcription_benchmark --samples podcasts/ \\
+        --models tiny,base --threads 1,4 --word-timestamps on,off --output bench.json
+    python -m utilities.sst.transcription_benchmark --workers 1,2,4 --affinity "none;auto"
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import queue as queue_module
+import signal
+import statistics
+import time
+import wave
+from datetime import datetime
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utilities.sst.chunking import SAMPLE_RATE, decode_audio
+from utilities.sst.cpu_layout import apply_cpu_layout, format_cpu_list, plan_cpu_layout
+
+AUDIO_SUFFIXES = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm"}
+
+
+def synthesize_wav(path: Path, seconds: float, seed: int = 0):
+    """
+    יצירת WAV סינתטי (16kHz mono) שדומה לדיבור בקצב ובאנרגיה: הברות של צלילים
+    הרמוניים עם רעש, עם הפסקות ביניהן. תוכן קבוע לפי seed - תוצאות שחוזרות על עצמן
+    """
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        length = int(rng.uniform(0.15, 0.6) * SAMPLE_RATE)
+        t = np.arange(length) / SAMPLE_RATE
+        f0 = rng.uniform(90, 250)
+        syllable = sum(
+            np.sin(2 * np.pi * f0 * harmonic * t) / harmonic for harmonic in (1, 2, 3)
+        )
+        syllable += rng.normal(0, 0.1, length)
+        syllable *= np.hanning(length) * 0.3
+        end = min(len(audio), position + length)
+        audio[position:end] = syllable[: end - position]
+        position = end + int(rng.uniform(0.05, 0.8) * SAMPLE_RATE)
+
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def prepare_files(
+    durations: List[float], samples_dir: Optional[str], workdir: str
+) -> List[str]:
+    """קבצי הבדיקה: כל הקבצים בתיקיית הדגימות, או WAV סינתטי לכל אורך"""
+    if samples_dir:
+        return [
+            str(path)
+            for path in sorted(Path(samples_dir).iterdir())
+            if path.suffix.lower() in AUDIO_SUFFIXES
+        ]
+    directory = Path(workdir)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = []
+    for index, seconds in enumerate(durations):
+        path = directory / f"synthetic_{seconds:g}s.wav"
+        if not path.exists():
+            synthesize_wav(path, seconds, seed=index)
+        files.append(str(path))
+    return files
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux מחזיר KB, macOS מחזיר bytes
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def _run_worker(
+    setting: Dict[str, Any],
+    threads: int,
+    cpus: Optional[List[int]],
+    files: List[str],
+    download_root: str,
+    repeat: int,
+) -> Dict[str, Any]:
+    """תהליך תמלול אחד (בתהליך נפרד) על כל הקבצים, עם ה-threads וה-affinity שלו"""
+    apply_cpu_layout(threads, cpus)
+
+    import torch
+
+    from utilities.sst.whisper_service import WhisperService
+
+    start = time.perf_counter()
+    service = WhisperService(
+        setting["model"],
+        download_root,
+        quantization=setting["quantization"],
+        threads=threads,
+    )
+    load_seconds = time.perf_counter() - start
+
+    # הפענוח מחוץ למדידה - נמדד רק ה-inference
+    audios = [(Path(path).name, decode_audio(path)) for path in files]
+    runs = []
+    started_at = time.time()
+    for name, audio in audios:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            service.whisper_transcribe(
+                audio, name, word_timestamps=setting["word_timestamps"]
+            )
+            seconds = time.perf_counter() - start
+            audio_seconds = len(audio) / SAMPLE_RATE
+            runs.append(
+                {
+                    "file": name,
+                    "audio_seconds": audio_seconds,
+                    "seconds": seconds,
+                    "rtf": seconds / audio_seconds if audio_seconds else 0.0,
+                }
+            )
+    return {
+        "torch_threads": torch.get_num_threads(),
+        "cpus": format_cpu_list(cpus),
+        "load_seconds": load_seconds,
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "peak_rss_mb": _peak_rss_mb(),
+        "runs": runs,
+    }
+
+
+def _worker_main(queue, *args):
+    try:
+        queue.put(_run_worker(*args))
+    except Exception as e:
+        queue.put({"error": repr(e)})
+
+
+def _describe_exit(exitcode: int) -> str:
+    if exitcode < 0:
+        return f"killed by {signal.Signals(-exitcode).name}"
+    return f"exit code {exitcode}"
+
+
+def _collect_results(queue, processes, poll_seconds: float = 5.0) -> List[Dict]:
+    """
+    קבלת התוצאה של כל תהליך - תהליך שמת בלי לדווח (OOM killer, segfault ב-torch)
+    מדווח כשגיאה במקום שהבדיקה תיתקע
+
+    Raises:
+        RuntimeError: אם תהליך הסתיים בלי לשלוח תוצאה
+    """
+    results = []
+    while len(results) < len(processes):
+        try:
+            results.append(queue.get(timeout=poll_seconds))
+            continue
+        except queue_module.Empty:
+            pass
+        for index, process in enumerate(processes):
+            if process.exitcode not in (None, 0):
+                raise RuntimeError(
+                    f"Benchmark worker {index} died"
+                    f" ({_describe_exit(process.exitcode)})"
+                )
+        if all(process.exitcode is not None for process in processes):
+            raise RuntimeError("Benchmark workers exited without reporting results")
+    return results
+
+
+def _run_setting(
+    setting: Dict[str, Any], files: List[str], download_root: str, repeat: int
+) -> Dict[str, Any]:
+    """
+    הרצת הגדרה אחת: setting["workers"] תהליכים במקביל, כל אחד על כל הקבצים,
+    לפי החלוקה של plan_cpu_layout (כמו ב-WhisperPool)
+    """
+    layout = plan_cpu_layout(
+        setting["workers"], setting["threads"], setting["affinity"]
+    )
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker_main,
+            args=(queue, setting, threads, cpus, files, download_root, repeat),
+        )
+        for threads, cpus in layout
+    ]
+    for process in processes:
+        process.start()
+    try:
+        workers = _collect_results(queue, processes)
+    except RuntimeError:
+        # תהליך מת - המדידה של השאר כבר לא משקפת את ההגדרה
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+    errors = [worker["error"] for worker in workers if "error" in worker]
+    if errors:
+        raise RuntimeError(f"Benchmark worker failed: {errors[0]}")
+
+    runs = [run for worker in workers for run in worker["runs"]]
+    latencies = sorted(run["seconds"] for run in runs)
+    audio_seconds = sum(run["audio_seconds"] for run in runs)
+    processing_seconds = sum(latencies)
+    # זמן הקיר מתחילת ה-inference הראשון ועד סיום האחרון - התפוקה של כל ה-node
+    wall_seconds = max(worker["finished_at"] for worker in workers) - min(
+        worker["started_at"] for worker in workers
+    )
+    return {
+        **setting,
+        "torch_threads": workers[0]["torch_threads"],
+        "layout": [worker["cpus"] for worker in workers],
+        "load_seconds": max(worker["load_seconds"] for worker in workers),
+        "runs": len(runs),
+        "audio_seconds": audio_seconds,
+        "processing_seconds": processing_seconds,
+        "wall_seconds": wall_seconds,
+        "rtf": processing_seconds / audio_seconds if audio_seconds else 0.0,
+        "throughput_x_realtime": audio_seconds / wall_seconds if wall_seconds else 0.0,
+        "p50_seconds": statistics.median(latencies),
+        "p95_seconds": latencies[int(len(latencies) * 0.95)],
+        "peak_rss_mb": max(worker["peak_rss_mb"] for worker in workers),
+        "total_rss_mb": sum(worker["peak_rss_mb"] for worker in workers),
+        "per_file": runs,
+    }
+
+
+def run_benchmark(
+    files: List[str],
+    models: List[str],
+    threads: List[int],
+    word_timestamps: List[bool],
+    quantizations: List[Optional[str]],
+    download_root: str,
+    repeat: int = 1,
+    workers: List[int] = (1,),
+    affinities: List[str] = ("",),
+) -> List[Dict[str, Any]]:
+    """
+    הרצת כל הצירופים של ההגדרות, כל אחד בתהליכים חדשים
+
+    Returns:
+        רשימת תוצאות - אחת לכל צירוף
+    """
+    results = []
+    for model, worker_count, thread_count, affinity, words, quantization in product(
+        models, workers, threads, affinities, word_timestamps, quantizations
+    ):
+        setting = {
+            "model": model,
+            "workers": worker_count,
+            "threads": thread_count,
+            "affinity": affinity,
+            "word_timestamps": words,
+            "quantization": quantization,
+        }
+        print(f"Running {setting} ...", flush=True)
+        results.append(_run_setting(setting, files, download_root, repeat))
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(
+        f"{'model':<10}{'workers':>8}{'threads':>8}{'affinity':>9}{'words':>7}"
+        f"{'quant':>7}{'RTF':>8}{'x RT':>8}{'p50 s':>9}{'p95 s':>9}{'RSS MB':>9}"
+        f"{'load s':>8}"
+    )
+    for result in results:
+        print(
+            f"{result['model']:<10}{result['workers']:>8}{result['torch_threads']:>8}"
+            f"{result['affinity'] or '-':>9}"
+            f"{'on' if result['word_timestamps'] else 'off':>7}"
+            f"{result['quantization'] or '-':>7}{result['rtf']:>8.3f}"
+            f"{result['throughput_x_realtime']:>8.2f}"
+            f"{result['p50_seconds']:>9.2f}{result['p95_seconds']:>9.2f}"
+            f"{result['peak_rss_mb']:>9.0f}{result['load_seconds']:>8.1f}"
+        )
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper transcription benchmark")
+    parser.add_argument(
+        "--samples", help="directory of audio files (default: synthetic)"
+    )
+    parser.add_argument(
+        "--durations", default="10,60,300", help="synthetic file lengths (seconds)"
+    )
+    parser.add_argument("--workdir", default="benchmark_audio")
+    parser.add_argument("--models", default="tiny")
+    parser.add_argument("--workers", default="1", help="concurrent worker processes")
+    parser.add_argument(
+        "--threads", default="0", help="torch threads per worker (0 = cores / workers)"
+    )
+    parser.add_argument(
+        "--affinity",
+        default="none",
+        help='none, auto or a core list ("0-7"); several separated by ";"',
+    )
+    parser.add_argument("--word-timestamps", default="on", help="on, off or on,off")
+    parser.add_argument(
+        "--quantization", default="none", help="none, int8 or none,int8"
+    )
+    parser.add_argument("--download-root", default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="transcription_benchmark.json")
+    args = parser.parse_args()
+
+    durations = [float(value) for value in _split(args.durations)]
+    files = prepare_files(durations, args.samples, args.workdir)
+    if not files:
+        parser.error("no audio files to benchmark")
+
+    results = run_benchmark(
+        files,
+        models=_split(args.models),
+        threads=[int(value) for value in _split(args.threads)],
+        word_timestamps=[value == "on" for value in _split(args.word_timestamps)],
+        quantizations=[
+            None if value == "none" else value for value in _split(args.quantization)
+        ],
+        download_root=args.download_root,
+        repeat=args.repeat,
+        workers=[int(value) for value in _split(args.workers)],
+        affinities=[
+            "" if value == "none" else value for value in args.affinity.split(";")
+        ],
+    )
+    print_results(results)
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": multiprocessing.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "files": files,
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
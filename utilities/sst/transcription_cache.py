@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utilities.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# העלאת הגרסה מבטלת את כל הרשומות הקיימות (שינוי בפורמט התוצאה)
+CACHE_FORMAT_VERSION = 2
+
+CACHE_REQUESTS = Counter(
+    "transcription_cache_requests_total",
+    "Transcription cache lookups by result (hit / miss)",
+    ["result"],
+)
+CACHE_EVICTIONS = Counter(
+    "transcription_cache_evictions_total", "Entries evicted from the cache"
+)
+
+
+def make_cache_key(file_hash: str, model_name: str, options: Dict[str, Any]) -> str:
+    """
+    מפתח ה-cache: hash של תוכן הקובץ + שם המודל + אפשרויות התמלול
+    (אותו קובץ עם מודל או אפשרויות אחרים מקבל רשומה נפרדת)
+    """
+    identity = json.dumps(
+        {
+            "version": CACHE_FORMAT_VERSION,
+            "file_hash": file_hash,
+            "model": model_name,
+            "options": options,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+class DiskTranscriptionCache:
+    """
+    cache של תמלולים בתיקייה מקומית - קובץ JSON לכל רשומה
+    מוגבל במספר רשומות ובגודל כולל, פינוי לפי LRU (זמן השימוש נשמר ב-mtime)
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # key -> גודל בבתים, לפי סדר השימוש (הישן ביותר ראשון)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        entries = sorted(
+            (path.stat().st_mtime, path.stem, path.stat().st_size)
+            for path in self.directory.glob("*.json")
+        )
+        for _, key, size in entries:
+            self._index[key] = size
+            self._total_bytes += size
+        logger.info(
+            f"Transcription cache at {self.directory}: {len(self._index)} entries,"
+            f" {self._total_bytes / 1e6:.1f} MB"
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> Dict[str, Any]:
+        path = self._path(key)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        os.utime(path)
+        return data
+
+    def _write(self, key: str, value: Dict[str, Any]) -> int:
+        payload = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        tmp_path = self._path(key).with_suffix(".tmp")
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, self._path(key))
+        return len(payload)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if key not in self._index:
+            return None
+        try:
+            value = await asyncio.to_thread(self._read, key)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self._remove(key)
+            return None
+        self._index.move_to_end(key)
+        return value
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        size = await asyncio.to_thread(self._write, key, value)
+        self._total_bytes += size - self._index.pop(key, 0)
+        self._index[key] = size
+        while self._index and (
+            len(self._index) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._index))
+            self._remove(oldest)
+            CACHE_EVICTIONS.inc()
+
+    def _remove(self, key: str):
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class MongoTranscriptionCache:
+    """
+    cache של תמלולים ב-MongoDB - מסמך לכל רשומה עם last_used
+    מוגבל במספר רשומות, פינוי לפי LRU
+    """
+
+    def __init__(self, client, collection_name: str, max_entries: int):
+        """
+        Args:
+            client: MongoDBAsyncClient מחובר
+            collection_name: שם ה-collection של ה-cache
+            max_entries: מספר רשומות מקסימלי
+        """
+        self.collection = client.get_collection(collection_name)
+        self.max_entries = max_entries
+        self._index_ready = False
+
+    async def _ensure_index(self):
+        if not self._index_ready:
+            await self.collection.create_index("last_used")
+            self._index_ready = True
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        document = await self.collection.find_one_and_update(
+            {"_id": key}, {"$set": {"last_used": datetime.now(timezone.utc)}}
+        )
+        return document["result"] if document else None
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        await self._ensure_index()
+        await self.collection.replace_one(
+            {"_id": key},
+            {"result": value, "last_used": datetime.now(timezone.utc)},
+            upsert=True,
+        )
+        excess = await self.collection.estimated_document_count() - self.max_entries
+        if excess > 0:
+            cursor = self.collection.find({}, {"_id": 1}).sort("last_used", 1)
+            oldest = await cursor.limit(excess).to_list(length=excess)
+            result = await self.collection.delete_many(
+                {"_id": {"$in": [document["_id"] for document in oldest]}}
+            )
+            CACHE_EVICTIONS.inc(result.deleted_count)
+
+
+class TranscriptionCache:
+    """
+    עטיפה אחידה ל-backend של ה-cache: כשל ב-cache לא מכשיל את התמלול
+    (נרשם ללוג והתמלול ממשיך כרגיל)
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Transcription cache lookup failed: {e}")
+            value = None
+        CACHE_REQUESTS.labels("hit" if value is not None else "miss").inc()
+        return value
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        try:
+            await self.backend.put(key, value)
+        except Exception as e:
+            logger.warning(f"Failed to store transcription in cache: {e}")
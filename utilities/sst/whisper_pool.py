@@ -0,0 +1,349 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utilities.sst.audio_cache import DecodedAudioCache, load_decoded
+from utilities.sst.chunking import SAMPLE_RATE, decode_audio, find_chunks, stitch_chunks
+from utilities.sst.cpu_layout import (
+    apply_cpu_layout,
+    available_cpus,
+    format_cpu_list,
+    log_cpu_layout,
+    plan_cpu_layout,
+)
+from utilities.sst.options import BATCH_MAX_SECONDS, LANGUAGE_DETECT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ה-WhisperService של תהליך ה-worker (נטען פעם אחת ב-initializer)
+_service = None
+
+
+def _init_worker(
+    model_name: str,
+    download_root: str,
+    quantization: Optional[str],
+    layout: List[Tuple[int, Optional[List[int]]]],
+    slot_counter,
+):
+    """טעינת המודל פעם אחת בכל תהליך של ה-pool, לפי ה-threads וה-affinity שלו"""
+    global _service
+    with slot_counter.get_lock():
+        slot = slot_counter.value % len(layout)
+        slot_counter.value += 1
+    threads, cpus = layout[slot]
+    apply_cpu_layout(threads, cpus)
+
+    from utilities.sst.whisper_service import WhisperService
+
+    _service = WhisperService(
+        model_name=model_name,
+        download_root=download_root,
+        quantization=quantization,
+        threads=threads,
+    )
+    logger.info(
+        f"Whisper worker {slot} loaded model '{model_name}'"
+        f" ({threads} threads, CPUs {format_cpu_list(available_cpus())})"
+    )
+
+
+def _transcribe(file_path: str, file_hash: str, kwargs: Dict[str, Any]):
+    return _service.whisper_transcribe(file_path, file_hash, **kwargs)
+
+
+def _transcribe_decoded(audio_path: str, file_hash: str, kwargs: Dict[str, Any]):
+    return _service.whisper_transcribe(load_decoded(audio_path), file_hash, **kwargs)
+
+
+def _transcribe_batch(
+    audio_paths: List[str], file_hashes: List[str], kwargs: Dict[str, Any]
+):
+    audios = [load_decoded(audio_path) for audio_path in audio_paths]
+    return _service.transcribe_batch(audios, file_hashes, **kwargs)
+
+
+def _detect_language(audio_path: Optional[str], file_path: str):
+    if audio_path:
+        clip = load_decoded(audio_path)[: LANGUAGE_DETECT_SECONDS * SAMPLE_RATE]
+    else:
+        clip = decode_audio(file_path, max_seconds=LANGUAGE_DETECT_SECONDS)
+    return _service.detect_language(clip)
+
+
+def _transcribe_chunk(audio, offset_seconds: float, kwargs: Dict[str, Any]):
+    return _service.transcribe_chunk(audio, offset_seconds, **kwargs)
+
+
+def _transcribe_decoded_chunk(
+    audio_path: str, start: int, end: int, kwargs: Dict[str, Any]
+):
+    audio = load_decoded(audio_path)[start:end]
+    return _service.transcribe_chunk(audio, start / SAMPLE_RATE, **kwargs)
+
+
+class WhisperPool:
+    """
+    תמלול Whisper ב-pool של תהליכים - ה-event loop לא נחסם בזמן התמלול
+    (heartbeats של Kafka ממשיכים), וכל תהליך טוען את המודל פעם אחת
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        download_root: str,
+        workers: int = 1,
+        audio_cache: Optional[DecodedAudioCache] = None,
+        quantization: Optional[str] = None,
+        batch_size: int = 1,
+        batch_wait_ms: int = 200,
+        threads_per_worker: int = 0,
+        cpu_affinity: str = "",
+    ):
+        """
+        Args:
+            model_name: שם מודל ה-Whisper
+            download_root: תיקיית המודלים
+            workers: מספר תהליכי התמלול (עד מספר הליבות)
+            audio_cache: cache של אודיו מפוענח - הפענוח נעשה פעם אחת מחוץ
+                לתהליכי ה-Whisper, והם ממפים את התוצאה לזיכרון (None = Whisper
+                מפענח את הקובץ בכל תמלול)
+            quantization: "int8" ל-quantization דינמי של המודל בכל תהליך
+            batch_size: מספר קבצים קצרים (עד 30 שניות) שמתומללים יחד בפענוח אחד
+                (1 = ללא batching; דורש audio_cache)
+            batch_wait_ms: זמן המתנה מקסימלי להשלמת batch
+            threads_per_worker: threads של torch לכל תהליך (0 = הליבות חלקי workers)
+            cpu_affinity: "" ללא הצמדה, "auto" או רשימת ליבות ("0-7") שמחולקת
+                בין התהליכים
+        """
+        self.model_name = model_name
+        self.download_root = download_root
+        self.workers = workers
+        self.audio_cache = audio_cache
+        self.quantization = quantization or None
+        self.layout = plan_cpu_layout(workers, threads_per_worker, cpu_affinity)
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        if batch_size > 1 and audio_cache is None:
+            logger.warning(
+                "Short-file batching needs the decoded audio cache - batch_size"
+                f" {batch_size} is ignored"
+            )
+        # batches פתוחים לפי האפשרויות: key -> (kwargs, [(audio_path, hash, future)])
+        self._batches: Dict[str, Tuple[Dict[str, Any], List[tuple]]] = {}
+        self._batch_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._batch_tasks: set = set()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn - תהליך נקי בלי מצב ה-threads של torch / event loop של ההורה
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(
+                self.model_name,
+                self.download_root,
+                self.quantization,
+                self.layout,
+                # כל תהליך לוקח את המקום הבא ב-layout
+                context.Value("i", 0),
+            ),
+        )
+
+    @property
+    def model_id(self) -> str:
+        """שם המודל כולל ה-quantization - התוצאות שונות ולכן גם מפתח ה-cache"""
+        if self.quantization:
+            return f"{self.model_name}-{self.quantization}"
+        return self.model_name
+
+    def start(self):
+        if self._executor is None:
+            self._executor = self._create_executor()
+            logger.info(
+                f"Whisper pool started ({self.workers} workers, model '{self.model_id}')"
+            )
+            log_cpu_layout(self.layout)
+
+    async def close(self):
+        """סגירת ה-pool (ממתין לתמלולים שבעיבוד)"""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: executor.shutdown(wait=True, cancel_futures=True)
+            )
+            logger.info("Whisper pool stopped")
+
+    async def _run(self, func: Callable, *args: Any):
+        """הרצת פונקציה באחד מתהליכי ה-pool"""
+        self.start()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # כמה תמלולים נכשלים יחד - רק הראשון יוצר pool חדש
+            if self._executor is executor:
+                logger.error("Whisper worker process died, recreating the pool")
+                self._executor = self._create_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    async def detect_language(self, file_path, file_hash: str) -> Tuple[str, float]:
+        """
+        זיהוי שפה מהיר על LANGUAGE_DETECT_SECONDS הראשונות של הקובץ
+
+        Returns:
+            (קוד השפה, ההסתברות שלה)
+        """
+        audio_path = None
+        if self.audio_cache:
+            audio_path = await self.audio_cache.ensure(file_path, file_hash)
+        return await self._run(_detect_language, audio_path, file_path)
+
+    async def whisper_transcribe(self, file_path, file_hash: str, **kwargs):
+        """
+        תמלול קובץ באחד מתהליכי ה-pool (אותו פורמט תוצאה כמו WhisperService)
+
+        Raises:
+            BrokenProcessPool: אם תהליך נפל - ה-pool נוצר מחדש לניסיון הבא
+        """
+        if self.audio_cache:
+            audio_path = await self.audio_cache.ensure(file_path, file_hash)
+            if (
+                self.batch_size > 1
+                and len(load_decoded(audio_path)) <= BATCH_MAX_SECONDS * SAMPLE_RATE
+            ):
+                return await self._transcribe_in_batch(audio_path, file_hash, kwargs)
+            return await self._run(_transcribe_decoded, audio_path, file_hash, kwargs)
+        return await self._run(_transcribe, file_path, file_hash, kwargs)
+
+    async def _transcribe_in_batch(
+        self, audio_path: str, file_hash: str, kwargs: Dict[str, Any]
+    ):
+        """
+        הוספת קובץ קצר ל-batch הפתוח עם אותן אפשרויות - ה-batch נשלח ל-worker
+        כשהוא מלא או אחרי batch_wait_ms, והתוצאה של כל קובץ חוזרת למי שביקש אותה
+        """
+        loop = asyncio.get_running_loop()
+        key = json.dumps(kwargs, sort_keys=True, default=str)
+        future = loop.create_future()
+        _, items = self._batches.setdefault(key, (kwargs, []))
+        items.append((audio_path, file_hash, future))
+        if len(items) >= self.batch_size:
+            self._flush_batch(key)
+        elif len(items) == 1:
+            self._batch_timers[key] = loop.call_later(
+                self.batch_wait_ms / 1000, self._flush_batch, key
+            )
+        return await future
+
+    def _flush_batch(self, key: str):
+        timer = self._batch_timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        kwargs, items = self._batches.pop(key, (None, []))
+        if items:
+            task = asyncio.ensure_future(self._run_batch(kwargs, items))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, kwargs: Dict[str, Any], items: List[tuple]):
+        audio_paths = [audio_path for audio_path, _, _ in items]
+        file_hashes = [file_hash for _, file_hash, _ in items]
+        try:
+            results = await self._run(
+                _transcribe_batch, audio_paths, file_hashes, kwargs
+            )
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        logger.info(f"Transcribed a batch of {len(items)} short files")
+        for (_, _, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def transcribe_chunked(
+        self,
+        file_path,
+        file_hash: str,
+        chunk_seconds: float,
+        search_seconds: float,
+        on_progress: Optional[Callable[[Dict, int, int], Awaitable[Any]]] = None,
+        **kwargs,
+    ):
+        """
+        תמלול קובץ ארוך בקטעים שנחתכים בנקודות שקט ומתומללים במקביל בכל ה-workers
+
+        Args:
+            file_path: נתיב הקובץ
+            file_hash: hash של הקובץ
+            chunk_seconds: אורך קטע משוער
+            search_seconds: טווח החיפוש של נקודת שקט סביב כל חיתוך
+            on_progress: נקרא עם (התוצאה עד כה, קטעים שהסתיימו, סה"כ קטעים) בכל פעם
+                שהרצף מתחילת הקובץ מתארך - כך אפשר לפרסם תוצאות חלקיות
+            **kwargs: אפשרויות נוספות ל-Whisper
+
+        Returns:
+            התוצאה המלאה (אותו פורמט כמו whisper_transcribe)
+        """
+        audio_path = None
+        if self.audio_cache:
+            audio_path = await self.audio_cache.ensure(file_path, file_hash)
+            audio = load_decoded(audio_path)
+            if self.batch_size > 1 and len(audio) <= BATCH_MAX_SECONDS * SAMPLE_RATE:
+                # קובץ קצר הוא קטע אחד - מצטרף ל-batch כמו ב-whisper_transcribe
+                return await self._transcribe_in_batch(audio_path, file_hash, kwargs)
+        else:
+            audio = await asyncio.to_thread(decode_audio, file_path)
+        ranges = find_chunks(audio, chunk_seconds, search_seconds)
+        logger.info(
+            f"Transcribing {file_hash} ({len(audio) / SAMPLE_RATE:.0f}s)"
+            f" in {len(ranges)} chunks"
+        )
+
+        async def run_chunk(index: int, start: int, end: int):
+            if audio_path:
+                # רק הנתיב והטווח עוברים לתהליך, לא הדגימות עצמן
+                result = await self._run(
+                    _transcribe_decoded_chunk, audio_path, start, end, kwargs
+                )
+            else:
+                result = await self._run(
+                    _transcribe_chunk, audio[start:end], start / SAMPLE_RATE, kwargs
+                )
+            return index, result
+
+        pending = [
+            asyncio.ensure_future(run_chunk(i, start, end))
+            for i, (start, end) in enumerate(ranges)
+        ]
+        done: Dict[int, Dict] = {}
+        completed = 0
+        try:
+            for next_done in asyncio.as_completed(pending):
+                index, result = await next_done
+                done[index] = result
+                # מפרסמים רק רצף מתחילת הקובץ, כדי שכל עדכון יכיל את כל מה שלפניו
+                prefix = completed
+                while prefix in done:
+                    prefix += 1
+                if prefix > completed:
+                    completed = prefix
+                    if on_progress and completed < len(ranges):
+                        partial = stitch_chunks(
+                            file_hash, [done[i] for i in range(completed)]
+                        )
+                        await on_progress(partial, completed, len(ranges))
+        finally:
+            for task in pending:
+                task.cancel()
+        return stitch_chunks(file_hash, [done[i] for i in range(len(ranges))])
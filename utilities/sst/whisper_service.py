@@ -1,21 +1,103 @@
 import logging
+from typing import Any, Dict, List, Optional
 
+import torch
 import whisper
+from whisper.timing import add_word_timestamps
+from whisper.tokenizer import get_tokenizer
+
+from utilities.sst.chunking import shift_segments
+from utilities.sst.options import LANGUAGE_DETECT_SECONDS, TRANSCRIBE_OPTIONS
 
 logger = logging.getLogger(__name__)
 
+INT8_QUANTIZATION = "int8"
+
+# הספים של whisper.transcribe - תוצאה שחורגת מהם מתומללת שוב עם fallback בטמפרטורות
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# אפשרויות שהתמלול ב-batch מכבד - עם אפשרויות אחרות כל קובץ מתומלל בנפרד
+# (condition_on_previous_text ו-best_of לא משפיעים על חלון יחיד בטמפרטורה 0)
+BATCH_OPTIONS = {
+    "fp16",
+    "word_timestamps",
+    "language",
+    "temperature",
+    "beam_size",
+    "best_of",
+    "condition_on_previous_text",
+}
+
+
+def quantize_int8(model):
+    """
+    quantization דינמי ל-int8 של שכבות ה-Linear במודל (משקלים ב-int8, activations
+    מכומתות בזמן ריצה) - ל-inference על CPU בלבד
+    """
+    # ה-Linear של whisper הוא subclass, ו-quantize_dynamic מחליף רק nn.Linear מדויק.
+    # ב-float32 על CPU הוא זהה ל-nn.Linear, אז מחליפים אותו לפני ה-quantization
+    for module in model.modules():
+        for name, child in module.named_children():
+            if (
+                isinstance(child, torch.nn.Linear)
+                and type(child) is not torch.nn.Linear
+            ):
+                linear = torch.nn.Linear(
+                    child.in_features, child.out_features, bias=child.bias is not None
+                )
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(module, name, linear)
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
 
 class WhisperService:
-    def __init__(self, model_name: str, download_root: str):
-        self.model = whisper.load_model(name=model_name, download_root=download_root)
+    def __init__(
+        self,
+        model_name: str,
+        download_root: str,
+        quantization: Optional[str] = None,
+        threads: int = 0,
+    ):
+        """
+        Args:
+            model_name: שם מודל ה-Whisper
+            download_root: תיקיית המודלים
+            quantization: "int8" ל-quantization דינמי של המודל (None = float32)
+            threads: threads של torch לתהליך (0 = ברירת המחדל של torch - כל הליבות)
+
+        Raises:
+            ValueError: אם סוג ה-quantization לא נתמך
+        """
+        if quantization not in (None, "", INT8_QUANTIZATION):
+            raise ValueError(f"Unsupported Whisper quantization: {quantization}")
+        self.model_name = model_name
+        self.quantization = quantization or None
+        if threads:
+            torch.set_num_threads(threads)
+            try:
+                # threads של inter-op לא מזרזים את Whisper, רק מתחרים על הליבות
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                pass
+        self.model = whisper.load_model(
+            name=model_name,
+            download_root=download_root,
+            device="cpu" if self.quantization else None,
+        )
+        if self.quantization == INT8_QUANTIZATION:
+            self.model = quantize_int8(self.model)
+            logger.info(f"Whisper model '{model_name}' quantized to int8")
 
     def whisper_transcribe(self, file_path, file_hash: str, **kwargs):
         result = whisper.transcribe(
             model=self.model,
             audio=file_path,
-            fp16=False,
-            word_timestamps=True,
-            **kwargs,
+            **{**TRANSCRIBE_OPTIONS, **kwargs},
         )
 
         logger.info(f"Detected language: {result['language']}")
@@ -28,6 +110,157 @@ class WhisperService:
             "segments": result["segments"],
         }
 
+    def detect_language(self, audio):
+        """
+        זיהוי השפה על תחילת האודיו (numpy, 16kHz mono) - מעבר אחד של ה-encoder
+        במקום זיהוי בתוך התמלול המלא
+
+        Returns:
+            (קוד השפה, ההסתברות שלה)
+        """
+        clip = whisper.pad_or_trim(audio)
+        mel = whisper.log_mel_spectrogram(clip, self.model.dims.n_mels)
+        _, probs = self.model.detect_language(mel.to(self.model.device))
+        language = max(probs, key=probs.get)
+        return language, probs[language]
+
+    def _tokenizer(self, language: str):
+        kwargs = {}
+        if hasattr(self.model, "num_languages"):
+            kwargs["num_languages"] = self.model.num_languages
+        return get_tokenizer(
+            self.model.is_multilingual, language=language, task="transcribe", **kwargs
+        )
+
+    @staticmethod
+    def _split_segments(result, tokenizer, duration: float) -> List[Dict[str, Any]]:
+        """
+        פיצול הטוקנים של חלון אחד ל-segments לפי טוקני ה-timestamp
+        (<|0.00|> טקסט <|2.40|><|2.40|> טקסט <|5.00|> ...)
+        """
+        time_precision = whisper.audio.HOP_LENGTH * 2 / whisper.audio.SAMPLE_RATE
+        pieces = []
+        start, tokens = None, []
+        for token in result.tokens:
+            tokens.append(token)
+            if token < tokenizer.timestamp_begin:
+                continue
+            seconds = (token - tokenizer.timestamp_begin) * time_precision
+            if start is None:
+                start = seconds
+            else:
+                pieces.append((start, seconds, tokens))
+                start, tokens = None, []
+        if any(token < tokenizer.timestamp_begin for token in tokens):
+            pieces.append((start or 0.0, duration, tokens))
+
+        segments = []
+        for start, end, tokens in pieces:
+            text_tokens = [token for token in tokens if token < tokenizer.eot]
+            segments.append(
+                {
+                    "id": len(segments),
+                    "seek": 0,
+                    "start": start,
+                    "end": min(end, duration),
+                    "text": tokenizer.decode(text_tokens),
+                    "tokens": tokens,
+                    "temperature": result.temperature,
+                    "avg_logprob": result.avg_logprob,
+                    "compression_ratio": result.compression_ratio,
+                    "no_speech_prob": result.no_speech_prob,
+                }
+            )
+        return segments
+
+    def transcribe_batch(self, audios: List, file_hashes: List[str], **kwargs):
+        """
+        תמלול כמה קבצים קצרים (עד חלון אחד של 30 שניות) בפענוח אחד:
+        ה-mel של כל הקבצים נערם ל-tensor אחד שעובר ב-encoder וב-decoder יחד
+
+        Returns:
+            רשימת תוצאות לפי הסדר (אותו פורמט כמו whisper_transcribe)
+        """
+        options = {**TRANSCRIBE_OPTIONS, **kwargs}
+        temperature = options.get("temperature", 0.0)
+        if not isinstance(temperature, (int, float)):
+            temperature = temperature[0]
+        if set(options) - BATCH_OPTIONS or temperature != 0:
+            return [
+                self.whisper_transcribe(audio, file_hash, **kwargs)
+                for audio, file_hash in zip(audios, file_hashes)
+            ]
+
+        mels = [
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(audio), self.model.dims.n_mels
+            )
+            for audio in audios
+        ]
+        decoded = self.model.decode(
+            torch.stack(mels).to(self.model.device),
+            whisper.DecodingOptions(
+                task="transcribe",
+                language=options.get("language"),
+                fp16=options.get("fp16", False),
+                beam_size=options.get("beam_size"),
+            ),
+        )
+
+        results = []
+        for audio, file_hash, mel, result in zip(audios, file_hashes, mels, decoded):
+            duration = len(audio) / whisper.audio.SAMPLE_RATE
+            if (
+                result.no_speech_prob > NO_SPEECH_THRESHOLD
+                and result.avg_logprob < LOGPROB_THRESHOLD
+            ):
+                segments = []
+            elif (
+                result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                or result.avg_logprob < LOGPROB_THRESHOLD
+            ):
+                # פענוח greedy שנכשל - תמלול רגיל עם ה-fallback של Whisper
+                results.append(self.whisper_transcribe(audio, file_hash, **kwargs))
+                continue
+            else:
+                tokenizer = self._tokenizer(result.language)
+                segments = self._split_segments(result, tokenizer, duration)
+                if options.get("word_timestamps") and segments:
+                    add_word_timestamps(
+                        segments=segments,
+                        model=self.model,
+                        tokenizer=tokenizer,
+                        mel=mel.to(self.model.device),
+                        num_frames=len(audio) // whisper.audio.HOP_LENGTH,
+                        last_speech_timestamp=0.0,
+                    )
+            results.append(
+                {
+                    "file_hash": file_hash,
+                    "full_text": "".join(segment["text"] for segment in segments),
+                    "language": result.language,
+                    "segments": segments,
+                }
+            )
+        logger.debug(f"Batch transcription completed for {len(results)} files")
+        return results
+
+    def transcribe_chunk(self, audio, offset_seconds: float = 0.0, **kwargs):
+        """
+        תמלול קטע אודיו (numpy, 16kHz mono) - ה-timestamps מוזזים ב-offset_seconds
+        כך שהם יחסיים לתחילת הקובץ המלא
+        """
+        result = whisper.transcribe(
+            model=self.model,
+            audio=audio,
+            **{**TRANSCRIBE_OPTIONS, **kwargs},
+        )
+        return {
+            "text": result["text"],
+            "language": result["language"],
+            "segments": shift_segments(result["segments"], offset_seconds),
+        }
+
 
 if __name__ == "__main__":
 
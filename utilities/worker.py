@@ -0,0 +1,399 @@
+# ============================================================================
+# utilities/worker.py - SHARED ASYNC WORKER RUNTIME FOR THE PIPELINE SERVICES
+# ============================================================================
+"""
+Runtime משותף לשירותים שצורכים מ-Kafka
+
+השירות מעביר handler (הודעה בודדת) או batch_handler (מנה), וה-runtime אחראי על:
+מקביליות, מנות, backpressure, סטטיסטיקות אחידות (קצב ו-latency),
+עצירה מסודרת ב-SIGTERM/SIGINT (סיום העבודה שבעיבוד ו-commit אחרון)
+והפעלה מחדש עם backoff אקספוננציאלי אם לולאת הצריכה נופלת.
+"""
+
+import asyncio
+import logging
+import signal
+import statistics
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from .kafka.async_client import KafkaConsumerAsync
+from .kafka.retry import RetryPolicy
+from .metrics import REGISTRY, Counter, Gauge, Histogram, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# מספר מקסימלי של מדידות latency שנשמרות בכל חלון סטטיסטיקה
+MAX_LATENCY_SAMPLES = 10000
+# לולאת צריכה שרצה לפחות כך הרבה זמן לפני שנפלה מאפסת את ה-backoff
+HEALTHY_RUN_SECONDS = 60
+
+MESSAGES_PROCESSED = Counter(
+    "pipeline_messages_processed_total", "Messages handled successfully", ["stage"]
+)
+MESSAGES_FAILED = Counter(
+    "pipeline_messages_failed_total",
+    "Messages whose handler call failed (every attempt counts)",
+    ["stage"],
+)
+HANDLER_LATENCY = Histogram(
+    "pipeline_handler_latency_seconds",
+    "Duration of one handler call (a message or a batch)",
+    ["stage"],
+)
+BATCH_SIZE = Histogram(
+    "pipeline_batch_size",
+    "Messages per handler call",
+    ["stage"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+ACTIVE_HANDLERS = Gauge(
+    "pipeline_active_handlers", "Handler calls running right now", ["stage"]
+)
+IN_FLIGHT = Gauge(
+    "pipeline_in_flight_messages",
+    "Messages fetched and not finished yet (queued or processing)",
+    ["stage"],
+)
+PAUSED_PARTITIONS = Gauge(
+    "kafka_consumer_paused_partitions",
+    "Partitions paused by backpressure",
+    ["stage"],
+)
+CONSUMER_LAG = Gauge(
+    "kafka_consumer_lag",
+    "Messages between the committed offset and the end of the partition",
+    ["stage", "topic", "partition"],
+)
+
+
+class WorkerStats:
+    """
+    סטטיסטיקות אחידות לשירות: כמות, קצב ו-latency של קריאות ל-handler
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.total_processed = 0
+        self.total_failed = 0
+        self._window_start = time.monotonic()
+        self._window_processed = 0
+        self._window_failed = 0
+        self._latencies: List[float] = []
+
+    def record(self, count: int, seconds: float, success: bool = True):
+        """
+        רישום קריאה אחת ל-handler (גם במדדי ה-Prometheus של ה-stage)
+
+        Args:
+            count: מספר ההודעות שהקריאה טיפלה בהן
+            seconds: משך הקריאה
+            success: האם הקריאה הצליחה
+        """
+        if success:
+            self.total_processed += count
+            self._window_processed += count
+            MESSAGES_PROCESSED.labels(self.name).inc(count)
+        else:
+            self.total_failed += count
+            self._window_failed += count
+            MESSAGES_FAILED.labels(self.name).inc(count)
+        HANDLER_LATENCY.labels(self.name).observe(seconds)
+        BATCH_SIZE.labels(self.name).observe(count)
+        if len(self._latencies) < MAX_LATENCY_SAMPLES:
+            self._latencies.append(seconds)
+
+    def snapshot(self, reset: bool = True) -> Dict[str, Any]:
+        """
+        הסטטיסטיקות של החלון הנוכחי (מאז ה-snapshot הקודם)
+
+        Returns:
+            Dictionary עם rate, p50/p95/max (שניות) וסיכומים
+        """
+        elapsed = max(time.monotonic() - self._window_start, 1e-9)
+        latencies = sorted(self._latencies)
+        result = {
+            "name": self.name,
+            "rate": self._window_processed / elapsed,
+            "processed": self._window_processed,
+            "failed": self._window_failed,
+            "total_processed": self.total_processed,
+            "total_failed": self.total_failed,
+            "p50": statistics.median(latencies) if latencies else 0.0,
+            "p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "max": latencies[-1] if latencies else 0.0,
+        }
+        if reset:
+            self._window_start = time.monotonic()
+            self._window_processed = 0
+            self._window_failed = 0
+            self._latencies = []
+        return result
+
+
+# כל ה-runtimes הפעילים בתהליך - signal אחד עוצר את כולם (run_local.py)
+_RUNTIMES: "weakref.WeakSet[WorkerRuntime]" = weakref.WeakSet()
+_signal_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+
+# שם ה-signal שעצר את התהליך (None = לא התקבלה בקשת עצירה)
+_shutdown_signal: Optional[str] = None
+
+
+def shutdown_requested() -> bool:
+    """האם התקבל SIGTERM/SIGINT - שירות שחזר בלי עצירה כזו הסתיים בכשל"""
+    return _shutdown_signal is not None
+
+
+def _stop_all(signame: str):
+    global _shutdown_signal
+    _shutdown_signal = signame
+    logger.info(f"Received {signame}, draining {len(_RUNTIMES)} workers")
+    for runtime in list(_RUNTIMES):
+        runtime.request_stop()
+
+
+def _install_signal_handlers(loop: asyncio.AbstractEventLoop):
+    """התקנת handlers ל-SIGTERM/SIGINT פעם אחת לכל event loop"""
+    if loop in _signal_loops:
+        return
+    _signal_loops.add(loop)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, _stop_all, signum.name)
+        except (NotImplementedError, RuntimeError):
+            # Windows / לא ב-main thread - handler רגיל שמעביר ל-loop
+            try:
+                signal.signal(
+                    signum,
+                    lambda s, f: loop.call_soon_threadsafe(
+                        _stop_all, signal.Signals(s).name
+                    ),
+                )
+            except ValueError:
+                logger.warning(f"Cannot install a {signum.name} handler")
+
+
+class WorkerRuntime:
+    """
+    הרצת handler על consumer של Kafka עם מקביליות, מנות, סטטיסטיקות ועצירה מסודרת
+
+    שימוש:
+        runtime = WorkerRuntime("indexer", consumer, batch_handler=handle_batch,
+                                concurrency=2, max_records=500)
+        await runtime.run()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        consumer: KafkaConsumerAsync,
+        handler: Optional[Callable[[Dict], Any]] = None,
+        batch_handler: Optional[Callable[[List[Dict], List[Dict]], Any]] = None,
+        concurrency: int = 1,
+        max_records: int = 500,
+        max_wait_ms: int = 1000,
+        high_water: Optional[int] = None,
+        low_water: Optional[int] = None,
+        commit_interval_ms: int = 5000,
+        stats_interval_seconds: int = 60,
+        drain_timeout_seconds: float = 30,
+        restart_policy: Optional[RetryPolicy] = None,
+        metrics_port: int = 0,
+    ):
+        """
+        Args:
+            name: שם השירות (ללוגים ולסטטיסטיקות)
+            consumer: Consumer מחובר (מומלץ enable_auto_commit=False)
+            handler: פונקציה להודעה בודדת - הודעות עם אותו key נשמרות בסדר
+            batch_handler: פונקציה למנה (records, offsets) - במקום handler
+            concurrency: מספר ההודעות / המנות שמעובדות במקביל
+            max_records: מספר מקסימלי של הודעות בכל fetch / מנה
+            max_wait_ms: זמן המתנה מקסימלי ל-fetch (מילישניות)
+            high_water: עומק תור להשהיית ה-partitions (רק עם handler)
+            low_water: עומק תור לחידוש ה-partitions (רק עם handler)
+            commit_interval_ms: תדירות ה-commit (מילישניות)
+            stats_interval_seconds: תדירות רישום הסטטיסטיקות
+            drain_timeout_seconds: זמן מקסימלי לסיום העבודה שבעיבוד בעצירה
+            restart_policy: backoff להפעלה מחדש של לולאת הצריכה אחרי כשל
+            metrics_port: פורט ל-endpoint של המדדים (GET /metrics), 0 = ללא
+        """
+        if (handler is None) == (batch_handler is None):
+            raise ValueError("Pass exactly one of handler / batch_handler")
+        self.name = name
+        self.consumer = consumer
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.concurrency = concurrency
+        self.max_records = max_records
+        self.max_wait_ms = max_wait_ms
+        self.high_water = high_water
+        self.low_water = low_water
+        self.commit_interval_ms = commit_interval_ms
+        self.stats_interval_seconds = stats_interval_seconds
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self.restart_policy = restart_policy or RetryPolicy(
+            initial_backoff_ms=1000, max_backoff_ms=60000
+        )
+        self.metrics_port = metrics_port
+        self.stats = WorkerStats(name)
+        self._lag_partitions: set = set()
+        self._stop_event: Optional[asyncio.Event] = None
+
+    @property
+    def is_stopping(self) -> bool:
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    def request_stop(self):
+        """בקשת עצירה מסודרת: הפסקת משיכה, סיום העבודה שבעיבוד ו-commit"""
+        if self._stop_event is not None and not self._stop_event.is_set():
+            logger.info(f"[{self.name}] Stop requested, draining in-flight work")
+            self._stop_event.set()
+
+    async def _call(self, func: Callable, *args: Any):
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args)
+        return func(*args)
+
+    async def _timed(self, count: int, func: Callable, *args: Any):
+        """קריאה ל-handler עם מדידת זמן ועדכון הסטטיסטיקות"""
+        active = ACTIVE_HANDLERS.labels(self.name)
+        active.inc()
+        start = time.perf_counter()
+        try:
+            result = await self._call(func, *args)
+        except Exception:
+            self.stats.record(count, time.perf_counter() - start, success=False)
+            raise
+        finally:
+            active.dec()
+        self.stats.record(count, time.perf_counter() - start, result is not False)
+        return result
+
+    async def _timed_handler(self, message_data: Dict):
+        return await self._timed(1, self.handler, message_data)
+
+    async def _timed_batch_handler(self, records: List[Dict], offsets: List[Dict]):
+        return await self._timed(len(records), self.batch_handler, records, offsets)
+
+    async def _consume(self) -> int:
+        """לולאת הצריכה - חוזרת כאשר stop_event מסומן (או בכשל)"""
+        if self.batch_handler is not None:
+            return await self.consumer.listen_batches(
+                self._timed_batch_handler,
+                max_records=self.max_records,
+                max_wait_ms=self.max_wait_ms,
+                concurrency=self.concurrency,
+                commit_interval_ms=self.commit_interval_ms,
+                stop_event=self._stop_event,
+            )
+        return await self.consumer.process_concurrently(
+            self._timed_handler,
+            concurrency=self.concurrency,
+            max_records=self.max_records,
+            max_wait_ms=self.max_wait_ms,
+            commit_interval_ms=self.commit_interval_ms,
+            high_water=self.high_water,
+            low_water=self.low_water,
+            stop_event=self._stop_event,
+        )
+
+    def log_stats(self):
+        """רישום הסטטיסטיקות של החלון האחרון"""
+        stats = self.stats.snapshot()
+        logger.info(
+            f"[{self.name}] Processing rate: {stats['rate']:.2f} messages/second"
+            f" | latency p50 {stats['p50']:.3f}s p95 {stats['p95']:.3f}s"
+            f" max {stats['max']:.3f}s | queue depth: {self.consumer.queue_depth}"
+            f" | Total processed: {stats['total_processed']}"
+            f" failed: {stats['total_failed']}"
+        )
+
+    async def _collect_metrics(self):
+        """עדכון ה-gauges של ה-consumer לפני כל scrape"""
+        IN_FLIGHT.labels(self.name).set(self.consumer.queue_depth)
+        PAUSED_PARTITIONS.labels(self.name).set(len(self.consumer.paused_partitions))
+        lag = await self.consumer.get_lag()
+        partitions = {(tp.topic, str(tp.partition)) for tp in lag}
+        # partitions שעברו ל-consumer אחר ב-rebalance
+        for topic, partition in self._lag_partitions - partitions:
+            CONSUMER_LAG.remove(self.name, topic, partition)
+        self._lag_partitions = partitions
+        for tp, value in lag.items():
+            CONSUMER_LAG.labels(self.name, tp.topic, tp.partition).set(value)
+
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(self.stats_interval_seconds)
+            self.log_stats()
+
+    async def run(self):
+        """
+        הרצת ה-worker עד לבקשת עצירה (SIGTERM/SIGINT או request_stop)
+        לולאת צריכה שנפלה מופעלת מחדש מיד, ועם backoff אם היא נופלת שוב ושוב
+        """
+        self._stop_event = asyncio.Event()
+        _RUNTIMES.add(self)
+        _install_signal_handlers(asyncio.get_running_loop())
+        reporter = asyncio.ensure_future(self._report_stats())
+        REGISTRY.add_collector(self._collect_metrics)
+        await start_metrics_server(self.metrics_port)
+        mode = "batches" if self.batch_handler is not None else "messages"
+        logger.info(
+            f"[{self.name}] Worker started ({mode}, concurrency={self.concurrency},"
+            f" max_records={self.max_records})"
+        )
+
+        failures = 0
+        try:
+            while not self.is_stopping:
+                consume = asyncio.ensure_future(self._consume())
+                stop_wait = asyncio.ensure_future(self._stop_event.wait())
+                started = time.monotonic()
+                await asyncio.wait(
+                    [consume, stop_wait], return_when=asyncio.FIRST_COMPLETED
+                )
+                stop_wait.cancel()
+                if not consume.done():
+                    await self._drain(consume)
+                    break
+                try:
+                    consume.result()
+                except Exception as e:
+                    logger.error(f"[{self.name}] Consumer loop failed: {e}")
+                if self.is_stopping:
+                    break
+
+                # הלולאה חזרה בלי בקשת עצירה - הפעלה מחדש. ריצה ארוכה מאפסת
+                # את ה-backoff, כשלים רצופים מאריכים אותו
+                if time.monotonic() - started > HEALTHY_RUN_SECONDS:
+                    failures = 0
+                delay = self.restart_policy.backoff(failures) if failures else 0
+                failures += 1
+                logger.warning(
+                    f"[{self.name}] Consumer loop exited, restarting in {delay:.2f}s"
+                )
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            reporter.cancel()
+            REGISTRY.remove_collector(self._collect_metrics)
+            _RUNTIMES.discard(self)
+            self.log_stats()
+            logger.info(f"[{self.name}] Worker stopped")
+
+    async def _drain(self, consume: asyncio.Task):
+        """המתנה לסיום העבודה שבעיבוד (עד drain_timeout_seconds)"""
+        try:
+            await asyncio.wait_for(consume, timeout=self.drain_timeout_seconds)
+            logger.info(f"[{self.name}] Drained in-flight work")
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"[{self.name}] Drain timed out after {self.drain_timeout_seconds}s,"
+                f" {self.consumer.queue_depth} messages left uncommitted"
+            )
+        except Exception as e:
+            logger.error(f"[{self.name}] Consumer loop failed while draining: {e}")